@@ -3,6 +3,8 @@ import os
 import zipfile
 from datetime import datetime
 
+import keitaro_profile
+
 # где лежат лендинги (подпапки)
 LANDER_ROOT = "lander"
 # куда складывать zip-файлы
@@ -11,7 +13,31 @@ OUT_ROOT = f"lander_zips_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
 # файлы, которые пропускаем
 SKIP_NAMES = {".DS_Store", "Thumbs.db"}
 
+# True или путь отчета - профилирование запуска (keitaro_profile)
+PROFILE = None
+
+
+def list_landers(root: str) -> list[str]:
+    """Подпапки root (каждая - отдельный лендинг) в алфавитном порядке"""
+    return sorted(
+        d for d in os.listdir(root) if os.path.isdir(os.path.join(root, d))
+    )
+
+
+def pack_lander(src_dir: str, target) -> None:
+    """Упаковать лендинг в ZIP: target - путь к файлу или открытый бинарный файл"""
+    with keitaro_profile.stage("pack"), zipfile.ZipFile(target, "w", zipfile.ZIP_DEFLATED) as z:
+        for root, _, files in os.walk(src_dir):
+            for fn in files:
+                if fn in SKIP_NAMES:
+                    continue
+                full = os.path.join(root, fn)
+                # путь внутри архива — относительно корня лендинга
+                rel = os.path.relpath(full, src_dir)
+                z.write(full, rel)
+
 
+@keitaro_profile.profiled("create_zip_folder", lambda: PROFILE)
 def main():
     if not os.path.isdir(LANDER_ROOT):
         print(f"❌ Папка '{LANDER_ROOT}' не найдена")
@@ -20,12 +46,7 @@ def main():
     os.makedirs(OUT_ROOT, exist_ok=True)
 
     # все подпапки = отдельные лендинги
-    landers = [
-        d
-        for d in os.listdir(LANDER_ROOT)
-        if os.path.isdir(os.path.join(LANDER_ROOT, d))
-    ]
-    landers.sort()
+    landers = list_landers(LANDER_ROOT)
 
     if not landers:
         print(f"❌ В '{LANDER_ROOT}' нет подпапок")
@@ -40,15 +61,7 @@ def main():
 
         print(f"[{idx}/{len(landers)}] Пакую '{src_dir}' → '{zip_path}'")
 
-        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as z:
-            for root, _, files in os.walk(src_dir):
-                for fn in files:
-                    if fn in SKIP_NAMES:
-                        continue
-                    full = os.path.join(root, fn)
-                    # путь внутри архива — относительно корня лендинга
-                    rel = os.path.relpath(full, src_dir)
-                    z.write(full, rel)
+        pack_lander(src_dir, zip_path)
 
         print(f"    ✓ Готово ({name}.zip)\n")
 
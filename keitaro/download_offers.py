@@ -15,18 +15,43 @@ import requests
 from datetime import datetime
 from urllib.parse import urlencode
 
+import keitaro_http
+import keitaro_listing
+import keitaro_capabilities
+import keitaro_verify
+import keitaro_serializer
+import keitaro_catalog
+
 # ======================== CONFIG ========================
 CONFIG = {
     "BASE_URL": None,  # будет загружено из .env
     "API_KEY": None,  # будет загружено из .env
     "PER_PAGE": 200,
     "TIMEOUT": 90,
+    "CONNECT_TIMEOUT": 10,  # сек на установку соединения; None - как TIMEOUT
+    "CIRCUIT_BREAKER": 5,  # ошибок API трекера подряд до паузы всех запросов; 0 - выключено (keitaro_http)
+    "BREAKER_PROBE_INTERVAL": 15,  # сек между проверками трекера во время паузы
+    "BREAKER_MAX_OUTAGE": 3600,  # сек ожидания трекера, затем запросы завершаются ошибкой
     # Куда складывать результат
     "OUT_DIR": None,  # по умолчанию offer_exports_<timestamp>
     "GROUP_UNGROUPED": "__NO_GROUP__",
     # Ограничение скорости/повторов
-    "RETRY_DOWNLOADS": 2,  # повторить неудачные скачивания
+    "RETRY_DOWNLOADS": 2,  # повторить неудачные скачивания (после основного прохода)
+    "RETRY_BACKOFF": 2.0,  # сек до первого повтора, дальше удваивается
     "SLEEP_BETWEEN": 0.2,  # сек между запросами
+    "JSON_COMPACT": False,  # JSON без отступов (keitaro_serializer)
+    "JSON_COMPRESS": None,  # None, "gzip" или "zstd" - сжатие JSON-файлов экспорта
+    "CATALOG": True,  # catalog.sqlite в папке экспорта; путь к файлу - общий каталог; False - не писать
+
+    # ========== ФИЛЬТРЫ (выборочный экспорт) ==========
+    # group_id и state передаются трекеру в запросе списка, остальное - фильтр на клиенте;
+    # отсеянные элементы не скачиваются и не запрашиваются детально
+    "FILTER_GROUP_IDS": None,  # [1, 2] - только эти группы
+    "FILTER_STATE": None,  # например "active"
+    "FILTER_ID_FROM": None,  # ID от (включительно)
+    "FILTER_ID_TO": None,  # ID до (включительно)
+    "FILTER_UPDATED_SINCE": None,  # "2025-01-01" или "2025-01-01 00:00:00"
+    # ==================================================
 }
 # ====================== /CONFIG ========================
 
@@ -52,7 +77,7 @@ def _session(api_key: str) -> requests.Session:
             "Content-Type": "application/json",
         }
     )
-    return s
+    return keitaro_http.mount(s, keitaro_http.http_adapter(CONFIG))
 
 
 def _safe(s: str | None, fallback="item") -> str:
@@ -73,11 +98,13 @@ def _api(base: str, path: str, params: dict | None = None) -> str:
     return url
 
 
-def iter_offers(s: requests.Session, base: str, per_page: int, timeout: int):
-    """Итерация по всем офферам с пагинацией"""
+def iter_offers(
+    s: requests.Session, base: str, per_page: int, timeout: int, params: dict | None = None
+):
+    """Итерация по всем офферам с пагинацией (params - фильтры запроса списка)"""
     page = 1
     while True:
-        url = _api(base, "offers", {"per_page": per_page, "page": page})
+        url = _api(base, "offers", dict(params or {}, per_page=per_page, page=page))
         r = s.get(url, timeout=timeout)
         r.raise_for_status()
         data = r.json()
@@ -120,34 +147,33 @@ def try_direct_url(
             or r.headers.get("Content-Disposition", "").lower().find(".zip") != -1
         ):
             return r
+        r.close()
     except requests.RequestException:
         pass
     return None
 
 
 def try_download_endpoints(
-    s: requests.Session, base: str, item_id, timeout: int
+    s: requests.Session, base: str, item_id, timeout: int, hint: dict | None = None
 ) -> requests.Response | None:
-    """Пробуем несколько вариантов эндпоинтов для скачивания"""
-    candidates = [
-        _api(base, f"offers/{item_id}/export"),
-        _api(base, f"offers/{item_id}/download"),
-        _api(base, f"offers/{item_id}/archive"),
-        # без admin_api (редко, но бывает)
-        f"{base.rstrip('/')}/offers/{item_id}/export",
-        f"{base.rstrip('/')}/offers/{item_id}/download",
-        f"{base.rstrip('/')}/offers/{item_id}/archive",
-    ]
-
-    for url in candidates:
+    """Пробуем несколько вариантов эндпоинтов для скачивания.
+
+    hint["pattern"] - шаблон URL, сработавший в прошлый раз (keitaro_capabilities).
+    """
+    hint = hint if hint is not None else {}
+    for pattern, url in keitaro_capabilities.download_urls(
+        base, "offers", item_id, hint.get("pattern")
+    ):
         try:
             r = s.get(url, timeout=timeout, stream=True)
             if r.status_code == 200 and (
                 "application/zip" in r.headers.get("Content-Type", "").lower()
                 or "attachment" in r.headers.get("Content-Disposition", "").lower()
-                or len(r.content) > 100  # минимальный размер ZIP
+                or keitaro_verify.is_zip_bytes(r.content)  # без заголовков - по сигнатуре ZIP
             ):
+                hint["pattern"] = pattern
                 return r
+            r.close()
         except requests.RequestException:
             pass
     return None
@@ -175,11 +201,95 @@ def save_stream(resp: requests.Response, dst_path: str) -> None:
                 f.write(chunk)
 
 
-def save_as_json(offer_details: dict, dst_path: str) -> None:
-    """Сохранить данные оффера как JSON (запасной вариант)"""
-    os.makedirs(os.path.dirname(dst_path), exist_ok=True)
-    with open(dst_path, "w", encoding="utf-8") as f:
-        json.dump(offer_details, f, ensure_ascii=False, indent=2)
+def save_as_json(offer_details: dict, dst_path: str) -> str:
+    """Сохранить данные оффера как JSON (запасной вариант). Возвращает фактический путь"""
+    return keitaro_serializer.dump(
+        offer_details, dst_path, compact=CONFIG["JSON_COMPACT"], compress=CONFIG["JSON_COMPRESS"]
+    )
+
+
+def export_offer(
+    s: requests.Session,
+    base: str,
+    item: dict,
+    out_root: str,
+    ungrouped: str,
+    timeout: int,
+    label: str,
+    hint: dict | None = None,
+) -> tuple[dict | None, dict | None, bool]:
+    """Скачать один оффер. Возвращает (строка index, ошибка, сохранен_как_json)"""
+    offer_id = item.get("id")
+    name = _safe(item.get("name") or f"offer_{offer_id}")
+    group = as_group_name(item.get("group_name") or item.get("group"), ungrouped)
+
+    dst_dir = os.path.join(out_root, group)
+    dst_zip = os.path.join(dst_dir, f"{offer_id}_{name}.zip")
+    dst_json = os.path.join(dst_dir, f"{offer_id}_{name}.json")
+    os.makedirs(dst_dir, exist_ok=True)
+
+    print(f"\n[{label}] Оффер: {name} (ID: {offer_id}, Группа: {group})")
+
+    # 1) Прямые URL в объекте (если есть)
+    direct_urls = [
+        (item.get("archive_url") or ""),
+        (item.get("export_url") or ""),
+        (item.get("download_url") or ""),
+        (item.get("zip_url") or ""),
+    ]
+    resp = None
+    for u in direct_urls:
+        resp = try_direct_url(s, u, timeout)
+        if resp:
+            print(f"    ✓ Найден прямой URL")
+            break
+
+    # 2) Стандартные REST-пути
+    if not resp:
+        resp = try_download_endpoints(s, base, offer_id, timeout, hint)
+        if resp:
+            print(f"    ✓ Скачано через эндпоинт")
+
+    # 3) Если ничего не помогло - сохраняем детали как JSON
+    if not resp:
+        print(f"    ⚠ ZIP недоступен, пробую получить детали...")
+        details = get_offer_details(s, base, offer_id, timeout)
+        if not details:
+            print(f"    ✗ Не удалось получить данные")
+            return None, {
+                "id": offer_id,
+                "name": name,
+                "group": group,
+                "reason": "no_data_available",
+            }, False
+        dst, file_type, source = dst_json, "json", "details_api"
+    else:
+        dst, file_type, source = dst_zip, "zip", "archive_endpoint"
+
+    try:
+        if file_type == "json":
+            dst = save_as_json(details, dst)
+            print(f"    ✓ Сохранен как JSON → {dst}")
+        else:
+            save_stream(resp, dst)
+            print(f"    ✓ Сохранен ZIP → {dst}")
+    except OSError as e:
+        print(f"    ✗ Ошибка записи: {e}")
+        return None, {
+            "id": offer_id,
+            "name": name,
+            "group": group,
+            "reason": f"write_error: {e}",
+        }, False
+
+    return {
+        "id": offer_id,
+        "name": name,
+        "group": group,
+        "file_path": os.path.relpath(dst, out_root),
+        "type": file_type,
+        "source": source,
+    }, None, file_type == "json"
 
 
 def main():
@@ -210,108 +320,61 @@ def main():
     ok = 0
     saved_as_json = 0
 
-    for item in iter_offers(s, base, per_page, timeout):
+    retry_queue: list[dict] = []
+    # Шаблон URL скачивания, сработавший на этом трекере в прошлый раз
+    hint = {"pattern": keitaro_capabilities.download_pattern(base, "offers")}
+
+    def collect(row, failure, is_json):
+        nonlocal ok, saved_as_json
+        if failure:
+            failed.append(failure)
+            return
+        ok += 1
+        saved_as_json += is_json
+        index_rows.append(row)
+
+    filters = keitaro_listing.filters_from_config(CONFIG)
+    if filters:
+        print(f"[INFO] Фильтры: {keitaro_listing.describe(filters)}")
+    offers = iter_offers(s, base, per_page, timeout, keitaro_listing.filter_params(filters))
+
+    for item in keitaro_listing.select(offers, filters):
         total += 1
-        offer_id = item.get("id")
-        name = _safe(item.get("name") or f"offer_{offer_id}")
-        group = as_group_name(item.get("group_name") or item.get("group"), ungrouped)
-
-        dst_dir = os.path.join(out_root, group)
-        dst_zip = os.path.join(dst_dir, f"{offer_id}_{name}.zip")
-        dst_json = os.path.join(dst_dir, f"{offer_id}_{name}.json")
-        os.makedirs(dst_dir, exist_ok=True)
-
-        print(f"\n[{total}] Оффер: {name} (ID: {offer_id}, Группа: {group})")
-
-        # 1) Прямые URL в объекте (если есть)
-        direct_urls = [
-            (item.get("archive_url") or ""),
-            (item.get("export_url") or ""),
-            (item.get("download_url") or ""),
-            (item.get("zip_url") or ""),
-        ]
-        resp = None
-        for u in direct_urls:
-            resp = try_direct_url(s, u, timeout)
-            if resp:
-                print(f"    ✓ Найден прямой URL")
-                break
-
-        # 2) Стандартные REST-пути
-        if not resp:
-            resp = try_download_endpoints(s, base, offer_id, timeout)
-            if resp:
-                print(f"    ✓ Скачано через эндпоинт")
-
-        # 3) Если ничего не помогло - сохраняем детали как JSON
-        if not resp:
-            print(f"    ⚠ ZIP недоступен, пробую получить детали...")
-            details = get_offer_details(s, base, offer_id, timeout)
-            if details:
-                try:
-                    save_as_json(details, dst_json)
-                    saved_as_json += 1
-                    ok += 1
-                    print(f"    ✓ Сохранен как JSON → {dst_json}")
-                    index_rows.append(
-                        {
-                            "id": offer_id,
-                            "name": name,
-                            "group": group,
-                            "file_path": os.path.relpath(dst_json, out_root),
-                            "type": "json",
-                            "source": "details_api",
-                        }
-                    )
-                except OSError as e:
-                    failed.append(
-                        {
-                            "id": offer_id,
-                            "name": name,
-                            "group": group,
-                            "reason": f"write_error: {e}",
-                        }
-                    )
-                    print(f"    ✗ Ошибка записи: {e}")
-            else:
-                failed.append(
-                    {
-                        "id": offer_id,
-                        "name": name,
-                        "group": group,
-                        "reason": "no_data_available",
-                    }
-                )
-                print(f"    ✗ Не удалось получить данные")
+        row, failure, is_json = export_offer(
+            s, base, item, out_root, ungrouped, timeout, f"{total}", hint
+        )
+        if failure and CONFIG["RETRY_DOWNLOADS"] > 0:
+            retry_queue.append(item)  # повторим после основного прохода
         else:
-            # Скачивание ZIP
-            try:
-                save_stream(resp, dst_zip)
-                ok += 1
-                print(f"    ✓ Сохранен ZIP → {dst_zip}")
-                index_rows.append(
-                    {
-                        "id": offer_id,
-                        "name": name,
-                        "group": group,
-                        "file_path": os.path.relpath(dst_zip, out_root),
-                        "type": "zip",
-                        "source": "archive_endpoint",
-                    }
-                )
-            except OSError as e:
-                failed.append(
-                    {
-                        "id": offer_id,
-                        "name": name,
-                        "group": group,
-                        "reason": f"write_error: {e}",
-                    }
-                )
-                print(f"    ✗ Ошибка записи: {e}")
-
+            collect(row, failure, is_json)
         time.sleep(CONFIG["SLEEP_BETWEEN"])
 
+    # Отложенные повторы: раунды с экспоненциальной задержкой
+    retried_ok = 0
+    for attempt in range(1, CONFIG["RETRY_DOWNLOADS"] + 1):
+        if not retry_queue:
+            break
+        delay = CONFIG["RETRY_BACKOFF"] * 2 ** (attempt - 1)
+        print(
+            f"\n[INFO] Повтор {attempt}/{CONFIG['RETRY_DOWNLOADS']}: "
+            f"{len(retry_queue)} офферов через {delay:.1f} сек"
+        )
+        time.sleep(delay)
+        still_failed = []
+        for item in retry_queue:
+            row, failure, is_json = export_offer(
+                s, base, item, out_root, ungrouped, timeout, f"повтор {attempt}", hint
+            )
+            if failure and attempt < CONFIG["RETRY_DOWNLOADS"]:
+                still_failed.append(item)
+            else:
+                retried_ok += failure is None
+                collect(row, failure, is_json)
+            time.sleep(CONFIG["SLEEP_BETWEEN"])
+        retry_queue = still_failed
+
+    keitaro_capabilities.remember_download_pattern(base, "offers", hint.get("pattern"))
+
     # Сохраняем index.csv
     index_file = os.path.join(out_root, "index.csv")
     with open(index_file, "w", newline="", encoding="utf-8") as f:
@@ -328,6 +391,14 @@ def main():
         with open(failed_file, "w", encoding="utf-8") as f:
             json.dump(failed, f, ensure_ascii=False, indent=2)
 
+    catalog = keitaro_catalog.target(CONFIG["CATALOG"], out_root)
+    if catalog:
+        try:
+            catalog = keitaro_catalog.write_items(catalog, "offers", index_rows, out_root, base)
+        except keitaro_catalog.ERRORS as e:
+            print(f"[WARNING] Каталог не записан: {type(e).__name__}: {e}")
+            catalog = None
+
     # Финальная статистика
     print("\n" + "=" * 60)
     print("СТАТИСТИКА ЭКСПОРТА")
@@ -336,9 +407,12 @@ def main():
     print(f"Успешно скачано:      {ok}")
     print(f"  - как ZIP:          {ok - saved_as_json}")
     print(f"  - как JSON:         {saved_as_json}")
+    print(f"  - после повтора:    {retried_ok}")
     print(f"Не удалось скачать:   {len(failed)}")
     print(f"\nРезультаты в папке:   {out_root}")
     print(f"Индекс:               {index_file}")
+    if catalog:
+        print(f"Каталог:              {catalog}")
     if failed:
         print(f"Ошибки:               {os.path.join(out_root, 'failed.json')}")
     print("=" * 60)
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Асинхронный (asyncio) клиент Keitaro Admin API.
+
+Покрывает вызовы, которые используют скрипты в режиме ENGINE="async":
+список с пагинацией, детали и потоки кампаний, скачивание архива, импорт
+ZIP и создание объектов. Число одновременных запросов ограничивается
+параметром concurrency. Ошибка страницы списка (после повторов при 429)
+пробрасывается, как в keitaro_listing.list_all: неполный список хуже
+остановки скрипта.
+
+Архив скачивается через requests.Session клиента в потоке, а тело ответа
+записывает save(response) скрипта - те же .part, докачка, проверка размера
+и ZIP, что и в синхронном режиме.
+
+Если установлен httpx - используется httpx.AsyncClient, иначе запросы идут
+через requests.Session в пуле потоков (asyncio.to_thread) с тем же лимитом.
+connect_timeout и breaker (keitaro_http.adapter_limits сессии скрипта)
+работают так же, как CONNECT_TIMEOUT и CIRCUIT_BREAKER сессии requests:
+при сбое трекера запросы клиента ждут его вместе с остальными.
+
+Скрипты работают с клиентом через синхронную обертку SyncKeitaro и
+переключаются флагом CONFIG["ENGINE"] = "async".
+"""
+
+import os
+import asyncio
+from urllib.parse import urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import keitaro_http
+import keitaro_verify
+import keitaro_capabilities
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+RETRIES_429 = 3
+PROBE_TIMEOUT = keitaro_http.PROBE_TIMEOUT
+TRANSPORT_ERRORS = (requests.RequestException, OSError) + (
+    (httpx.HTTPError,) if httpx is not None else ()
+)
+
+
+def _api(base: str, path: str, params: dict | None = None) -> str:
+    base = base.rstrip("/")
+    path = path.lstrip("/")
+    url = f"{base}/admin_api/v1/{path}"
+    if params:
+        url += "?" + urlencode(params)
+    return url
+
+
+def _items(data) -> list:
+    if isinstance(data, dict):
+        return data.get("data") or []
+    return data or []
+
+
+def _is_archive(r: requests.Response) -> bool:
+    """Ответ - ZIP-архив, а не страница ошибки (как в синхронном скачивании)"""
+    if r.status_code != 200:
+        return False
+    disposition = r.headers.get("Content-Disposition", "").lower()
+    if "application/zip" in r.headers.get("Content-Type", "").lower():
+        return True
+    if "attachment" in disposition or ".zip" in disposition:
+        return True
+    return keitaro_verify.is_zip_bytes(r.content)  # без заголовков - по сигнатуре ZIP
+
+
+def _total_pages(data) -> int | None:
+    if not isinstance(data, dict):
+        return None
+    meta = data.get("meta") or {}
+    pagination = meta.get("pagination") or {}
+    total_pages = pagination.get("total_pages")
+    return int(total_pages) if total_pages else None
+
+
+class AsyncKeitaro:
+    """Асинхронный клиент. Использовать как async context manager"""
+
+    def __init__(
+        self,
+        base: str,
+        api_key: str,
+        timeout: int = 90,
+        concurrency: int = 10,
+        connect_timeout: float | None = None,
+        breaker: keitaro_http.CircuitBreaker | None = None,
+    ):
+        self.base = base
+        self.timeout = timeout
+        self.concurrency = max(int(concurrency), 1)
+        self.connect_timeout = connect_timeout
+        self.breaker = breaker
+        self.headers = {"Api-Key": api_key, "Accept": "application/json"}
+        self._sem: asyncio.Semaphore | None = None
+        self._client = None
+        self._session: requests.Session | None = None
+
+    async def __aenter__(self):
+        self._sem = asyncio.Semaphore(self.concurrency)
+        self._files = asyncio.Semaphore(self.concurrency)  # открытые файлы загрузки
+        # requests-сессия нужна всегда: через нее скачиваются архивы (save скрипта)
+        self._session = requests.Session()
+        self._session.headers.update(self.headers)
+        if self.connect_timeout or self.breaker is not None:
+            adapter = keitaro_http.TrackerAdapter(
+                self.connect_timeout, self.breaker, pool_maxsize=self.concurrency
+            )
+        else:
+            adapter = HTTPAdapter(pool_maxsize=self.concurrency)
+        keitaro_http.mount(self._session, adapter)
+        if httpx is not None:
+            connect = min(self.connect_timeout or self.timeout, self.timeout)
+            self._client = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=httpx.Timeout(self.timeout, connect=connect),
+                limits=httpx.Limits(max_connections=self.concurrency),
+                follow_redirects=True,
+            )
+        return self
+
+    async def __aexit__(self, *exc):
+        if self._client is not None:
+            await self._client.aclose()
+        self._session.close()
+
+    # ---------- транспорт ----------
+
+    async def _send(self, method: str, url: str, **kwargs):
+        if self._client is None:
+            # TrackerAdapter сессии сам учитывает breaker и connect_timeout
+            return await asyncio.to_thread(
+                self._session.request, method, url, timeout=self.timeout, **kwargs
+            )
+        breaker = self.breaker
+        if breaker is None:
+            return await self._client.request(method, url, **kwargs)
+
+        api_root = _api(self.base, "").rstrip("/")
+        probe_timeout = (min(self.connect_timeout or PROBE_TIMEOUT, PROBE_TIMEOUT), PROBE_TIMEOUT)
+        while True:
+            if breaker.opened_at is not None:
+                # wait() блокирует поток до восстановления трекера - не event loop
+                await asyncio.to_thread(
+                    breaker.wait, lambda: keitaro_http.probe(api_root, self.headers, probe_timeout)
+                )
+            try:
+                r = await self._client.request(method, url, **kwargs)
+            except (httpx.TransportError, httpx.TimeoutException) as e:
+                if breaker.failure() and keitaro_http.replayable(
+                    method, connect_timeout=isinstance(e, httpx.ConnectTimeout)
+                ):
+                    continue
+                raise
+            if r.status_code in keitaro_http.OUTAGE_STATUSES:
+                if breaker.failure() and keitaro_http.replayable(method, status=r.status_code):
+                    await r.aclose()
+                    continue
+                return r
+            breaker.success()
+            return r
+
+    async def request(self, method: str, url: str, **kwargs):
+        """Запрос с ограничением параллельности и ожиданием при 429"""
+        async with self._sem:
+            for attempt in range(RETRIES_429 + 1):
+                r = await self._send(method, url, **kwargs)
+                if r.status_code != 429 or attempt == RETRIES_429:
+                    return r
+                await asyncio.sleep(float(r.headers.get("Retry-After") or 1))
+
+    async def get_json(self, path: str, params: dict | None = None):
+        try:
+            r = await self.request("GET", _api(self.base, path, params))
+            if r.status_code != 200:
+                return None
+            return r.json()
+        except (ValueError, *TRANSPORT_ERRORS):
+            return None
+
+    async def _page(self, endpoint: str, params: dict):
+        """Страница списка (JSON). Ошибки HTTP и транспорта пробрасываются"""
+        r = await self.request("GET", _api(self.base, endpoint, params))
+        r.raise_for_status()
+        return r.json()
+
+    # ---------- API ----------
+
+    async def list_all(
+        self, endpoint: str, per_page: int = 200, params: dict | None = None
+    ) -> list:
+        """Все элементы списка: первая страница, затем остальные параллельно"""
+        params = params or {}
+        first = await self._page(endpoint, dict(params, per_page=per_page, page=1))
+        items = list(_items(first))
+        total_pages = _total_pages(first)
+        if not items or not total_pages or total_pages <= 1:
+            return items
+        pages = await asyncio.gather(
+            *(
+                self._page(endpoint, dict(params, per_page=per_page, page=page))
+                for page in range(2, total_pages + 1)
+            )
+        )
+        for data in pages:
+            items.extend(_items(data))
+        return items
+
+    async def details(self, endpoint: str, item_id) -> dict | None:
+        """Детали объекта. None - не удалось получить"""
+        return await self.get_json(f"{endpoint}/{item_id}")
+
+    async def flows(self, campaign_id) -> list | None:
+        """Потоки кампании. None - не удалось получить (не путать с кампанией без потоков)"""
+        data = await self.get_json(f"campaigns/{campaign_id}/flows")
+        return None if data is None else _items(data)
+
+    async def create(self, endpoint: str, payload: dict) -> dict | None:
+        """Создать объект. None - трекер не создал"""
+        try:
+            r = await self.request("POST", _api(self.base, endpoint), json=payload)
+            if r.status_code >= 400:
+                return None
+            return r.json()
+        except (ValueError, *TRANSPORT_ERRORS):
+            return None
+
+    async def import_zip(
+        self, endpoint: str, zip_path: str, name: str, group_id: int | None
+    ) -> dict | None:
+        """Загрузить ZIP через /import. None - не загружен"""
+        data = {"name": name}
+        if group_id:
+            data["group_id"] = str(group_id)
+        try:
+            async with self._files:
+                with open(zip_path, "rb") as f:
+                    files = {"file": (os.path.basename(zip_path), f, "application/zip")}
+                    r = await self.request(
+                        "POST", _api(self.base, f"{endpoint}/import"), files=files, data=data
+                    )
+            if r.status_code >= 400:
+                return None
+            return r.json()
+        except (ValueError, *TRANSPORT_ERRORS):
+            return None
+
+    async def download(
+        self, endpoint: str, item_id, save, hint: dict | None = None, direct: tuple = ()
+    ):
+        """Скачать архив: прямые URL (direct), затем пути скачивания трекера.
+
+        save(response) сохраняет тело и возвращает результат скрипта; он и
+        возвращается. None - ни один URL не отдал ZIP. hint["pattern"] - как
+        в синхронном скачивании: сработавший шаблон пробуется первым.
+        """
+        hint = hint if hint is not None else {}
+        urls = [(None, u) for u in direct if u]
+        urls += keitaro_capabilities.download_urls(
+            self.base, endpoint, item_id, hint.get("pattern")
+        )
+        for pattern, url in urls:
+            async with self._sem:
+                result = await asyncio.to_thread(self._download_sync, url, save)
+            if result is not None:
+                if pattern:
+                    hint["pattern"] = pattern
+                return result
+        return None
+
+    def _download_sync(self, url: str, save):
+        try:
+            r = self._session.get(url, timeout=self.timeout, stream=True)
+        except requests.RequestException:
+            return None
+        with r:
+            if not _is_archive(r):
+                return None
+            return save(r)
+
+
+class SyncKeitaro:
+    """Синхронная обертка над AsyncKeitaro для обычных скриптов.
+
+    Каждый метод обрабатывает пачку запросов в отдельном event loop.
+    """
+
+    def __init__(
+        self,
+        base: str,
+        api_key: str,
+        timeout: int = 90,
+        concurrency: int = 10,
+        connect_timeout: float | None = None,
+        breaker: keitaro_http.CircuitBreaker | None = None,
+    ):
+        self.args = (base, api_key, timeout, concurrency, connect_timeout, breaker)
+
+    def _run(self, fn):
+        async def runner():
+            async with AsyncKeitaro(*self.args) as client:
+                return await fn(client)
+
+        return asyncio.run(runner())
+
+    def list_all(self, endpoint: str, per_page: int = 200, params: dict | None = None) -> list:
+        return self._run(lambda c: c.list_all(endpoint, per_page, params))
+
+    def list_many(self, endpoints: list[str], per_page: int = 200) -> dict[str, list]:
+        """Несколько списков параллельно. Возвращает {endpoint: items}"""
+
+        async def fn(c):
+            lists = await asyncio.gather(*(c.list_all(ep, per_page) for ep in endpoints))
+            return dict(zip(endpoints, lists))
+
+        return self._run(fn)
+
+    def campaigns_bundle(self, ids: list) -> dict:
+        """Детали и потоки кампаний. Возвращает {id: (details | None, flows | None)}"""
+
+        async def one(c, campaign_id):
+            return await asyncio.gather(c.details("campaigns", campaign_id), c.flows(campaign_id))
+
+        async def fn(c):
+            results = await asyncio.gather(*(one(c, i) for i in ids))
+            return {i: tuple(r) for i, r in zip(ids, results)}
+
+        return self._run(fn)
+
+    def download_many(self, endpoint: str, jobs: list[tuple], hint: dict | None = None) -> dict:
+        """Скачать архивы. jobs = [(item_id, save, direct_urls)]. Возвращает {id: результат save | None}"""
+
+        async def fn(c):
+            results = await asyncio.gather(
+                *(c.download(endpoint, i, save, hint, direct) for i, save, direct in jobs)
+            )
+            return {i: result for (i, _, _), result in zip(jobs, results)}
+
+        return self._run(fn)
+
+    def import_many(self, endpoint: str, jobs: list[tuple]) -> list:
+        """Импорт ZIP. jobs = [(zip_path, name, group_id)]. Возвращает ответы по порядку"""
+
+        async def fn(c):
+            return await asyncio.gather(*(c.import_zip(endpoint, *job) for job in jobs))
+
+        return self._run(fn)
+
+    def create_many(self, endpoint: str, payloads: list[dict]) -> list:
+        """Создание объектов. Возвращает ответы по порядку"""
+
+        async def fn(c):
+            return await asyncio.gather(*(c.create(endpoint, p) for p in payloads))
+
+        return self._run(fn)
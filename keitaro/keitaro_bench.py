@@ -0,0 +1,634 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Офлайн-бенчмарк скриптов Keitaro на локальном mock-сервере.
+
+Поднимает локальную имитацию Keitaro Admin API (офферы, лендинги, кампании,
+потоки, группы, домены, скачивание ZIP, импорт и создание объектов) с
+настраиваемой задержкой, долей ошибок и ответов 429, затем замеряет время
+работы keitaro_universal_export, keitaro_import, keitaro_campaigns_export и
+keitaro_campaigns_import на нескольких размерах данных.
+
+Результаты дописываются в RESULTS_FILE, при повторном запуске скрипт сравнивает
+время с предыдущим замером и подсвечивает регрессии.
+
+Запуск (из папки keitaro):
+python3 keitaro_bench.py
+"""
+
+import io
+import os
+import re
+import sys
+import json
+import time
+import random
+import hashlib
+import shutil
+import zipfile
+import tempfile
+import threading
+import importlib
+import contextlib
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# ======================== CONFIG ========================
+CONFIG = {
+    "SIZES": [50, 200, 1000],  # количество офферов/лендингов в наборе данных
+    "CAMPAIGNS_RATIO": 0.2,  # кампаний относительно офферов
+    "FLOWS_PER_CAMPAIGN": 3,
+    "POSTBACKS_PER_CAMPAIGN": 1,
+    "GROUPS": 20,
+    "DOMAINS": 10,
+    "ZIP_SIZE": 64 * 1024,  # примерный размер архива, байт
+    "LARGE_EVERY": 0,  # каждый N-й архив большой (0 - все одинаковые)
+    "LARGE_FACTOR": 20,  # во сколько раз большой архив больше обычного
+    "DOWNLOAD_SUFFIX": "download",  # какой из export/download/archive отдает ZIP
+    "ETAGS": True,  # отдавать ETag/Last-Modified и 304 на условные запросы
+    "RANGES": True,  # поддерживать Range-запросы (докачку)
+    "DROP_RATE": 0.0,  # доля скачиваний архива, обрываемых на середине
+    "BANDWIDTH": 0,  # байт/сек на одно соединение (0 - без ограничения)
+    "SERVER_FILTERS": True,  # фильтровать списки по group_id/state из запроса
+
+    # ========== ПОВЕДЕНИЕ MOCK-СЕРВЕРА ==========
+    "LATENCY": 0.0,  # сек задержки на каждый запрос
+    "ERROR_RATE": 0.0,  # доля ответов 500
+    "RATE_LIMIT_RATE": 0.0,  # доля ответов 429
+    "API_KEY": "bench-key",
+    # ============================================
+
+    "SLEEP_BETWEEN": 0.0,  # подставляется в CONFIG проверяемых скриптов
+    "SCRIPT_OVERRIDES": {},  # доп. настройки скриптов, например {"ENGINE": "async"}
+    "QUIET": True,  # глушить вывод проверяемых скриптов
+    "RESULTS_FILE": "bench_results.json",
+    "REGRESSION_THRESHOLD": 0.2,  # +20% к прошлому замеру считается регрессией
+    "SEED": 42,
+}
+# ====================== /CONFIG ========================
+
+LIST_ENTITIES = ("offers", "landing_pages", "campaigns", "groups", "domains")
+ARCHIVE_ENTITIES = ("offers", "landing_pages")
+
+
+def make_zip(name: str, size: int) -> bytes:
+    """Собрать ZIP-архив лендинга примерно заданного размера"""
+    buf = io.BytesIO()
+    rnd = random.Random(name)
+    payload = rnd.randbytes(max(size - 512, 0))
+    # фиксированная дата - архив побайтно одинаков между запусками
+    stamp = (2025, 1, 1, 0, 0, 0)
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as z:
+        z.writestr(zipfile.ZipInfo("index.html", stamp), f"<html><body>{name}</body></html>")
+        z.writestr(zipfile.ZipInfo("assets/blob.bin", stamp), payload)
+    return buf.getvalue()
+
+
+class MockKeitaro:
+    """Набор данных и счетчики одного mock-трекера"""
+
+    def __init__(self, size: int, seed: int, with_content: bool = True):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.writes = 0  # POST/PUT/DELETE
+        self.injected_errors = 0
+        self.data: dict[str, list[dict]] = {e: [] for e in LIST_ENTITIES}
+        self.flows: dict[int, list[dict]] = {}
+        self.archives: dict[tuple, bytes] = {}
+        self.next_id = 100000
+        rnd = random.Random(seed)
+
+        for i in range(1, CONFIG["DOMAINS"] + 1):
+            self.data["domains"].append({"id": i, "name": f"domain{i}.example"})
+        if not with_content:
+            return
+
+        for i in range(1, CONFIG["GROUPS"] + 1):
+            self.data["groups"].append({"id": i, "name": f"Group {i}"})
+        for entity, prefix in (("offers", "Offer"), ("landing_pages", "Lander")):
+            for i in range(1, size + 1):
+                gid = rnd.randint(1, CONFIG["GROUPS"])
+                self.data[entity].append(
+                    {
+                        "id": i,
+                        "name": f"{prefix} {i}",
+                        "group_id": gid,
+                        "group": {"id": gid, "name": f"Group {gid}"},
+                        "state": "active",
+                        "updated_at": f"2025-01-{(i % 28) + 1:02d} 00:00:00",
+                    }
+                )
+
+        for i in range(1, max(int(size * CONFIG["CAMPAIGNS_RATIO"]), 1) + 1):
+            gid = rnd.randint(1, CONFIG["GROUPS"])
+            self.data["campaigns"].append(
+                {
+                    "id": i,
+                    "name": f"Campaign {i}",
+                    "alias": f"c{i}",
+                    "type": "position",
+                    "state": "active",
+                    "group_id": gid,
+                    "domain_id": rnd.randint(1, CONFIG["DOMAINS"]),
+                    "cost_type": "CPC",
+                    "cost_value": 0,
+                    "postbacks": [
+                        {"id": i * 10 + p, "url": f"https://pb.example/{i}/{p}", "method": "GET"}
+                        for p in range(CONFIG["POSTBACKS_PER_CAMPAIGN"])
+                    ],
+                    "updated_at": f"2025-01-{(i % 28) + 1:02d} 00:00:00",
+                }
+            )
+            self.flows[i] = [
+                {
+                    "id": i * 100 + f,
+                    "name": f"Flow {f}",
+                    "type": "regular",
+                    "position": f,
+                    "weight": 100,
+                    "state": "active",
+                    "schema": "landings",
+                    "offer_id": rnd.randint(1, size),
+                    "landing_id": rnd.randint(1, size),
+                }
+                for f in range(1, CONFIG["FLOWS_PER_CAMPAIGN"] + 1)
+            ]
+
+    def new_id(self) -> int:
+        with self.lock:
+            self.next_id += 1
+            return self.next_id
+
+    def find(self, entity: str, item_id: int) -> dict | None:
+        for it in self.data.get(entity, []):
+            if it.get("id") == item_id:
+                return it
+        return None
+
+    def archive(self, entity: str, item_id: int) -> bytes:
+        key = (entity, item_id)
+        with self.lock:
+            blob = self.archives.get(key)
+        if blob is None:
+            size = CONFIG["ZIP_SIZE"]
+            if CONFIG["LARGE_EVERY"] and item_id % CONFIG["LARGE_EVERY"] == 0:
+                size *= CONFIG["LARGE_FACTOR"]
+            blob = make_zip(f"{entity}-{item_id}", size)
+            with self.lock:
+                self.archives[key] = blob
+        return blob
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """HTTP-обработчик mock-трекера (self.server.mock - MockKeitaro)"""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # иначе ответы ловят задержку 40 мс (delayed ACK)
+
+    def log_message(self, format, *args):  # noqa: A002 - сигнатура базового класса
+        pass
+
+    # ---------- ответы ----------
+
+    def _send(
+        self,
+        status: int,
+        body: bytes,
+        ctype: str,
+        headers: dict | None = None,
+        drop: bool = False,
+    ):
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        if self.command == "HEAD":
+            return
+        if drop:
+            # обрыв соединения посреди тела ответа
+            self.wfile.write(body[: len(body) // 2])
+            self.close_connection = True
+            return
+        if not CONFIG["BANDWIDTH"]:
+            self.wfile.write(body)
+            return
+        step = 64 * 1024
+        for pos in range(0, len(body), step):
+            self.wfile.write(body[pos: pos + step])
+            time.sleep(min(step, len(body) - pos) / CONFIG["BANDWIDTH"])
+
+    def _json(self, status: int, data, headers: dict | None = None):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self._send(status, body, "application/json", headers)
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _prelude(self) -> bool:
+        """Общая часть: счетчик, задержка, инъекция ошибок, авторизация"""
+        mock: MockKeitaro = self.server.mock
+        with mock.lock:
+            mock.requests += 1
+        if CONFIG["LATENCY"]:
+            time.sleep(CONFIG["LATENCY"])
+        roll = random.random()
+        if roll < CONFIG["RATE_LIMIT_RATE"]:
+            with mock.lock:
+                mock.injected_errors += 1
+            self._json(429, {"error": "Too Many Requests"}, {"Retry-After": "1"})
+            return False
+        if roll < CONFIG["RATE_LIMIT_RATE"] + CONFIG["ERROR_RATE"]:
+            with mock.lock:
+                mock.injected_errors += 1
+            self._json(500, {"error": "Internal Server Error"})
+            return False
+        if self.headers.get("Api-Key") != CONFIG["API_KEY"]:
+            self._json(401, {"error": "Unauthorized"})
+            return False
+        return True
+
+    def _route(self) -> tuple[list[str], dict]:
+        parsed = urlparse(self.path)
+        parts = [p for p in parsed.path.split("/") if p]
+        if parts[:2] == ["admin_api", "v1"]:
+            parts = parts[2:]
+        return parts, parse_qs(parsed.query)
+
+    # ---------- методы ----------
+
+    def do_GET(self):
+        if not self._prelude():
+            return
+        mock: MockKeitaro = self.server.mock
+        parts, query = self._route()
+
+        if len(parts) == 1 and parts[0] in LIST_ENTITIES:
+            items = mock.data[parts[0]]
+            if CONFIG["SERVER_FILTERS"]:
+                for field in ("group_id", "state"):
+                    if query.get(field):
+                        items = [it for it in items if str(it.get(field)) == query[field][0]]
+            per_page = int((query.get("per_page") or ["200"])[0])
+            page = int((query.get("page") or ["1"])[0])
+            total_pages = max((len(items) + per_page - 1) // per_page, 1)
+            chunk = items[(page - 1) * per_page: page * per_page]
+            return self._json(
+                200,
+                {
+                    "data": chunk,
+                    "meta": {
+                        "pagination": {
+                            "total": len(items),
+                            "per_page": per_page,
+                            "current_page": page,
+                            "total_pages": total_pages,
+                        }
+                    },
+                },
+            )
+
+        if len(parts) >= 2 and parts[0] in LIST_ENTITIES and parts[1].isdigit():
+            item_id = int(parts[1])
+            item = mock.find(parts[0], item_id)
+            if item is None:
+                return self._json(404, {"error": "Not found"})
+            if len(parts) == 2:
+                return self._json(200, item)
+            if parts[0] == "campaigns" and parts[2:] == ["flows"]:
+                return self._json(200, mock.flows.get(item_id, []))
+            if parts[0] == "campaigns" and parts[2:] == ["postbacks"]:
+                return self._json(200, item.get("postbacks", []))
+            if parts[0] in ARCHIVE_ENTITIES and len(parts) == 3:
+                if parts[2] != CONFIG["DOWNLOAD_SUFFIX"]:
+                    return self._json(404, {"error": "Not found"})
+                blob = mock.archive(parts[0], item_id)
+                headers = {"Content-Disposition": f'attachment; filename="{item_id}.zip"'}
+                etag = '"%s"' % hashlib.sha1(blob).hexdigest()
+                if CONFIG["ETAGS"]:
+                    headers["ETag"] = etag
+                    headers["Last-Modified"] = "Wed, 01 Jan 2025 00:00:00 GMT"
+                    if self.headers.get("If-None-Match") == etag:
+                        return self._send(304, b"", "application/zip", headers)
+                drop = random.random() < CONFIG["DROP_RATE"]
+                if CONFIG["RANGES"]:
+                    headers["Accept-Ranges"] = "bytes"
+                    m = re.match(r"bytes=(\d+)-$", self.headers.get("Range") or "")
+                    if_range = self.headers.get("If-Range")
+                    if m and int(m.group(1)) < len(blob) and if_range in (None, etag):
+                        start = int(m.group(1))
+                        headers["Content-Range"] = f"bytes {start}-{len(blob) - 1}/{len(blob)}"
+                        return self._send(206, blob[start:], "application/zip", headers, drop)
+                return self._send(200, blob, "application/zip", headers, drop)
+
+        return self._json(404, {"error": "Not found"})
+
+    do_HEAD = do_GET
+
+    def do_POST(self):
+        body = self._read_body()
+        if not self._prelude():
+            return
+        mock: MockKeitaro = self.server.mock
+        with mock.lock:
+            mock.writes += 1
+        parts, _ = self._route()
+
+        # Импорт архива: multipart с полями file/name/group_id
+        if len(parts) == 2 and parts[0] in ARCHIVE_ENTITIES and parts[1] == "import":
+            m = re.search(rb'name="name"\r\n\r\n(.*?)\r\n', body, re.S)
+            name = m.group(1).decode("utf-8", "replace") if m else "imported"
+            item = {"id": mock.new_id(), "name": name}
+            with mock.lock:
+                mock.data[parts[0]].append(item)
+            return self._json(200, item)
+
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            return self._json(400, {"error": "Bad JSON"})
+
+        if len(parts) == 1 and parts[0] in LIST_ENTITIES:
+            item = dict(payload, id=mock.new_id())
+            with mock.lock:
+                mock.data[parts[0]].append(item)
+            return self._json(200, item)
+
+        if len(parts) == 3 and parts[0] == "campaigns" and parts[2] in ("flows", "postbacks"):
+            campaign = mock.find("campaigns", int(parts[1]))
+            if campaign is None:
+                return self._json(404, {"error": "Not found"})
+            item = dict(payload, id=mock.new_id())
+            with mock.lock:
+                if parts[2] == "flows":
+                    mock.flows.setdefault(campaign["id"], []).append(item)
+                else:
+                    campaign.setdefault("postbacks", []).append(item)
+            return self._json(200, item)
+
+        return self._json(404, {"error": "Not found"})
+
+    def _sub_item(self, parts: list[str]) -> tuple[dict | None, list | None, dict | None]:
+        """campaigns/{id}/flows|postbacks/{id}: (кампания, список, элемент)"""
+        mock: MockKeitaro = self.server.mock
+        if len(parts) != 4 or parts[0] != "campaigns" or parts[2] not in ("flows", "postbacks"):
+            return None, None, None
+        if not (parts[1].isdigit() and parts[3].isdigit()):
+            return None, None, None
+        campaign = mock.find("campaigns", int(parts[1]))
+        if campaign is None:
+            return None, None, None
+        if parts[2] == "flows":
+            items = mock.flows.setdefault(campaign["id"], [])
+        else:
+            items = campaign.setdefault("postbacks", [])
+        item = next((it for it in items if it.get("id") == int(parts[3])), None)
+        return campaign, items, item
+
+    def do_PUT(self):
+        body = self._read_body()
+        if not self._prelude():
+            return
+        mock: MockKeitaro = self.server.mock
+        with mock.lock:
+            mock.writes += 1
+        parts, _ = self._route()
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            return self._json(400, {"error": "Bad JSON"})
+
+        if len(parts) == 2 and parts[0] in LIST_ENTITIES and parts[1].isdigit():
+            item = mock.find(parts[0], int(parts[1]))
+        else:
+            _, _, item = self._sub_item(parts)
+        if item is None:
+            return self._json(404, {"error": "Not found"})
+        with mock.lock:
+            item.update(payload, id=item["id"])
+        return self._json(200, item)
+
+    def do_DELETE(self):
+        self._read_body()
+        if not self._prelude():
+            return
+        mock: MockKeitaro = self.server.mock
+        with mock.lock:
+            mock.writes += 1
+        parts, _ = self._route()
+        _, items, item = self._sub_item(parts)
+        if item is None:
+            return self._json(404, {"error": "Not found"})
+        with mock.lock:
+            items.remove(item)
+        return self._json(200, {"success": True})
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # клиенты закрывают недочитанные stream-ответы - это не ошибка mock-а
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+def start_server(mock: MockKeitaro) -> tuple[MockServer, str]:
+    """Запустить mock-сервер в фоновом потоке. Возвращает (server, base_url)"""
+    server = MockServer(("127.0.0.1", 0), MockHandler)
+    server.mock = mock
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def run_script(module_name: str, overrides: dict, env: dict) -> tuple[float, str | None]:
+    """Выполнить main() скрипта с подмененным CONFIG. Возвращает (сек, ошибка)"""
+    module = importlib.import_module(module_name)
+    module = importlib.reload(module)  # чистый CONFIG на каждый прогон
+    module.CONFIG.update(overrides)
+    saved_env = dict(os.environ)
+    os.environ.update(env)
+
+    error = None
+    sink = io.StringIO() if CONFIG["QUIET"] else sys.stdout
+    started = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(sink):
+            module.main()
+    except Exception as e:  # noqa: BLE001 - фиксируем любую ошибку прогона
+        error = f"{type(e).__name__}: {e}"
+    finally:
+        # KEITARO_* одного сценария не должны попасть в следующий
+        os.environ.clear()
+        os.environ.update(saved_env)
+    return time.perf_counter() - started, error
+
+
+def bench_size(size: int, work_dir: str) -> list[dict]:
+    """Прогнать все сценарии на наборе данных заданного размера"""
+    source = MockKeitaro(size, CONFIG["SEED"])
+    target = MockKeitaro(size, CONFIG["SEED"], with_content=False)
+    src_server, src_url = start_server(source)
+    dst_server, dst_url = start_server(target)
+
+    src_env = {"KEITARO_TRACKER_URL": src_url, "KEITARO_API_KEY": CONFIG["API_KEY"]}
+    dst_env = {"KEITARO_TARGET_URL": dst_url, "KEITARO_TARGET_API_KEY": CONFIG["API_KEY"]}
+    common = dict(
+        CONFIG["SCRIPT_OVERRIDES"],
+        API_KEY=CONFIG["API_KEY"],
+        SLEEP_BETWEEN=CONFIG["SLEEP_BETWEEN"],
+    )
+
+    offers_dir = os.path.join(work_dir, f"offers_{size}")
+    landings_dir = os.path.join(work_dir, f"landings_{size}")
+    campaigns_dir = os.path.join(work_dir, f"campaigns_{size}")
+
+    cases = [
+        ("keitaro_universal_export", "offers", source,
+         dict(common, BASE_URL=src_url, EXPORT_TYPE="offers", OUT_DIR=offers_dir), src_env),
+        ("keitaro_universal_export", "offers-rerun", source,
+         dict(common, BASE_URL=src_url, EXPORT_TYPE="offers", OUT_DIR=offers_dir), src_env),
+        ("keitaro_universal_export", "landings", source,
+         dict(common, BASE_URL=src_url, EXPORT_TYPE="landings", OUT_DIR=landings_dir), src_env),
+        ("keitaro_import", "offers", target,
+         dict(common, BASE_URL=dst_url, IMPORT_TYPE="offers", IMPORT_DIR=offers_dir), dst_env),
+        ("keitaro_import", "landings", target,
+         dict(common, BASE_URL=dst_url, IMPORT_TYPE="landings", IMPORT_DIR=landings_dir), dst_env),
+        ("keitaro_campaigns_export", "campaigns", source,
+         dict(common, BASE_URL=src_url, OUT_DIR=campaigns_dir), src_env),
+        ("keitaro_campaigns_import", "campaigns", target,
+         dict(common, BASE_URL=dst_url, IMPORT_DIR=campaigns_dir), dst_env),
+        # повторный прогон в режиме синхронизации: кампании уже совпадают
+        ("keitaro_campaigns_import", "sync", target,
+         dict(common, BASE_URL=dst_url, IMPORT_DIR=campaigns_dir, SYNC=True), dst_env),
+    ]
+
+    results = []
+    try:
+        for module_name, variant, mock, overrides, env in cases:
+            before, writes_before = mock.requests, mock.writes
+            seconds, error = run_script(module_name, overrides, env)
+            row = {
+                "script": module_name,
+                "variant": variant,
+                "size": size,
+                "seconds": round(seconds, 4),
+                "requests": mock.requests - before,
+                "writes": mock.writes - writes_before,
+                "error": error,
+            }
+            results.append(row)
+            status = f"ОШИБКА: {error}" if error else "ok"
+            print(
+                f"    {module_name:<28} {variant:<12} {seconds:8.3f} сек"
+                f"  запросов: {row['requests']:<6} записей: {row['writes']:<6} {status}"
+            )
+    finally:
+        src_server.shutdown()
+        dst_server.shutdown()
+    return results
+
+
+def load_results(path: str) -> list[dict]:
+    if not os.path.isfile(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def run_config() -> dict:
+    """Параметры, от которых зависит время - сравниваем только одинаковые"""
+    keys = (
+        "LATENCY",
+        "ERROR_RATE",
+        "RATE_LIMIT_RATE",
+        "ZIP_SIZE",
+        "LARGE_EVERY",
+        "LARGE_FACTOR",
+        "BANDWIDTH",
+        "SERVER_FILTERS",
+        "DOWNLOAD_SUFFIX",
+        "ETAGS",
+        "RANGES",
+        "DROP_RATE",
+        "SLEEP_BETWEEN",
+        "SCRIPT_OVERRIDES",
+    )
+    return {k: CONFIG[k] for k in keys}
+
+
+def report_regressions(history: list[dict], current: list[dict]) -> int:
+    """Сравнить с последним прошлым замером. Возвращает число регрессий"""
+    previous = {}
+    config = run_config()
+    for run in history:
+        if run.get("config") != config:
+            continue
+        for row in run.get("results", []):
+            previous[(row["script"], row["variant"], row["size"])] = row
+
+    regressions = 0
+    for row in current:
+        prev = previous.get((row["script"], row["variant"], row["size"]))
+        if not prev or prev.get("error") or row.get("error") or not prev["seconds"]:
+            continue
+        delta = (row["seconds"] - prev["seconds"]) / prev["seconds"]
+        if delta > CONFIG["REGRESSION_THRESHOLD"]:
+            regressions += 1
+            print(
+                f"    ⚠ Регрессия: {row['script']} {row['variant']} size={row['size']}: "
+                f"{prev['seconds']:.3f} → {row['seconds']:.3f} сек ({delta:+.0%})"
+            )
+    return regressions
+
+
+def main():
+    random.seed(CONFIG["SEED"])
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    work_dir = tempfile.mkdtemp(prefix="keitaro_bench_")
+    # Кеш справочников и возможностей трекеров - только на время прогона
+    os.environ["KEITARO_CACHE_DIR"] = os.path.join(work_dir, "cache")
+
+    print(f"[INFO] Размеры данных: {CONFIG['SIZES']}")
+    print(
+        f"[INFO] Задержка: {CONFIG['LATENCY']} сек, ошибки: {CONFIG['ERROR_RATE']:.0%}, "
+        f"429: {CONFIG['RATE_LIMIT_RATE']:.0%}"
+    )
+    print(f"[INFO] Временная папка: {work_dir}")
+
+    results = []
+    try:
+        for size in CONFIG["SIZES"]:
+            print(f"\n[size={size}]")
+            results.extend(bench_size(size, work_dir))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    history = load_results(CONFIG["RESULTS_FILE"])
+    print("\n" + "=" * 60)
+    print("СРАВНЕНИЕ С ПРОШЛЫМ ЗАПУСКОМ")
+    print("=" * 60)
+    regressions = report_regressions(history, results)
+    if not regressions:
+        print("    Регрессий нет")
+
+    history.append(
+        {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "config": run_config(),
+            "results": results,
+        }
+    )
+    with open(CONFIG["RESULTS_FILE"], "w", encoding="utf-8") as f:
+        json.dump(history, f, ensure_ascii=False, indent=2)
+    print(f"\nРезультаты сохранены: {CONFIG['RESULTS_FILE']}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,19 +8,52 @@
 
 import os
 import json
-import time
 import requests
 from datetime import datetime
 from urllib.parse import urlencode
+from concurrent.futures import ThreadPoolExecutor
+
+import keitaro_http
+import keitaro_listing
+import keitaro_capabilities
+import keitaro_refcache
+import keitaro_serializer
+import keitaro_catalog
+import keitaro_profile
+from keitaro_async import SyncKeitaro
 
 # ======================== CONFIG ========================
 CONFIG = {
     "BASE_URL": None,  # будет загружено из .env
     "API_KEY": None,   # будет загружено из .env
     "PER_PAGE": 200,
+    "LIST_WORKERS": 4,  # параллельных запросов страниц при загрузке справочников
     "TIMEOUT": 90,
+    "CONNECT_TIMEOUT": 10,  # сек на установку соединения; None - как TIMEOUT
+    "CIRCUIT_BREAKER": 5,  # ошибок API трекера подряд до паузы всех запросов; 0 - выключено (keitaro_http)
+    "BREAKER_PROBE_INTERVAL": 15,  # сек между проверками трекера во время паузы
+    "BREAKER_MAX_OUTAGE": 3600,  # сек ожидания трекера, затем запросы завершаются ошибкой
     "OUT_DIR": None,  # по умолчанию campaigns_export_<timestamp>
     "SLEEP_BETWEEN": 0.2,
+    "ENGINE": "sync",  # "sync" (requests) или "async" (keitaro_async: список, детали и потоки)
+    "ASYNC_CONCURRENCY": 10,  # одновременных запросов в режиме async
+    "CACHE_TTL": 0,  # сек жизни снимка справочников (keitaro_refcache); 0 - кеш выключен
+    "MAPPINGS_MODE": "full",  # "full" - все справочники, "lazy" - только объекты из выгруженных кампаний
+    "LAZY_WORKERS": 8,  # параллельных запросов деталей в режиме lazy
+    "JSON_COMPACT": False,  # JSON без отступов (keitaro_serializer)
+    "JSON_COMPRESS": None,  # None, "gzip" или "zstd" - сжатие JSON-файлов экспорта
+    "CATALOG": True,  # catalog.sqlite в папке экспорта; путь к файлу - общий каталог; False - не писать
+    "PROFILE": None,  # True или путь отчета - профилирование запуска (keitaro_profile)
+
+    # ========== ФИЛЬТРЫ (выборочный экспорт) ==========
+    # group_id и state передаются трекеру в запросе списка, остальное - фильтр на клиенте;
+    # отсеянные кампании не запрашиваются детально
+    "FILTER_GROUP_IDS": None,  # [1, 2] - только эти группы
+    "FILTER_STATE": None,  # например "active"
+    "FILTER_ID_FROM": None,  # ID от (включительно)
+    "FILTER_ID_TO": None,  # ID до (включительно)
+    "FILTER_UPDATED_SINCE": None,  # "2025-01-01" или "2025-01-01 00:00:00"
+    # ==================================================
 }
 # ====================== /CONFIG ========================
 
@@ -45,7 +78,7 @@ def _session(api_key: str) -> requests.Session:
             "Content-Type": "application/json",
         }
     )
-    return s
+    return keitaro_http.mount(s, keitaro_http.http_adapter(CONFIG))
 
 
 def _api(base: str, path: str, params: dict | None = None) -> str:
@@ -58,12 +91,12 @@ def _api(base: str, path: str, params: dict | None = None) -> str:
 
 
 def iter_campaigns(
-    s: requests.Session, base: str, per_page: int, timeout: int
+    s: requests.Session, base: str, per_page: int, timeout: int, params: dict | None = None
 ):
-    """Итерация по всем кампаниям с пагинацией"""
+    """Итерация по всем кампаниям с пагинацией (params - фильтры запроса списка)"""
     page = 1
     while True:
-        url = _api(base, "campaigns", {"per_page": per_page, "page": page})
+        url = _api(base, "campaigns", dict(params or {}, per_page=per_page, page=page))
         r = s.get(url, timeout=timeout)
         r.raise_for_status()
         data = r.json()
@@ -99,8 +132,8 @@ def get_campaign_details(
 
 def get_campaign_flows(
     s: requests.Session, base: str, campaign_id: int, timeout: int
-) -> list:
-    """Получить потоки кампании"""
+) -> list | None:
+    """Получить потоки кампании. None - потоки получить не удалось"""
     try:
         url = _api(base, f"campaigns/{campaign_id}/flows")
         r = s.get(url, timeout=timeout)
@@ -108,107 +141,165 @@ def get_campaign_flows(
         data = r.json()
         return data if isinstance(data, list) else data.get("data", [])
     except requests.RequestException:
-        return []
+        return None
+
+
+def _list_map(s: requests.Session, base: str, endpoint: str, timeout: int) -> dict:
+    """Все страницы списка (параллельно, keitaro_listing). Возвращает {id: name}"""
+    items = keitaro_listing.list_all(
+        s, base, endpoint, timeout, per_page=CONFIG["PER_PAGE"], workers=CONFIG["LIST_WORKERS"]
+    )
+    return {item.get("id"): item.get("name") for item in items}
 
 
 def get_all_offers(s: requests.Session, base: str, timeout: int) -> dict:
     """Получить все офферы для маппинга. Возвращает {id: name}"""
-    offers = {}
     try:
-        page = 1
-        while True:
-            url = _api(base, "offers", {"per_page": 200, "page": page})
-            r = s.get(url, timeout=timeout)
-            r.raise_for_status()
-            data = r.json()
-            items = data.get("data") if isinstance(data, dict) else data
-            if not items:
-                break
-            for offer in items:
-                offers[offer.get("id")] = offer.get("name")
-
-            if isinstance(data, dict):
-                meta = data.get("meta", {})
-                pagination = meta.get("pagination", {})
-                total_pages = pagination.get("total_pages")
-                if not total_pages or page >= int(total_pages):
-                    break
-            page += 1
-    except requests.RequestException:
-        pass
-    return offers
+        return _list_map(s, base, "offers", timeout)
+    except (requests.RequestException, ValueError):
+        return {}
 
 
 def get_all_landings(s: requests.Session, base: str, timeout: int) -> dict:
     """Получить все лендинги для маппинга. Возвращает {id: name}"""
-    landings = {}
-
-    # Пробуем оба эндпоинта
-    for endpoint in ("landing_pages", "landings"):
-        try:
-            page = 1
-            while True:
-                url = _api(base, endpoint, {"per_page": 200, "page": page})
-                r = s.get(url, timeout=timeout)
-                if r.status_code != 200:
-                    break
-                data = r.json()
-                items = data.get("data") if isinstance(data, dict) else data
-                if not items:
-                    break
-                for landing in items:
-                    landings[landing.get("id")] = landing.get("name")
-
-                if isinstance(data, dict):
-                    meta = data.get("meta", {})
-                    pagination = meta.get("pagination", {})
-                    total_pages = pagination.get("total_pages")
-                    if not total_pages or page >= int(total_pages):
-                        break
-                page += 1
-
-            if landings:
-                break
-        except requests.RequestException:
-            continue
-
-    return landings
+    try:
+        endpoint = keitaro_capabilities.landings_endpoint(s, base, timeout)
+        return _list_map(s, base, endpoint, timeout)
+    except (RuntimeError, requests.RequestException, ValueError):
+        return {}
 
 
 def get_all_groups(s: requests.Session, base: str, timeout: int) -> dict:
     """Получить все группы. Возвращает {id: name}"""
-    groups = {}
     try:
-        url = _api(base, "groups", {"per_page": 500})
-        r = s.get(url, timeout=timeout)
-        r.raise_for_status()
-        data = r.json()
-        items = data.get("data") if isinstance(data, dict) else data
-        if items:
-            for g in items:
-                groups[g.get("id")] = g.get("name")
-    except requests.RequestException:
-        pass
-    return groups
+        return _list_map(s, base, "groups", timeout)
+    except (requests.RequestException, ValueError):
+        return {}
 
 
 def get_all_domains(s: requests.Session, base: str, timeout: int) -> dict:
     """Получить все домены. Возвращает {id: name}"""
-    domains = {}
     try:
-        url = _api(base, "domains", {"per_page": 500})
-        r = s.get(url, timeout=timeout)
-        r.raise_for_status()
-        data = r.json()
-        items = data.get("data") if isinstance(data, dict) else data
-        if items:
-            for d in items:
-                domains[d.get("id")] = d.get("name")
-    except requests.RequestException:
-        pass
-    return domains
-
+        return _list_map(s, base, "domains", timeout)
+    except (requests.RequestException, ValueError):
+        return {}
+
+
+def load_reference(s: requests.Session, base: str, entity: str, loader, timeout: int) -> dict:
+    """Справочник {id: name} из свежего снимка кеша или с трекера"""
+    with keitaro_profile.stage("mappings"):
+        pairs = keitaro_refcache.load(base, entity, CONFIG["CACHE_TTL"])
+        if pairs is not None:
+            print(f"    (из кеша)")
+            return {i: n for i, n in pairs}
+        result = loader(s, base, timeout)
+        if CONFIG["CACHE_TTL"] and result:
+            keitaro_refcache.save(base, entity, result.items())
+        return result
+
+
+# Ссылки кампаний и потоков: (сущность справочника, где лежит ID, поле ID)
+REFERENCES = (
+    ("groups", "campaign", "group_id"),
+    ("domains", "campaign", "domain_id"),
+    ("offers", "flow", "offer_id"),
+    ("landings", "flow", "landing_id"),
+)
+
+_memo: dict[tuple, str] = {}  # (сущность, id) -> имя, на весь процесс
+
+
+def referenced_ids(campaigns: list[dict]) -> dict:
+    """ID объектов, на которые ссылаются кампании и их потоки: {сущность: set(id)}"""
+    refs = {entity: set() for entity, _, _ in REFERENCES}
+    for details in campaigns:
+        for entity, owner, field in REFERENCES:
+            owners = [details] if owner == "campaign" else details.get("flows") or []
+            for obj in owners:
+                if obj.get(field):
+                    refs[entity].add(obj[field])
+    return refs
+
+
+def resolve_references(s: requests.Session, base: str, refs: dict, timeout: int) -> dict:
+    """Имена только нужных объектов: снимок кеша или детали по ID (параллельно).
+
+    Возвращает маппинги {сущность: {id: name}} в формате _mappings.json.
+    """
+    endpoints = {"groups": "groups", "domains": "domains", "offers": "offers"}
+    mappings = {}
+    jobs = []
+    for entity, ids in refs.items():
+        pairs = keitaro_refcache.load(base, entity, CONFIG["CACHE_TTL"])
+        if pairs is not None:
+            cached = {i: n for i, n in pairs}
+            for item_id in ids:
+                if item_id in cached:
+                    _memo[(entity, item_id)] = cached[item_id]
+        mappings[entity] = {}
+        for item_id in ids:
+            if (entity, item_id) not in _memo:
+                jobs.append((entity, item_id))
+
+    if any(entity == "landings" for entity, _ in jobs):
+        try:
+            endpoints["landings"] = keitaro_capabilities.landings_endpoint(s, base, timeout)
+        except RuntimeError:
+            jobs = [job for job in jobs if job[0] != "landings"]
 
+    def fetch(job):
+        entity, item_id = job
+        try:
+            r = s.get(_api(base, f"{endpoints[entity]}/{item_id}"), timeout=timeout)
+            if r.status_code == 200:
+                return job, r.json().get("name") or ""
+        except (requests.RequestException, ValueError):
+            pass
+        return job, None
+
+    if jobs:
+        workers = max(int(CONFIG["LAZY_WORKERS"]), 1)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for (entity, item_id), name in pool.map(fetch, jobs):
+                if name is not None:
+                    _memo[(entity, item_id)] = name
+
+    for entity, ids in refs.items():
+        for item_id in ids:
+            if (entity, item_id) in _memo:
+                mappings[entity][item_id] = _memo[(entity, item_id)]
+    print(f"    Запрошено деталей: {len(jobs)}, из кеша: {sum(map(len, refs.values())) - len(jobs)}")
+    return mappings
+
+
+def add_names(details: dict, mappings: dict) -> None:
+    """Добавить читаемые имена группы, домена, офферов и лендингов"""
+    if details.get("group_id"):
+        details["_group_name"] = mappings["groups"].get(details["group_id"], "")
+    if details.get("domain_id"):
+        details["_domain_name"] = mappings["domains"].get(details["domain_id"], "")
+
+    # Добавляем читаемые имена в потоки
+    for flow in details.get("flows") or []:
+        if flow.get("offer_id"):
+            flow["_offer_name"] = mappings["offers"].get(flow["offer_id"], "")
+        if flow.get("landing_id"):
+            flow["_landing_name"] = mappings["landings"].get(flow["landing_id"], "")
+
+
+def save_json(obj, path: str) -> str:
+    """Записать JSON экспорта с учетом JSON_COMPACT/JSON_COMPRESS. Возвращает путь"""
+    with keitaro_profile.stage("write"):
+        return keitaro_serializer.dump(
+            obj, path, compact=CONFIG["JSON_COMPACT"], compress=CONFIG["JSON_COMPRESS"]
+        )
+
+
+def save_mappings(out_root: str, mappings: dict) -> str:
+    return save_json(mappings, os.path.join(out_root, "_mappings.json"))
+
+
+@keitaro_profile.profiled("keitaro_campaigns_export", lambda: CONFIG["PROFILE"])
 def main():
     load_config_from_env()
 
@@ -231,34 +322,37 @@ def main():
     print(f"[INFO] Папка экспорта: {out_root}")
     print()
 
-    # Получаем маппинги для читаемости
-    print("[1/6] Получение офферов...")
-    offers_map = get_all_offers(s, base, timeout)
-    print(f"    Найдено офферов: {len(offers_map)}")
-
-    print("[2/6] Получение лендингов...")
-    landings_map = get_all_landings(s, base, timeout)
-    print(f"    Найдено лендингов: {len(landings_map)}")
-
-    print("[3/6] Получение групп...")
-    groups_map = get_all_groups(s, base, timeout)
-    print(f"    Найдено групп: {len(groups_map)}")
-
-    print("[4/6] Получение доменов...")
-    domains_map = get_all_domains(s, base, timeout)
-    print(f"    Найдено доменов: {len(domains_map)}")
-
-    # Сохраняем маппинги
-    mappings = {
-        "offers": offers_map,
-        "landings": landings_map,
-        "groups": groups_map,
-        "domains": domains_map,
-    }
-    mappings_file = os.path.join(out_root, "_mappings.json")
-    with open(mappings_file, "w", encoding="utf-8") as f:
-        json.dump(mappings, f, ensure_ascii=False, indent=2)
-    print(f"[5/6] Маппинги сохранены: {mappings_file}")
+    lazy = CONFIG["MAPPINGS_MODE"] == "lazy"
+    mappings = None
+    if lazy:
+        print("[1-5/6] Справочники: режим lazy, имена будут получены после выгрузки кампаний")
+    else:
+        # Получаем маппинги для читаемости
+        print("[1/6] Получение офферов...")
+        offers_map = load_reference(s, base, "offers", get_all_offers, timeout)
+        print(f"    Найдено офферов: {len(offers_map)}")
+
+        print("[2/6] Получение лендингов...")
+        landings_map = load_reference(s, base, "landings", get_all_landings, timeout)
+        print(f"    Найдено лендингов: {len(landings_map)}")
+
+        print("[3/6] Получение групп...")
+        groups_map = load_reference(s, base, "groups", get_all_groups, timeout)
+        print(f"    Найдено групп: {len(groups_map)}")
+
+        print("[4/6] Получение доменов...")
+        domains_map = load_reference(s, base, "domains", get_all_domains, timeout)
+        print(f"    Найдено доменов: {len(domains_map)}")
+
+        # Сохраняем маппинги
+        mappings = {
+            "offers": offers_map,
+            "landings": landings_map,
+            "groups": groups_map,
+            "domains": domains_map,
+        }
+        mappings_file = save_mappings(out_root, mappings)
+        print(f"[5/6] Маппинги сохранены: {mappings_file}")
 
     print("[6/6] Экспорт кампаний...")
     print()
@@ -266,47 +360,77 @@ def main():
     campaigns_data = []
     total = 0
     success = 0
-
-    for campaign in iter_campaigns(s, base, CONFIG["PER_PAGE"], timeout):
+    failed: list[dict] = []
+
+    # В режиме async детали и потоки всех кампаний запрашиваются заранее пачкой
+    filters = keitaro_listing.filters_from_config(CONFIG)
+    params = keitaro_listing.filter_params(filters)
+    if filters:
+        print(f"[INFO] Фильтры: {keitaro_listing.describe(filters)}")
+
+    bundle = None
+    if CONFIG["ENGINE"] == "async":
+        engine = SyncKeitaro(
+            base, api_key, timeout, CONFIG["ASYNC_CONCURRENCY"], **keitaro_http.adapter_limits(s)
+        )
+        campaigns_list = list(
+            keitaro_listing.select(engine.list_all("campaigns", CONFIG["PER_PAGE"], params), filters)
+        )
+        with keitaro_profile.stage("details"):
+            bundle = engine.campaigns_bundle([c.get("id") for c in campaigns_list])
+    else:
+        campaigns_list = keitaro_listing.select(
+            iter_campaigns(s, base, CONFIG["PER_PAGE"], timeout, params), filters
+        )
+
+    for campaign in campaigns_list:
         total += 1
         campaign_id = campaign.get("id")
         name = campaign.get("name", f"campaign_{campaign_id}")
 
         print(f"[{total}] Кампания: {name} (ID: {campaign_id})")
 
-        # Получаем полные детали
-        details = get_campaign_details(s, base, campaign_id, timeout)
+        # Получаем полные детали и потоки
+        if bundle is not None:
+            details, flows = bundle.get(campaign_id) or (None, None)
+        else:
+            with keitaro_profile.stage("details"):
+                details = get_campaign_details(s, base, campaign_id, timeout)
+                flows = get_campaign_flows(s, base, campaign_id, timeout) if details else None
         if not details:
             print(f"    ✗ Не удалось получить детали")
+            failed.append({"id": campaign_id, "name": name, "reason": "details_failed"})
+            continue
+        if flows is None:
+            print(f"    ✗ Не удалось получить потоки")
+            failed.append({"id": campaign_id, "name": name, "reason": "flows_failed"})
             continue
 
-        # Получаем потоки
-        flows = get_campaign_flows(s, base, campaign_id, timeout)
         details["flows"] = flows
 
-        # Добавляем читаемые имена для удобства
-        if details.get("group_id"):
-            details["_group_name"] = groups_map.get(details["group_id"], "")
-        if details.get("domain_id"):
-            details["_domain_name"] = domains_map.get(details["domain_id"], "")
-
-        # Добавляем читаемые имена в потоки
-        for flow in flows:
-            if flow.get("offer_id"):
-                flow["_offer_name"] = offers_map.get(flow["offer_id"], "")
-            if flow.get("landing_id"):
-                flow["_landing_name"] = landings_map.get(flow["landing_id"], "")
+        # Добавляем читаемые имена для удобства (в режиме lazy - после цикла)
+        if mappings is not None:
+            add_names(details, mappings)
 
         campaigns_data.append(details)
         success += 1
         print(f"    ✓ Экспортирована с {len(flows)} потоками")
 
-        time.sleep(CONFIG["SLEEP_BETWEEN"])
+        if bundle is None:
+            keitaro_profile.sleep(CONFIG["SLEEP_BETWEEN"])
+
+    # Режим lazy: имена только тех объектов, на которые ссылаются кампании
+    if lazy:
+        print("\n[INFO] Получение упомянутых офферов, лендингов, групп и доменов...")
+        with keitaro_profile.stage("mappings"):
+            mappings = resolve_references(s, base, referenced_ids(campaigns_data), timeout)
+        for details in campaigns_data:
+            add_names(details, mappings)
+        mappings_file = save_mappings(out_root, mappings)
+        print(f"[INFO] Маппинги сохранены: {mappings_file}")
 
     # Сохраняем все кампании
-    campaigns_file = os.path.join(out_root, "campaigns.json")
-    with open(campaigns_file, "w", encoding="utf-8") as f:
-        json.dump(campaigns_data, f, ensure_ascii=False, indent=2)
+    campaigns_file = save_json(campaigns_data, os.path.join(out_root, "campaigns.json"))
 
     # Сохраняем индекс
     index_data = []
@@ -322,9 +446,22 @@ def main():
             "postbacks_count": len(c.get("postbacks", [])),
         })
 
-    index_file = os.path.join(out_root, "campaigns_index.json")
-    with open(index_file, "w", encoding="utf-8") as f:
-        json.dump(index_data, f, ensure_ascii=False, indent=2)
+    index_file = save_json(index_data, os.path.join(out_root, "campaigns_index.json"))
+
+    # Сохраняем failed.json если есть ошибки
+    if failed:
+        with open(os.path.join(out_root, "failed.json"), "w", encoding="utf-8") as f:
+            json.dump(failed, f, ensure_ascii=False, indent=2)
+
+    catalog = keitaro_catalog.target(CONFIG["CATALOG"], out_root)
+    if catalog:
+        try:
+            catalog = keitaro_catalog.write_campaigns(
+                catalog, campaigns_data, mappings, out_root, base
+            )
+        except keitaro_catalog.ERRORS as e:
+            print(f"[WARNING] Каталог не записан: {type(e).__name__}: {e}")
+            catalog = None
 
     # Финальная статистика
     print("\n" + "=" * 60)
@@ -332,10 +469,15 @@ def main():
     print("=" * 60)
     print(f"Всего кампаний:       {total}")
     print(f"Успешно экспортировано: {success}")
+    print(f"Не удалось получить:  {len(failed)}")
     print(f"\nРезультаты в папке:   {out_root}")
     print(f"Кампании:             {campaigns_file}")
     print(f"Индекс:               {index_file}")
     print(f"Маппинги:             {mappings_file}")
+    if catalog:
+        print(f"Каталог:              {catalog}")
+    if failed:
+        print(f"Ошибки:               {os.path.join(out_root, 'failed.json')}")
     print("=" * 60)
 
 
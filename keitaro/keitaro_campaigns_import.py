@@ -9,9 +9,19 @@
 
 import os
 import json
-import time
 import requests
-from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import keitaro_http
+import keitaro_listing
+import keitaro_capabilities
+import keitaro_serializer
+import keitaro_catalog
+import keitaro_campaigns_sync
+import keitaro_refcache
+import keitaro_profile
+from keitaro_async import SyncKeitaro
 
 # ======================== CONFIG ========================
 CONFIG = {
@@ -19,10 +29,32 @@ CONFIG = {
     "API_KEY": None,   # будет загружено из .env
     "IMPORT_DIR": None,  # путь к папке с экспортом
     "TIMEOUT": 90,
+    "CONNECT_TIMEOUT": 10,  # сек на установку соединения; None - как TIMEOUT
+    "CIRCUIT_BREAKER": 5,  # ошибок API трекера подряд до паузы всех запросов; 0 - выключено (keitaro_http)
+    "BREAKER_PROBE_INTERVAL": 15,  # сек между проверками трекера во время паузы
+    "BREAKER_MAX_OUTAGE": 3600,  # сек ожидания трекера, затем запросы завершаются ошибкой
+    "LIST_WORKERS": 4,  # параллельных запросов страниц при загрузке справочников
     "SLEEP_BETWEEN": 0.3,
     "CREATE_GROUPS": True,
     "SKIP_EXISTING": True,  # пропускать если есть с таким именем
     "MATCH_BY_NAME": True,  # сопоставлять офферы/лендинги по именам
+    "ENGINE": "sync",  # "sync" (requests) или "async" (keitaro_async: справочники; кампании создаются синхронно)
+    "ASYNC_CONCURRENCY": 10,  # одновременных запросов в режиме async
+    "CACHE_TTL": 0,  # сек жизни снимка справочников (keitaro_refcache); 0 - кеш выключен
+    "CACHE_INVALIDATE": False,  # сбросить кеш целевого трекера после изменяющего запуска
+    "PROFILE": None,  # True или путь отчета - профилирование запуска (keitaro_profile)
+
+    # ========== ПЛАН ИМПОРТА ==========
+    "DRY_RUN": False,  # только построить план и сохранить его, ничего не создавать
+    "ABORT_ON_MISSING": False,  # не начинать импорт, если есть ненайденные офферы/лендинги
+    "WORKERS": 1,  # сколько кампаний создавать параллельно
+    "USE_CATALOG": True,  # читать кампании из catalog.sqlite экспорта, если он есть
+    # ==================================
+
+    # ========== СИНХРОНИЗАЦИЯ ==========
+    "SYNC": False,  # существующие (по имени) кампании не пропускать, а приводить к исходным
+    "SYNC_DELETE": True,  # при синхронизации удалять потоки/постбэки, которых нет в исходной кампании
+    # ===================================
 }
 # ====================== /CONFIG ========================
 
@@ -38,7 +70,7 @@ def load_config_from_env():
         print("[WARNING] dotenv не установлен, используйте переменные окружения")
 
 
-def _session(api_key: str) -> requests.Session:
+def _session(api_key: str, pool_maxsize: int = 10) -> requests.Session:
     s = requests.Session()
     s.headers.update(
         {
@@ -47,7 +79,7 @@ def _session(api_key: str) -> requests.Session:
             "Content-Type": "application/json",
         }
     )
-    return s
+    return keitaro_http.mount(s, keitaro_http.http_adapter(CONFIG, pool_maxsize))
 
 
 def _api(base: str, path: str) -> str:
@@ -59,52 +91,18 @@ def _api(base: str, path: str) -> str:
 def get_all_items(s: requests.Session, base: str, endpoint: str, timeout: int) -> Dict[str, int]:
     """Получить все элементы. Возвращает {name: id}"""
     items = {}
-    page = 1
-    per_page = 200
-
-    while True:
-        try:
-            url = _api(base, f"{endpoint}?per_page={per_page}&page={page}")
-            r = s.get(url, timeout=timeout)
-            if r.status_code != 200:
-                break
-            data = r.json()
-            entries = data.get("data") if isinstance(data, dict) else data
-            if not entries:
-                break
-
-            for item in entries:
-                name = item.get("name", "")
-                if name:
-                    items[name] = item.get("id")
-
-            # Пагинация
-            if isinstance(data, dict):
-                meta = data.get("meta", {})
-                pagination = meta.get("pagination", {})
-                total_pages = pagination.get("total_pages")
-                if not total_pages or page >= int(total_pages):
-                    break
-            page += 1
-        except requests.RequestException:
-            break
-
+    try:
+        entries = keitaro_listing.list_all(s, base, endpoint, timeout, workers=CONFIG["LIST_WORKERS"])
+    except (requests.RequestException, ValueError):
+        return items
+
+    for item in entries:
+        name = item.get("name", "")
+        if name:
+            items[name] = item.get("id")
     return items
 
 
-def detect_landings_endpoint(s: requests.Session, base: str, timeout: int) -> str:
-    """Определяет правильный эндпоинт для лендингов"""
-    for ep in ("landing_pages", "landings"):
-        try:
-            url = _api(base, f"{ep}?per_page=1")
-            r = s.get(url, timeout=timeout)
-            if r.status_code == 200:
-                return ep
-        except requests.RequestException:
-            pass
-    return "landings"
-
-
 def create_group(s: requests.Session, base: str, name: str, timeout: int) -> Optional[int]:
     """Создать группу"""
     try:
@@ -116,6 +114,90 @@ def create_group(s: requests.Session, base: str, name: str, timeout: int) -> Opt
         return None
 
 
+CAMPAIGN_FIELDS = [
+    "uniqueness_method",
+    "cookies_ttl",
+    "cost_type",
+    "cost_value",
+    "cost_currency",
+    "cost_auto",
+    "notes",
+    "parameters",
+    "bind_visitors",
+    "traffic_source_id",
+    "uniqueness_use_cookies",
+    "traffic_loss",
+    "bypass_cache",
+]
+
+FLOW_FIELDS = [
+    "name",
+    "position",
+    "state",
+    "schema",
+    "action_options",
+    "filter_or",
+    "filters",
+]
+
+
+def campaign_payload(
+    campaign_data: dict, group_id: Optional[int], domain_id: Optional[int]
+) -> dict:
+    """Поля кампании для создания/обновления на целевом трекере"""
+    # Основные поля для создания
+    payload = {
+        "name": campaign_data.get("name"),
+        "type": campaign_data.get("type", "default"),
+        "state": campaign_data.get("state", "active"),
+    }
+
+    # Опциональные поля
+    for field in CAMPAIGN_FIELDS:
+        if field in campaign_data and campaign_data[field] is not None:
+            payload[field] = campaign_data[field]
+
+    # ID маппинги
+    if group_id:
+        payload["group_id"] = group_id
+    if domain_id:
+        payload["domain_id"] = domain_id
+    return payload
+
+
+def flow_payload(
+    flow_data: dict, offer_id: Optional[int], landing_id: Optional[int]
+) -> dict:
+    """Поля потока для создания/обновления на целевом трекере"""
+    payload = {
+        "type": flow_data.get("type", "regular"),
+        "weight": flow_data.get("weight", 100),
+    }
+
+    # Опциональные поля
+    for field in FLOW_FIELDS:
+        if field in flow_data and flow_data[field] is not None:
+            payload[field] = flow_data[field]
+
+    # ID маппинги
+    if offer_id:
+        payload["offer_id"] = offer_id
+    if landing_id:
+        payload["landing_id"] = landing_id
+    return payload
+
+
+def postback_payload(postback_data: dict) -> dict:
+    """Поля постбэка для создания на целевом трекере"""
+    payload = {
+        "url": postback_data.get("url"),
+        "method": postback_data.get("method", "GET"),
+    }
+    if "statuses" in postback_data:
+        payload["statuses"] = postback_data["statuses"]
+    return payload
+
+
 def create_campaign(
     s: requests.Session,
     base: str,
@@ -127,41 +209,7 @@ def create_campaign(
     """Создать кампанию"""
     try:
         url = _api(base, "campaigns")
-
-        # Основные поля для создания
-        payload = {
-            "name": campaign_data.get("name"),
-            "type": campaign_data.get("type", "default"),
-            "state": campaign_data.get("state", "active"),
-        }
-
-        # Опциональные поля
-        optional_fields = [
-            "uniqueness_method",
-            "cookies_ttl",
-            "cost_type",
-            "cost_value",
-            "cost_currency",
-            "cost_auto",
-            "notes",
-            "parameters",
-            "bind_visitors",
-            "traffic_source_id",
-            "uniqueness_use_cookies",
-            "traffic_loss",
-            "bypass_cache",
-        ]
-
-        for field in optional_fields:
-            if field in campaign_data and campaign_data[field] is not None:
-                payload[field] = campaign_data[field]
-
-        # ID маппинги
-        if group_id:
-            payload["group_id"] = group_id
-        if domain_id:
-            payload["domain_id"] = domain_id
-
+        payload = campaign_payload(campaign_data, group_id, domain_id)
         r = s.post(url, json=payload, timeout=timeout)
         r.raise_for_status()
         return r.json()
@@ -184,33 +232,7 @@ def create_flow(
     """Создать поток в кампании"""
     try:
         url = _api(base, f"campaigns/{campaign_id}/flows")
-
-        payload = {
-            "type": flow_data.get("type", "regular"),
-            "weight": flow_data.get("weight", 100),
-        }
-
-        # Опциональные поля
-        optional_fields = [
-            "name",
-            "position",
-            "state",
-            "schema",
-            "action_options",
-            "filter_or",
-            "filters",
-        ]
-
-        for field in optional_fields:
-            if field in flow_data and flow_data[field] is not None:
-                payload[field] = flow_data[field]
-
-        # ID маппинги
-        if offer_id:
-            payload["offer_id"] = offer_id
-        if landing_id:
-            payload["landing_id"] = landing_id
-
+        payload = flow_payload(flow_data, offer_id, landing_id)
         r = s.post(url, json=payload, timeout=timeout)
         r.raise_for_status()
         return r.json()
@@ -229,16 +251,7 @@ def create_postback(
     """Создать постбэк для кампании"""
     try:
         url = _api(base, f"campaigns/{campaign_id}/postbacks")
-
-        payload = {
-            "url": postback_data.get("url"),
-            "method": postback_data.get("method", "GET"),
-        }
-
-        if "statuses" in postback_data:
-            payload["statuses"] = postback_data["statuses"]
-
-        r = s.post(url, json=payload, timeout=timeout)
+        r = s.post(url, json=postback_payload(postback_data), timeout=timeout)
         r.raise_for_status()
         return r.json()
     except requests.RequestException as e:
@@ -246,6 +259,301 @@ def create_postback(
         return None
 
 
+def send_write(
+    s: requests.Session, method: str, url: str, timeout: int, payload: Optional[dict] = None
+) -> bool:
+    """PUT/DELETE для синхронизации. True при успехе"""
+    try:
+        r = s.request(method, url, json=payload, timeout=timeout)
+        r.raise_for_status()
+        return True
+    except requests.RequestException as e:
+        print(f"      ✗ {method} {url}: {e}")
+        return False
+
+
+def get_campaign_postbacks(
+    s: requests.Session, base: str, campaign_id: int, timeout: int
+) -> Optional[List[dict]]:
+    """Постбэки кампании (если трекер не отдает их в деталях кампании)"""
+    try:
+        r = s.get(_api(base, f"campaigns/{campaign_id}/postbacks"), timeout=timeout)
+        if r.status_code != 200:
+            return None
+        data = r.json()
+        return data if isinstance(data, list) else data.get("data", [])
+    except (requests.RequestException, ValueError):
+        return None
+
+
+def build_plan(
+    campaigns_data: Iterable[dict],
+    groups_map: Dict[str, int],
+    domains_map: Dict[str, int],
+    offers_map: Dict[str, int],
+    landings_map: Dict[str, int],
+    existing_campaigns: Dict[str, int],
+) -> dict:
+    """Разрешить все ссылки по картам целевого трекера и составить план импорта.
+
+    Ничего не создает. В плане: группы к созданию, кампании с уже разрешенными
+    ID групп/доменов/офферов/лендингов, пропущенные кампании и ненайденные ссылки.
+    """
+    plan = {
+        "groups_to_create": [],
+        "campaigns": [],
+        "skipped": [],
+        "sync": [],
+        "missing": {"offers": {}, "landings": {}, "domains": {}, "groups": {}},
+    }
+    missing = plan["missing"]
+
+    for number, campaign in enumerate(campaigns_data, start=1):
+        name = campaign.get("name", f"campaign_{number}")
+
+        if CONFIG["SKIP_EXISTING"] and not CONFIG["SYNC"] and name in existing_campaigns:
+            plan["skipped"].append(name)
+            continue
+
+        # Группа: существующая, создаваемая или без группы
+        group_name = campaign.get("_group_name", "")
+        group_id = None
+        if group_name:
+            if group_name in groups_map:
+                group_id = groups_map[group_name]
+            elif CONFIG["CREATE_GROUPS"]:
+                if group_name not in plan["groups_to_create"]:
+                    plan["groups_to_create"].append(group_name)
+            else:
+                missing["groups"].setdefault(group_name, []).append(name)
+
+        # Домен (по имени)
+        domain_name = campaign.get("_domain_name", "")
+        domain_id = domains_map.get(domain_name) if domain_name else None
+        if domain_name and domain_id is None:
+            missing["domains"].setdefault(domain_name, []).append(name)
+
+        flows = []
+        for flow in campaign.get("flows", []):
+            offer_name = flow.get("_offer_name", "")
+            landing_name = flow.get("_landing_name", "")
+            offer_id = offers_map.get(offer_name) if offer_name else None
+            landing_id = landings_map.get(landing_name) if landing_name else None
+            if offer_name and offer_id is None:
+                missing["offers"].setdefault(offer_name, []).append(name)
+            if landing_name and landing_id is None:
+                missing["landings"].setdefault(landing_name, []).append(name)
+            flows.append({"source": flow, "offer_id": offer_id, "landing_id": landing_id})
+
+        step = {
+            "name": name,
+            "source": campaign,
+            "group_name": group_name,
+            "group_id": group_id,
+            "domain_id": domain_id,
+            "flows": flows,
+            "postbacks": campaign.get("postbacks", []),
+        }
+        if CONFIG["SYNC"] and name in existing_campaigns:
+            step["existing_id"] = existing_campaigns[name]
+            plan["sync"].append(step)
+        else:
+            plan["campaigns"].append(step)
+
+    return plan
+
+
+def plan_summary(plan: dict) -> dict:
+    """План без исходных данных кампаний - для сохранения в JSON"""
+    return {
+        "groups_to_create": plan["groups_to_create"],
+        "skipped": plan["skipped"],
+        "missing": plan["missing"],
+        "sync": plan.get("sync_diffs") or [s["name"] for s in plan["sync"]],
+        "sync_unread": plan.get("sync_unread", []),
+        "campaigns": [
+            {
+                "name": step["name"],
+                "group": step["group_name"],
+                "group_id": step["group_id"],
+                "domain_id": step["domain_id"],
+                "flows": [
+                    {
+                        "name": f["source"].get("name"),
+                        "offer_id": f["offer_id"],
+                        "landing_id": f["landing_id"],
+                    }
+                    for f in step["flows"]
+                ],
+                "postbacks": len(step["postbacks"]),
+            }
+            for step in plan["campaigns"]
+        ],
+    }
+
+
+def print_plan(plan: dict) -> None:
+    steps = plan["campaigns"]
+    print(f"    Кампаний к созданию:  {len(steps)}")
+    print(f"    Пропустить (есть):    {len(plan['skipped'])}")
+    if plan["sync"]:
+        print(f"    Синхронизировать:     {len(plan['sync'])}")
+    print(f"    Групп к созданию:     {len(plan['groups_to_create'])}")
+    print(f"    Потоков к созданию:   {sum(len(step['flows']) for step in steps)}")
+    print(f"    Постбэков к созданию: {sum(len(step['postbacks']) for step in steps)}")
+    labels = {
+        "offers": "офферов",
+        "landings": "лендингов",
+        "domains": "доменов",
+        "groups": "групп",
+    }
+    for kind, refs in plan["missing"].items():
+        if not refs:
+            continue
+        print(f"    ⚠ Не найдено {labels[kind]} на целевом трекере: {len(refs)}")
+        for ref_name, campaigns in list(refs.items())[:5]:
+            print(f"      - {ref_name} (кампаний: {len(campaigns)})")
+        if len(refs) > 5:
+            print(f"      ... и еще {len(refs) - 5}")
+
+
+def execute_campaign(
+    s: requests.Session,
+    base: str,
+    step: dict,
+    groups_map: Dict[str, int],
+    number: int,
+    count: int,
+    timeout: int,
+) -> Optional[dict]:
+    """Создать кампанию из плана с потоками и постбэками. Возвращает ошибку или None"""
+    name = step["name"]
+    group_id = step["group_id"] or groups_map.get(step["group_name"])
+
+    print(f"[{number}/{count}] Кампания: {name}")
+    new_campaign = create_campaign(
+        s, base, step["source"], group_id, step["domain_id"], timeout
+    )
+    if not new_campaign:
+        return {"name": name, "reason": "creation_failed"}
+
+    new_campaign_id = new_campaign.get("id")
+    keitaro_refcache.add(base, "campaigns", new_campaign_id, name)
+    print(f"    ✓ Создана кампания (ID: {new_campaign_id})")
+
+    flows = step["flows"]
+    if flows:
+        flows_created = 0
+        for flow in flows:
+            if create_flow(
+                s,
+                base,
+                new_campaign_id,
+                flow["source"],
+                flow["offer_id"],
+                flow["landing_id"],
+                timeout,
+            ):
+                flows_created += 1
+        print(f"    ✓ Создано потоков: {flows_created}/{len(flows)}")
+
+    postbacks = step["postbacks"]
+    if postbacks:
+        postbacks_created = 0
+        for postback in postbacks:
+            if create_postback(s, base, new_campaign_id, postback, timeout):
+                postbacks_created += 1
+        print(f"    ✓ Создано постбэков: {postbacks_created}/{len(postbacks)}")
+
+    keitaro_profile.sleep(CONFIG["SLEEP_BETWEEN"])
+    return None
+
+
+def desired_state(step: dict, groups_map: Dict[str, int]) -> dict:
+    """Кампания из плана в виде тел запросов целевого трекера"""
+    group_id = step["group_id"] or groups_map.get(step["group_name"])
+    return {
+        "campaign": campaign_payload(step["source"], group_id, step["domain_id"]),
+        "flows": [
+            flow_payload(f["source"], f["offer_id"], f["landing_id"]) for f in step["flows"]
+        ],
+        "postbacks": [postback_payload(pb) for pb in step["postbacks"]],
+    }
+
+
+def compute_sync_diffs(
+    s: requests.Session,
+    base: str,
+    api_key: str,
+    steps: List[dict],
+    groups_map: Dict[str, int],
+    timeout: int,
+) -> Tuple[List[tuple], List[dict]]:
+    """Прочитать кампании целевого трекера и сравнить с исходными.
+
+    Возвращает ([(step, diff)], ошибки). Кампания, детали, потоки или
+    постбэки которой не удалось прочитать, не сравнивается: пустой список
+    вместо непрочитанного привел бы к повторному созданию всех потоков.
+    """
+    engine = SyncKeitaro(
+        base, api_key, timeout, CONFIG["ASYNC_CONCURRENCY"], **keitaro_http.adapter_limits(s)
+    )
+    bundle = engine.campaigns_bundle([step["existing_id"] for step in steps])
+    result = []
+    failed = []
+    for step in steps:
+        details, flows = bundle.get(step["existing_id"]) or (None, None)
+        if details and "postbacks" not in details:
+            postbacks = get_campaign_postbacks(s, base, step["existing_id"], timeout)
+            if postbacks is not None:
+                details["postbacks"] = postbacks
+        if not details or flows is None or "postbacks" not in details:
+            what = "кампанию" if not details else "потоки" if flows is None else "постбэки"
+            print(f"    ✗ {step['name']}: не удалось прочитать {what} на целевом трекере")
+            failed.append({"name": step["name"], "reason": "sync_read_failed"})
+            continue
+        diff = keitaro_campaigns_sync.diff_campaign(desired_state(step, groups_map), details, flows)
+        if not CONFIG["SYNC_DELETE"]:
+            diff["flows_delete"] = []
+            diff["postbacks_delete"] = []
+        result.append((step, diff))
+    return result, failed
+
+
+def apply_sync(s: requests.Session, base: str, step: dict, diff: dict, timeout: int) -> Optional[dict]:
+    """Применить diff к кампании целевого трекера. Возвращает ошибку или None"""
+    name = step["name"]
+    campaign_id = diff["campaign_id"]
+    ok = True
+    if diff["update_campaign"] is not None:
+        ok &= send_write(s, "PUT", _api(base, f"campaigns/{campaign_id}"), timeout, diff["update_campaign"])
+    for payload in diff["flows_create"]:
+        try:
+            r = s.post(_api(base, f"campaigns/{campaign_id}/flows"), json=payload, timeout=timeout)
+            r.raise_for_status()
+        except requests.RequestException as e:
+            print(f"      ✗ Ошибка создания потока: {e}")
+            ok = False
+    for flow_id, payload in diff["flows_update"]:
+        ok &= send_write(s, "PUT", _api(base, f"campaigns/{campaign_id}/flows/{flow_id}"), timeout, payload)
+    for flow_id in diff["flows_delete"]:
+        ok &= send_write(s, "DELETE", _api(base, f"campaigns/{campaign_id}/flows/{flow_id}"), timeout)
+    for payload in diff["postbacks_create"]:
+        ok &= create_postback(s, base, campaign_id, payload, timeout) is not None
+    for postback_id in diff["postbacks_delete"]:
+        ok &= send_write(
+            s, "DELETE", _api(base, f"campaigns/{campaign_id}/postbacks/{postback_id}"), timeout
+        )
+    changes = keitaro_campaigns_sync.summary(diff)
+    print(
+        f"    ↻ {name}: кампания {'обновлена' if changes['update_campaign'] else 'без изменений'}, "
+        f"потоки +{changes['flows']['create']} ~{changes['flows']['update']} -{changes['flows']['delete']}, "
+        f"постбэки +{changes['postbacks']['create']} -{changes['postbacks']['delete']}"
+    )
+    return None if ok else {"name": name, "reason": "sync_failed"}
+
+
+@keitaro_profile.profiled("keitaro_campaigns_import", lambda: CONFIG["PROFILE"])
 def main():
     load_config_from_env()
 
@@ -269,12 +577,20 @@ def main():
     campaigns_file = os.path.join(import_dir, "campaigns.json")
     mappings_file = os.path.join(import_dir, "_mappings.json")
 
-    if not os.path.isfile(campaigns_file):
+    catalog = keitaro_catalog.find(import_dir) if CONFIG["USE_CATALOG"] else None
+    conn = keitaro_catalog.connect(catalog) if catalog else None
+    catalog_root = keitaro_catalog.campaigns_root(conn, import_dir) if conn is not None else None
+    if conn is not None and catalog_root is None:
+        conn.close()
+        conn = None  # каталог без кампаний этой папки (например, от экспорта офферов)
+
+    if conn is None and keitaro_serializer.resolve(campaigns_file) is None:
         print(f"❌ ОШИБКА: Файл '{campaigns_file}' не найден")
         return
 
     timeout = CONFIG["TIMEOUT"]
-    s = _session(api_key)
+    workers = max(int(CONFIG["WORKERS"]), 1)
+    s = _session(api_key, max(workers, 10))
 
     print(f"[INFO] Целевой трекер: {base}")
     print(f"[INFO] Папка импорта: {import_dir}")
@@ -282,132 +598,195 @@ def main():
 
     # Загружаем экспортированные данные
     print("[1/7] Загрузка экспортированных кампаний...")
-    with open(campaigns_file, "r", encoding="utf-8") as f:
-        campaigns_data = json.load(f)
-    print(f"    Найдено кампаний: {len(campaigns_data)}")
+    if conn is not None:
+        # Кампании читаются из каталога по одной, имена ссылок - индексным поиском
+        total = keitaro_catalog.count_campaigns(conn, catalog_root)
+        campaigns_data = keitaro_catalog.iter_campaigns(conn, catalog_root)
+        print(f"    Найдено кампаний: {total} (каталог {catalog})")
+    else:
+        campaigns_data = keitaro_serializer.load(campaigns_file)
+        total = len(campaigns_data)
+        print(f"    Найдено кампаний: {total}")
 
     # Загружаем маппинги (если есть)
     source_mappings = {}
-    if os.path.isfile(mappings_file):
-        with open(mappings_file, "r", encoding="utf-8") as f:
-            source_mappings = json.load(f)
+    if conn is None and keitaro_serializer.resolve(mappings_file):
+        source_mappings = keitaro_serializer.load(mappings_file)
+
+    # Справочники целевого трекера: свежий снимок кеша, иначе список с трекера
+    # (в режиме async все недостающие списки запрашиваются параллельно)
+    landings_endpoint = keitaro_capabilities.landings_endpoint(s, base, timeout, default="landings")
+    endpoints = {
+        "groups": "groups",
+        "domains": "domains",
+        "offers": "offers",
+        "landings": landings_endpoint,
+    }
+    if CONFIG["SKIP_EXISTING"] or CONFIG["SYNC"]:
+        endpoints["campaigns"] = "campaigns"
+
+    maps: Dict[str, Dict[str, int]] = {}
+    with keitaro_profile.stage("mappings"):
+        for entity in endpoints:
+            pairs = keitaro_refcache.load(base, entity, CONFIG["CACHE_TTL"])
+            if pairs is not None:
+                maps[entity] = {n: i for i, n in pairs}
+
+    if CONFIG["ENGINE"] == "async":
+        missing = [e for e in endpoints if e not in maps]
+        engine = SyncKeitaro(
+            base, api_key, timeout, CONFIG["ASYNC_CONCURRENCY"], **keitaro_http.adapter_limits(s)
+        )
+        with keitaro_profile.stage("mappings"):
+            lists = engine.list_many([endpoints[e] for e in missing]) if missing else {}
+        for entity in missing:
+            maps[entity] = {
+                it.get("name"): it.get("id")
+                for it in lists.get(endpoints[entity], [])
+                if it.get("name")
+            }
+            if CONFIG["CACHE_TTL"] and maps[entity]:
+                keitaro_refcache.save(base, entity, ((i, n) for n, i in maps[entity].items()))
+
+    def load_map(entity: str) -> Dict[str, int]:
+        if entity not in maps:
+            with keitaro_profile.stage("mappings"):
+                maps[entity] = get_all_items(s, base, endpoints[entity], timeout)
+            if CONFIG["CACHE_TTL"] and maps[entity]:
+                keitaro_refcache.save(base, entity, ((i, n) for n, i in maps[entity].items()))
+        return maps[entity]
 
     # Получаем текущие данные целевого трекера
     print("[2/7] Получение групп...")
-    groups_map = get_all_items(s, base, "groups", timeout)
+    groups_map = load_map("groups")
     print(f"    Найдено групп: {len(groups_map)}")
 
     print("[3/7] Получение доменов...")
-    domains_map = get_all_items(s, base, "domains", timeout)
+    domains_map = load_map("domains")
     print(f"    Найдено доменов: {len(domains_map)}")
 
     print("[4/7] Получение офферов...")
-    offers_map = get_all_items(s, base, "offers", timeout)
+    offers_map = load_map("offers")
     print(f"    Найдено офферов: {len(offers_map)}")
 
     print("[5/7] Получение лендингов...")
-    landings_endpoint = detect_landings_endpoint(s, base, timeout)
-    landings_map = get_all_items(s, base, landings_endpoint, timeout)
+    landings_map = load_map("landings")
     print(f"    Найдено лендингов: {len(landings_map)}")
 
     # Получаем существующие кампании
-    if CONFIG["SKIP_EXISTING"]:
+    if CONFIG["SKIP_EXISTING"] or CONFIG["SYNC"]:
         print("[6/7] Получение существующих кампаний...")
-        existing_campaigns = get_all_items(s, base, "campaigns", timeout)
+        existing_campaigns = load_map("campaigns")
         print(f"    Найдено существующих: {len(existing_campaigns)}")
     else:
         existing_campaigns = {}
         print("[6/7] Пропуск проверки существующих (SKIP_EXISTING=False)")
 
-    # Импорт
-    print("[7/7] Начинаем импорт кампаний...")
-    print()
-
-    total = 0
+    # Планирование: все ссылки разрешаются до первого запроса на запись
+    print("[7/7] Построение плана импорта...")
+    with keitaro_profile.stage("plan"):
+        plan = build_plan(
+            campaigns_data,
+            groups_map,
+            domains_map,
+            offers_map,
+            landings_map,
+            existing_campaigns,
+        )
+    if conn is not None:
+        conn.close()
+    plan_file = os.path.join(import_dir, "campaigns_import_plan.json")
+
+    def save_plan():
+        with open(plan_file, "w", encoding="utf-8") as f:
+            json.dump(plan_summary(plan), f, ensure_ascii=False, indent=2)
+
+    def plan_sync() -> tuple:
+        """Сравнить существующие кампании с исходными, дописать различия в план"""
+        print("\nСравнение существующих кампаний (SYNC)...")
+        with keitaro_profile.stage("sync_compare"):
+            diffs, unread = compute_sync_diffs(s, base, api_key, plan["sync"], groups_map, timeout)
+        plan["sync_diffs"] = [
+            dict(keitaro_campaigns_sync.summary(diff), name=step["name"]) for step, diff in diffs
+        ]
+        plan["sync_unread"] = [f["name"] for f in unread]
+        save_plan()
+        changed = sum(keitaro_campaigns_sync.writes(diff) > 0 for _, diff in diffs)
+        print(f"    Кампаний с изменениями: {changed}/{len(diffs)}")
+        print(f"    Запросов на запись:     {sum(keitaro_campaigns_sync.writes(d) for _, d in diffs)}")
+        if unread:
+            print(f"    Не прочитано (пропущены): {len(unread)}")
+        return diffs, unread
+
+    save_plan()
+    print_plan(plan)
+    print(f"    План сохранен: {plan_file}")
+
+    skipped = len(plan["skipped"])
     success = 0
-    skipped = 0
+    synced = 0
+    in_sync = 0
     failed_list = []
 
-    for campaign in campaigns_data:
-        total += 1
-        name = campaign.get("name", f"campaign_{total}")
-
-        print(f"[{total}/{len(campaigns_data)}] Кампания: {name}")
-
-        # Пропускаем если уже есть
-        if CONFIG["SKIP_EXISTING"] and name in existing_campaigns:
-            print(f"    ⊘ Пропущена (уже существует)")
-            skipped += 1
-            time.sleep(CONFIG["SLEEP_BETWEEN"])
-            continue
-
-        # Маппинг группы
-        group_id = None
-        group_name = campaign.get("_group_name", "")
-        if group_name:
-            if group_name in groups_map:
-                group_id = groups_map[group_name]
-            elif CONFIG["CREATE_GROUPS"]:
-                group_id = create_group(s, base, group_name, timeout)
-                if group_id:
-                    groups_map[group_name] = group_id
-                    print(f"    ✓ Создана группа: {group_name}")
-
-        # Маппинг домена (по имени)
-        domain_id = None
-        domain_name = campaign.get("_domain_name", "")
-        if domain_name and domain_name in domains_map:
-            domain_id = domains_map[domain_name]
-
-        # Создаем кампанию
-        print(f"    → Создание кампании...")
-        new_campaign = create_campaign(s, base, campaign, group_id, domain_id, timeout)
-
-        if not new_campaign:
-            failed_list.append({"name": name, "reason": "creation_failed"})
-            continue
-
-        new_campaign_id = new_campaign.get("id")
-        print(f"    ✓ Создана кампания (ID: {new_campaign_id})")
-
-        # Создаем потоки
-        flows = campaign.get("flows", [])
-        if flows:
-            print(f"    → Создание {len(flows)} потоков...")
-            flows_created = 0
-
-            for flow in flows:
-                # Маппинг оффера
-                offer_id = None
-                offer_name = flow.get("_offer_name", "")
-                if offer_name and offer_name in offers_map:
-                    offer_id = offers_map[offer_name]
-
-                # Маппинг лендинга
-                landing_id = None
-                landing_name = flow.get("_landing_name", "")
-                if landing_name and landing_name in landings_map:
-                    landing_id = landings_map[landing_name]
-
-                if create_flow(s, base, new_campaign_id, flow, offer_id, landing_id, timeout):
-                    flows_created += 1
-
-            print(f"    ✓ Создано потоков: {flows_created}/{len(flows)}")
-
-        # Создаем постбэки
-        postbacks = campaign.get("postbacks", [])
-        if postbacks:
-            print(f"    → Создание {len(postbacks)} постбэков...")
-            postbacks_created = 0
-
-            for postback in postbacks:
-                if create_postback(s, base, new_campaign_id, postback, timeout):
-                    postbacks_created += 1
+    missing = plan["missing"]
+    if CONFIG["DRY_RUN"]:
+        if plan["sync"]:
+            plan_sync()  # группы еще не созданы - их ID в сравнении не участвуют
+        print("\n[DRY_RUN] Импорт не выполнялся")
+        return
+    if CONFIG["ABORT_ON_MISSING"] and (missing["offers"] or missing["landings"]):
+        print("\n❌ Импорт остановлен: есть ненайденные офферы/лендинги (ABORT_ON_MISSING)")
+        return
 
-            print(f"    ✓ Создано постбэков: {postbacks_created}/{len(postbacks)}")
+    # Выполнение: сначала все группы, затем кампании (параллельно при WORKERS > 1)
+    print()
+    print("Выполнение плана...")
+    for group_name in plan["groups_to_create"]:
+        with keitaro_profile.stage("groups"):
+            group_id = create_group(s, base, group_name, timeout)
+        if group_id:
+            groups_map[group_name] = group_id
+            keitaro_refcache.add(base, "groups", group_id, group_name)
+            print(f"    ✓ Создана группа: {group_name}")
+        else:
+            print(f"    ✗ Не удалось создать группу: {group_name}")
+    print()
 
-        success += 1
-        time.sleep(CONFIG["SLEEP_BETWEEN"])
+    def run(numbered):
+        number, step = numbered
+        with keitaro_profile.stage("create"):
+            return execute_campaign(s, base, step, groups_map, number, len(plan["campaigns"]), timeout)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for result in pool.map(run, enumerate(plan["campaigns"], start=1)):
+            if result:
+                failed_list.append(result)
+            else:
+                success += 1
+
+    # Синхронизация существующих кампаний: только изменившиеся настройки, потоки и постбэки
+    if plan["sync"]:
+        all_diffs, unread = plan_sync()
+        failed_list.extend(unread)
+        diffs = [(st, d) for st, d in all_diffs if keitaro_campaigns_sync.writes(d)]
+        in_sync = len(all_diffs) - len(diffs)
+
+        def sync(job):
+            with keitaro_profile.stage("sync_apply"):
+                return apply_sync(s, base, job[0], job[1], timeout)
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for result in pool.map(sync, diffs):
+                if result:
+                    failed_list.append(result)
+                else:
+                    synced += 1
+
+    # Кеш справочников: дописать созданное или сбросить целиком
+    if CONFIG["CACHE_INVALIDATE"] and (success or synced or plan["groups_to_create"]):
+        keitaro_refcache.invalidate(base)
+    else:
+        keitaro_refcache.flush()
 
     # Сохраняем отчет об ошибках
     if failed_list:
@@ -422,6 +801,10 @@ def main():
     print(f"Всего кампаний:        {total}")
     print(f"Успешно импортировано: {success}")
     print(f"Пропущено (есть):      {skipped}")
+    if plan["sync"]:
+        print(f"Синхронизировано:      {synced}")
+        print(f"Уже совпадали:         {in_sync}")
+        print(f"Не прочитано (SYNC):   {len(plan.get('sync_unread', []))}")
     print(f"Ошибок:                {len(failed_list)}")
     if failed_list:
         print(f"\nОшибки сохранены:      {os.path.join(import_dir, 'campaigns_import_failed.json')}")
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Сравнение кампаний исходного и целевого трекера для режима синхронизации
+keitaro_campaigns_import.py (CONFIG["SYNC"] = True).
+
+Для каждой кампании, которая уже есть на целевом трекере (по имени),
+сравниваются отпечатки (sha1 нормализованного JSON) настроек кампании,
+каждого потока и каждого постбэка. Результат - минимальный набор записей:
+обновить кампанию, создать/обновить/удалить потоки, создать/удалить постбэки.
+Сравниваются только поля, которые импорт передает трекеру, поэтому
+служебные поля целевого трекера (id, даты, счетчики) различий не дают.
+"""
+
+import json
+import hashlib
+
+
+def _norm(value):
+    """Привести значение к виду для сравнения: 5 == 5.0 == "5", порядок ключей не важен"""
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return str(int(value)) if float(value).is_integer() else str(float(value))
+    if isinstance(value, str):
+        try:
+            number = float(value)
+        except ValueError:
+            return value
+        return str(int(number)) if number.is_integer() else str(number)
+    if isinstance(value, dict):
+        return {k: _norm(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_norm(v) for v in value]
+    return str(value)
+
+
+def fingerprint(payload: dict) -> str:
+    """Отпечаток набора полей"""
+    data = json.dumps(_norm(payload), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+def project(actual: dict, desired: dict) -> dict:
+    """Поля объекта целевого трекера, которыми управляет импорт"""
+    return {k: actual.get(k) for k in desired}
+
+
+def _flow_keys(flows: list[dict]) -> list[tuple]:
+    """Ключи сопоставления потоков: (имя, номер среди одноименных по position)"""
+    def position(i):
+        try:
+            return float(flows[i].get("position"))
+        except (TypeError, ValueError):
+            return float("inf")
+
+    ordered = sorted(range(len(flows)), key=lambda i: (position(i), i))
+    seen: dict[str, int] = {}
+    keys = [None] * len(flows)
+    for i in ordered:
+        name = flows[i].get("name") or ""
+        keys[i] = (name, seen.get(name, 0))
+        seen[name] = seen.get(name, 0) + 1
+    return keys
+
+
+def diff_campaign(desired: dict, details: dict, flows: list[dict]) -> dict:
+    """Минимальные изменения, чтобы кампания целевого трекера совпала с desired.
+
+    desired = {"campaign": payload, "flows": [payload], "postbacks": [payload]}
+    details / flows - кампания и ее потоки на целевом трекере.
+    """
+    diff = {
+        "campaign_id": details.get("id"),
+        "update_campaign": None,
+        "flows_create": [],
+        "flows_update": [],
+        "flows_delete": [],
+        "postbacks_create": [],
+        "postbacks_delete": [],
+        "postbacks_unknown": "postbacks" not in details,
+    }
+
+    campaign = desired["campaign"]
+    if fingerprint(campaign) != fingerprint(project(details, campaign)):
+        diff["update_campaign"] = campaign
+
+    # Потоки: сопоставление по имени и порядку, сравнение по отпечатку
+    target = dict(zip(_flow_keys(flows), flows))
+    for key, payload in zip(_flow_keys(desired["flows"]), desired["flows"]):
+        current = target.pop(key, None)
+        if current is None:
+            diff["flows_create"].append(payload)
+        elif fingerprint(payload) != fingerprint(project(current, payload)):
+            diff["flows_update"].append((current.get("id"), payload))
+    diff["flows_delete"] = [f.get("id") for f in target.values()]
+
+    # Постбэки: содержимое и есть ключ (изменение = удалить + создать)
+    if not diff["postbacks_unknown"]:
+        remaining = list(details.get("postbacks") or [])
+        for payload in desired["postbacks"]:
+            wanted = fingerprint(payload)
+            match = next(
+                (pb for pb in remaining if fingerprint(project(pb, payload)) == wanted), None
+            )
+            if match is None:
+                diff["postbacks_create"].append(payload)
+            else:
+                remaining.remove(match)
+        diff["postbacks_delete"] = [pb.get("id") for pb in remaining]
+    return diff
+
+
+def writes(diff: dict) -> int:
+    """Число запросов на запись для применения diff"""
+    return (
+        (diff["update_campaign"] is not None)
+        + len(diff["flows_create"])
+        + len(diff["flows_update"])
+        + len(diff["flows_delete"])
+        + len(diff["postbacks_create"])
+        + len(diff["postbacks_delete"])
+    )
+
+
+def summary(diff: dict) -> dict:
+    """Краткое описание diff для плана (без тел запросов)"""
+    return {
+        "campaign_id": diff["campaign_id"],
+        "update_campaign": diff["update_campaign"] is not None,
+        "flows": {
+            "create": len(diff["flows_create"]),
+            "update": len(diff["flows_update"]),
+            "delete": len(diff["flows_delete"]),
+        },
+        "postbacks": {
+            "create": len(diff["postbacks_create"]),
+            "delete": len(diff["postbacks_delete"]),
+        },
+    }
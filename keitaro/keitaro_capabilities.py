@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Возможности трекера, определенные один раз и сохраненные на диск.
+
+Разные версии Keitaro отдают лендинги через landing_pages или landings и
+скачивают архивы по разным путям (export/download/archive, с admin_api или
+без). Скрипты не перебирают варианты при каждом запуске: результат проверки
+хранится в <CACHE_DIR>/<трекер>_capabilities.json (рядом со снимками
+keitaro_refcache) и считается актуальным CAPABILITIES_TTL секунд.
+
+python3 keitaro_capabilities.py show https://tracker.example.com
+python3 keitaro_capabilities.py reset [https://tracker.example.com]
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from urllib.parse import urlencode
+
+import requests
+
+import keitaro_refcache
+
+CAPABILITIES_TTL = 7 * 24 * 3600  # сек; версия трекера меняется редко
+
+LANDINGS_ENDPOINTS = ("landing_pages", "landings")
+
+# Пути скачивания архива относительно BASE_URL, в порядке перебора
+DOWNLOAD_PATTERNS = (
+    "admin_api/v1/{endpoint}/{id}/export",
+    "admin_api/v1/{endpoint}/{id}/download",
+    "admin_api/v1/{endpoint}/{id}/archive",
+    # без admin_api (редко, но бывает)
+    "{endpoint}/{id}/export",
+    "{endpoint}/{id}/download",
+    "{endpoint}/{id}/archive",
+)
+
+_lock = threading.Lock()
+
+
+def _path(base: str) -> str:
+    return os.path.join(
+        keitaro_refcache.CACHE_DIR, f"{keitaro_refcache.tracker_key(base)}_capabilities.json"
+    )
+
+
+def _read(base: str) -> dict:
+    try:
+        with open(_path(base), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def get(base: str, key: str):
+    """Сохраненное значение возможности или None, если его нет или оно устарело"""
+    entry = (_read(base).get("values") or {}).get(key)
+    if not entry or time.time() - entry.get("checked_at", 0) > CAPABILITIES_TTL:
+        return None
+    return entry.get("value")
+
+
+def remember(base: str, key: str, value) -> None:
+    """Сохранить значение возможности трекера"""
+    with _lock:
+        data = _read(base) or {"base": base, "values": {}}
+        data.setdefault("values", {})[key] = {"value": value, "checked_at": time.time()}
+        os.makedirs(keitaro_refcache.CACHE_DIR, exist_ok=True)
+        tmp = f"{_path(base)}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, _path(base))
+
+
+def landings_endpoint(
+    s: requests.Session, base: str, timeout: int, default: str | None = None
+) -> str:
+    """Эндпоинт лендингов (landing_pages или landings): из сохраненных или пробой.
+
+    Если ни один не ответил - возвращает default, а без него бросает RuntimeError.
+    """
+    endpoint = get(base, "landings_endpoint")
+    if endpoint:
+        return endpoint
+    for ep in LANDINGS_ENDPOINTS:
+        url = f"{base.rstrip('/')}/admin_api/v1/{ep}?" + urlencode({"per_page": 1, "page": 1})
+        try:
+            r = s.get(url, timeout=timeout)
+        except requests.RequestException:
+            continue
+        if r.status_code == 200:
+            remember(base, "landings_endpoint", ep)
+            return ep
+    if default:
+        return default
+    raise RuntimeError("Не удалось определить эндпоинт лендингов (landing_pages/landings).")
+
+
+def download_urls(base: str, endpoint: str, item_id, first: str | None = None) -> list[tuple]:
+    """Варианты URL скачивания [(шаблон, url)]; шаблон first - первым"""
+    patterns = list(DOWNLOAD_PATTERNS)
+    if first in patterns:
+        patterns.remove(first)
+        patterns.insert(0, first)
+    root = base.rstrip("/")
+    return [(p, f"{root}/{p.format(endpoint=endpoint, id=item_id)}") for p in patterns]
+
+
+def download_pattern(base: str, endpoint: str) -> str | None:
+    """Шаблон URL, по которому архивы endpoint скачивались в прошлый раз"""
+    return (get(base, "download_patterns") or {}).get(endpoint)
+
+
+def remember_download_pattern(base: str, endpoint: str, pattern: str | None) -> None:
+    """Сохранить рабочий шаблон скачивания, если он изменился"""
+    if not pattern or download_pattern(base, endpoint) == pattern:
+        return
+    patterns = get(base, "download_patterns") or {}
+    patterns[endpoint] = pattern
+    remember(base, "download_patterns", patterns)
+
+
+def reset(base: str | None = None) -> int:
+    """Забыть возможности трекера (или всех трекеров). Возвращает число удаленных файлов"""
+    if base:
+        paths = [_path(base)]
+    elif os.path.isdir(keitaro_refcache.CACHE_DIR):
+        paths = [
+            os.path.join(keitaro_refcache.CACHE_DIR, fn)
+            for fn in os.listdir(keitaro_refcache.CACHE_DIR)
+            if fn.endswith("_capabilities.json")
+        ]
+    else:
+        paths = []
+    removed = 0
+    for path in paths:
+        if os.path.isfile(path):
+            os.remove(path)
+            removed += 1
+    return removed
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("show", "reset"):
+        print("Использование: python3 keitaro_capabilities.py show TRACKER_URL")
+        print("               python3 keitaro_capabilities.py reset [TRACKER_URL]")
+        return
+    base = sys.argv[2] if len(sys.argv) > 2 else None
+    if sys.argv[1] == "reset":
+        removed = reset(base)
+        print(f"[INFO] Удалено файлов возможностей: {removed} ({base or 'все трекеры'})")
+        return
+    if not base:
+        print("❌ ОШИБКА: укажите TRACKER_URL")
+        return
+    values = _read(base).get("values") or {}
+    if not values:
+        print(f"[INFO] Для {base} возможности еще не определялись")
+    for key, entry in values.items():
+        age = int(time.time() - entry.get("checked_at", 0))
+        print(f"    {key}: {json.dumps(entry.get('value'), ensure_ascii=False)} (проверено {age} сек назад)")
+
+
+if __name__ == "__main__":
+    main()
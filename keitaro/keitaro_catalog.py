@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+SQLite-каталог экспорта: все выгруженные объекты в одном индексированном файле.
+
+Экспортеры пишут catalog.sqlite рядом с index.csv / campaigns.json
+(или в общий файл каталога, CONFIG["CATALOG"]):
+офферы и лендинги (путь архива, размер, sha256), справочники
+(офферы, лендинги, группы, домены), кампании, потоки и постбеки.
+Импорт кампаний читает кампании и имена ссылок из каталога, не загружая
+campaigns.json и _mappings.json целиком.
+
+Запросы из командной строки:
+
+python3 keitaro_catalog.py <папка_или_catalog.sqlite> find "Offer 12"
+python3 keitaro_catalog.py <папка> offer "Offer 12"     # кампании, ведущие на оффер (имя или ID)
+python3 keitaro_catalog.py <папка> landing 57           # кампании, ведущие на лендинг
+python3 keitaro_catalog.py <папка> sql "SELECT count(*) FROM flows"
+"""
+
+import os
+import sys
+import json
+import sqlite3
+from datetime import datetime
+
+CATALOG_FILE = "catalog.sqlite"
+
+SCHEMA_VERSION = 2  # PRAGMA user_version; каталог старой схемы пересоздается
+
+# root - папка экспорта, tracker - URL трекера: в общем файле каталога
+# (CONFIG["CATALOG"] = путь) экспорты разных трекеров и папок не пересекаются
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    root TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (root, key)
+);
+CREATE TABLE IF NOT EXISTS items (
+    root TEXT NOT NULL,          -- папка экспорта (file_path - относительно нее)
+    tracker TEXT NOT NULL,
+    kind TEXT NOT NULL,          -- offers / landings
+    id INTEGER NOT NULL,
+    name TEXT,
+    group_name TEXT,
+    file_path TEXT,
+    type TEXT,                   -- zip / json
+    source TEXT,
+    sha256 TEXT,
+    size INTEGER,
+    PRIMARY KEY (root, kind, id)
+);
+CREATE INDEX IF NOT EXISTS items_name ON items (kind, name);
+CREATE INDEX IF NOT EXISTS items_group ON items (kind, group_name);
+CREATE INDEX IF NOT EXISTS items_sha256 ON items (sha256);
+
+CREATE TABLE IF NOT EXISTS refs (
+    tracker TEXT NOT NULL,
+    entity TEXT NOT NULL,        -- offers / landings / groups / domains
+    id INTEGER NOT NULL,
+    name TEXT,
+    PRIMARY KEY (tracker, entity, id)
+);
+CREATE INDEX IF NOT EXISTS refs_name ON refs (entity, name);
+
+CREATE TABLE IF NOT EXISTS campaigns (
+    root TEXT NOT NULL,
+    tracker TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    name TEXT,
+    alias TEXT,
+    group_id INTEGER,
+    group_name TEXT,
+    domain_id INTEGER,
+    domain_name TEXT,
+    type TEXT,
+    state TEXT,
+    data TEXT,                   -- кампания целиком (JSON, с потоками)
+    PRIMARY KEY (root, id)
+);
+CREATE INDEX IF NOT EXISTS campaigns_name ON campaigns (name);
+CREATE INDEX IF NOT EXISTS campaigns_group ON campaigns (group_name);
+
+CREATE TABLE IF NOT EXISTS flows (
+    root TEXT NOT NULL,
+    id INTEGER,
+    campaign_id INTEGER NOT NULL,
+    name TEXT,
+    position INTEGER,
+    offer_id INTEGER,
+    offer_name TEXT,
+    landing_id INTEGER,
+    landing_name TEXT
+);
+CREATE INDEX IF NOT EXISTS flows_campaign ON flows (root, campaign_id);
+CREATE INDEX IF NOT EXISTS flows_offer ON flows (offer_id);
+CREATE INDEX IF NOT EXISTS flows_offer_name ON flows (offer_name);
+CREATE INDEX IF NOT EXISTS flows_landing ON flows (landing_id);
+CREATE INDEX IF NOT EXISTS flows_landing_name ON flows (landing_name);
+
+CREATE TABLE IF NOT EXISTS postbacks (
+    root TEXT NOT NULL,
+    id INTEGER,
+    campaign_id INTEGER NOT NULL,
+    url TEXT,
+    method TEXT
+);
+CREATE INDEX IF NOT EXISTS postbacks_campaign ON postbacks (root, campaign_id);
+"""
+TABLES = ("meta", "items", "refs", "campaigns", "flows", "postbacks")
+# Ошибки записи каталога: экспорт сообщает о них, но не прерывается
+ERRORS = (sqlite3.Error, OSError)
+
+
+def catalog_path(path: str) -> str:
+    """Путь к каталогу: файл как есть, для папки - <папка>/catalog.sqlite"""
+    if os.path.isdir(path):
+        return os.path.join(path, CATALOG_FILE)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    return path
+
+
+def target(setting, out_root: str) -> str | None:
+    """Куда писать каталог по настройке CATALOG: True - папка экспорта, строка - общий файл"""
+    if not setting:
+        return None
+    return out_root if setting is True else str(setting)
+
+
+def find(folder: str) -> str | None:
+    """Каталог в папке экспорта, если он есть"""
+    path = os.path.join(folder, CATALOG_FILE)
+    return path if os.path.isfile(path) else None
+
+
+def connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(catalog_path(path))
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+        # Каталог - производные данные экспорта: старую схему проще пересоздать
+        for table in TABLES:
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _tracker(base: str | None) -> str:
+    return (base or "").rstrip("/")
+
+
+def _set_meta(conn: sqlite3.Connection, root: str, base: str | None) -> None:
+    rows = [(root, "exported_at", datetime.now().isoformat(timespec="seconds"))]
+    if base:
+        rows.append((root, "base_url", base))
+    conn.executemany("INSERT OR REPLACE INTO meta (root, key, value) VALUES (?, ?, ?)", rows)
+
+
+def write_items(
+    path: str, kind: str, rows: list[dict], out_root: str, base: str | None = None
+) -> str:
+    """Записать строки index.csv экспорта офферов/лендингов. Возвращает путь каталога
+
+    path - папка (каталог в ней) или файл общего каталога нескольких экспортов.
+    """
+    path = catalog_path(path)
+    root = os.path.abspath(out_root)
+    with connect(path) as conn:
+        conn.execute("DELETE FROM items WHERE kind = ? AND root = ?", (kind, root))
+        conn.executemany(
+            "INSERT OR REPLACE INTO items "
+            "(root, tracker, kind, id, name, group_name, file_path, type, source, sha256, size) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    root,
+                    _tracker(base),
+                    kind,
+                    row.get("id"),
+                    row.get("name"),
+                    row.get("group"),
+                    row.get("file_path"),
+                    row.get("type"),
+                    row.get("source"),
+                    row.get("sha256") or None,
+                    row.get("size") or None,
+                )
+                for row in rows
+            ),
+        )
+        _set_meta(conn, root, base)
+    conn.close()
+    return path
+
+
+def write_campaigns(
+    path: str, campaigns: list[dict], mappings: dict, out_root: str, base: str | None = None
+) -> str:
+    """Записать кампании, потоки, постбеки и справочники. Возвращает путь каталога"""
+    path = catalog_path(path)
+    root = os.path.abspath(out_root)
+    tracker = _tracker(base)
+    with connect(path) as conn:
+        for table in ("campaigns", "flows", "postbacks"):
+            conn.execute(f"DELETE FROM {table} WHERE root = ?", (root,))
+        for entity, names in mappings.items():
+            conn.executemany(
+                "INSERT OR REPLACE INTO refs (tracker, entity, id, name) VALUES (?, ?, ?, ?)",
+                ((tracker, entity, int(i), n) for i, n in names.items()),
+            )
+        for c in campaigns:
+            conn.execute(
+                "INSERT OR REPLACE INTO campaigns "
+                "(root, tracker, id, name, alias, group_id, group_name, domain_id, domain_name, "
+                "type, state, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    root,
+                    tracker,
+                    c.get("id"),
+                    c.get("name"),
+                    c.get("alias"),
+                    c.get("group_id"),
+                    c.get("_group_name"),
+                    c.get("domain_id"),
+                    c.get("_domain_name"),
+                    c.get("type"),
+                    c.get("state"),
+                    json.dumps(c, ensure_ascii=False),
+                ),
+            )
+            conn.executemany(
+                "INSERT INTO flows (root, id, campaign_id, name, position, offer_id, offer_name, "
+                "landing_id, landing_name) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (
+                        root,
+                        f.get("id"),
+                        c.get("id"),
+                        f.get("name"),
+                        f.get("position"),
+                        f.get("offer_id"),
+                        f.get("_offer_name"),
+                        f.get("landing_id"),
+                        f.get("_landing_name"),
+                    )
+                    for f in c.get("flows") or []
+                ),
+            )
+            conn.executemany(
+                "INSERT INTO postbacks (root, id, campaign_id, url, method) VALUES (?, ?, ?, ?, ?)",
+                (
+                    (root, p.get("id"), c.get("id"), p.get("url"), p.get("method"))
+                    for p in c.get("postbacks") or []
+                ),
+            )
+        _set_meta(conn, root, base)
+    conn.close()
+    return path
+
+
+# ---------- чтение ----------
+
+
+def campaigns_root(conn: sqlite3.Connection, folder: str) -> str | None:
+    """Экспорт кампаний каталога для папки импорта.
+
+    Папка экспорта, если ее кампании есть в каталоге; иначе единственный
+    экспорт кампаний в каталоге (папку могли перенести); None - не найден
+    или экспортов несколько.
+    """
+    roots = [r[0] for r in conn.execute("SELECT DISTINCT root FROM campaigns")]
+    folder = os.path.abspath(folder)
+    if folder in roots:
+        return folder
+    return roots[0] if len(roots) == 1 else None
+
+
+def count_campaigns(conn: sqlite3.Connection, root: str) -> int:
+    return conn.execute("SELECT count(*) FROM campaigns WHERE root = ?", (root,)).fetchone()[0]
+
+
+def iter_campaigns(conn: sqlite3.Connection, root: str):
+    """Кампании экспорта root по одной (в порядке ID), без загрузки всего экспорта в память.
+
+    Недостающие читаемые имена (_group_name, _offer_name, ...) дополняются
+    из справочников каталога.
+    """
+    for row in conn.execute(
+        "SELECT tracker, data FROM campaigns WHERE root = ? ORDER BY id", (root,)
+    ):
+        campaign = json.loads(row["data"])
+        for owner, entity, field, name_field in (
+            ("campaign", "groups", "group_id", "_group_name"),
+            ("campaign", "domains", "domain_id", "_domain_name"),
+            ("flow", "offers", "offer_id", "_offer_name"),
+            ("flow", "landings", "landing_id", "_landing_name"),
+        ):
+            objs = [campaign] if owner == "campaign" else campaign.get("flows") or []
+            for obj in objs:
+                if obj.get(field) and not obj.get(name_field):
+                    obj[name_field] = ref_name(conn, row["tracker"], entity, obj[field])
+        yield campaign
+
+
+def ref_name(conn: sqlite3.Connection, tracker: str, entity: str, item_id) -> str:
+    """Имя объекта справочника трекера по ID (индексный поиск)"""
+    row = conn.execute(
+        "SELECT name FROM refs WHERE tracker = ? AND entity = ? AND id = ?",
+        (tracker, entity, item_id),
+    ).fetchone()
+    return row["name"] if row and row["name"] else ""
+
+
+def campaigns_routing_to(conn: sqlite3.Connection, entity: str, key: str) -> list[dict]:
+    """Кампании, потоки которых ведут на оффер/лендинг (по ID или имени)"""
+    column = "offer" if entity == "offers" else "landing"
+    where = f"f.{column}_id = ?" if str(key).isdigit() else f"f.{column}_name = ?"
+    rows = conn.execute(
+        "SELECT c.tracker, c.id, c.name, c.group_name, count(*) AS flows "
+        f"FROM flows f JOIN campaigns c ON c.root = f.root AND c.id = f.campaign_id WHERE {where} "
+        "GROUP BY c.root, c.id ORDER BY c.tracker, c.id",
+        (int(key) if str(key).isdigit() else key,),
+    )
+    return [dict(r) for r in rows]
+
+
+def find_by_name(conn: sqlite3.Connection, text: str) -> list[dict]:
+    """Объекты всех типов, в имени которых есть text"""
+    like = f"%{text}%"
+    rows = conn.execute(
+        "SELECT 'campaign' AS kind, id, name, group_name FROM campaigns WHERE name LIKE ? "
+        "UNION ALL SELECT kind, id, name, group_name FROM items WHERE name LIKE ? "
+        "UNION ALL SELECT entity, id, name, NULL FROM refs WHERE name LIKE ? "
+        "AND NOT EXISTS (SELECT 1 FROM items i WHERE i.tracker = refs.tracker "
+        "AND i.kind = refs.entity AND i.id = refs.id)",
+        (like, like, like),
+    )
+    return [dict(r) for r in rows]
+
+
+def _print_rows(rows: list[dict]) -> None:
+    if not rows:
+        print("    (ничего не найдено)")
+    for row in rows:
+        print("    " + "  ".join(f"{k}={v}" for k, v in row.items()))
+
+
+def main():
+    commands = ("find", "offer", "landing", "sql")
+    if len(sys.argv) < 4 or sys.argv[2] not in commands:
+        print("Использование: python3 keitaro_catalog.py <папка|catalog.sqlite> "
+              "find|offer|landing|sql <аргумент>")
+        return
+    path = catalog_path(sys.argv[1])
+    if not os.path.isfile(path):
+        print(f"❌ ОШИБКА: каталог '{path}' не найден")
+        return
+    command, arg = sys.argv[2], sys.argv[3]
+    conn = connect(path)
+    if command == "find":
+        _print_rows(find_by_name(conn, arg))
+    elif command in ("offer", "landing"):
+        _print_rows(campaigns_routing_to(conn, command + "s", arg))
+    else:
+        _print_rows([dict(r) for r in conn.execute(arg)])
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Импорт одного экспорта офферов или лендингов сразу на несколько трекеров.
+
+Вместо запуска keitaro_import.py для каждого трекера по очереди:
+index.csv читается один раз, каждый архив читается с диска один раз в
+общий буфер и загружается на все трекеры параллельно. У каждого трекера
+свой ограничитель частоты запросов (RATE_PER_SEC), свои потоки загрузки,
+свой кеш групп и существующих объектов и свой отчет об ошибках
+(import_failed_<трекер>.json в папке импорта).
+
+Трекеры задаются в CONFIG["TARGETS"] или в JSON-файле CONFIG["TARGETS_FILE"]:
+[
+  {"name": "eu", "url": "https://eu.tracker.com", "api_key": "..."},
+  {"name": "us", "url": "https://us.tracker.com", "api_key_env": "KEITARO_US_API_KEY",
+   "rate": 2, "workers": 4}
+]
+rate и workers необязательны (по умолчанию RATE_PER_SEC и TARGET_WORKERS).
+
+python3 keitaro_fanout_import.py
+"""
+
+import os
+import csv
+import json
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+
+import keitaro_listing
+import keitaro_capabilities
+import keitaro_serializer
+import keitaro_refcache
+import keitaro_import
+import keitaro_http
+
+# ======================== CONFIG ========================
+CONFIG = {
+    "TARGETS": [],  # [{"name", "url", "api_key" или "api_key_env", "rate", "workers"}]
+    "TARGETS_FILE": None,  # JSON-файл со списком трекеров (вместо TARGETS)
+
+    # ========== НАСТРОЙКИ ИМПОРТА ==========
+    "IMPORT_TYPE": "offers",  # "offers" или "landings"
+    "IMPORT_DIR": None,  # путь к папке с экспортом (например: "offer_exports_20250103_123456")
+    # =======================================
+
+    "TIMEOUT": 90,
+    "CONNECT_TIMEOUT": 10,  # сек на установку соединения; None - как TIMEOUT
+    "CIRCUIT_BREAKER": 5,  # ошибок API трекера подряд до паузы всех запросов; 0 - выключено (keitaro_http)
+    "BREAKER_PROBE_INTERVAL": 15,  # сек между проверками трекера во время паузы
+    "BREAKER_MAX_OUTAGE": 3600,  # сек ожидания трекера, затем запросы завершаются ошибкой
+    "LIST_WORKERS": 4,  # параллельных запросов страниц при загрузке справочников
+    "RATE_PER_SEC": 3,  # запросов в секунду к одному трекеру; 0 - без ограничения
+    "TARGET_WORKERS": 2,  # потоков загрузки на один трекер
+    "MAX_BUFFERED": 4,  # архивов в памяти, ожидающих загрузки на все трекеры
+    "CREATE_GROUPS": True,  # создавать группы если их нет
+    "SKIP_EXISTING": True,  # пропускать если уже есть с таким именем
+    "CACHE_TTL": 0,  # сек жизни снимка справочников (keitaro_refcache); 0 - кеш выключен
+}
+# ====================== /CONFIG ========================
+
+
+def load_config_from_env():
+    """Загрузить .env: ключи трекеров из api_key_env"""
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        print("[WARNING] dotenv не установлен, используйте переменные окружения")
+
+
+def load_targets() -> list[dict]:
+    """Список трекеров из TARGETS_FILE или TARGETS"""
+    specs = CONFIG["TARGETS"]
+    if CONFIG["TARGETS_FILE"]:
+        with open(CONFIG["TARGETS_FILE"], "r", encoding="utf-8") as f:
+            specs = json.load(f)
+    targets = []
+    for n, spec in enumerate(specs or [], start=1):
+        api_key = spec.get("api_key") or os.getenv(spec.get("api_key_env") or "")
+        if not spec.get("url") or not api_key:
+            print(f"[WARNING] Трекер #{n} пропущен: не указаны url и api_key")
+            continue
+        targets.append(dict(spec, name=spec.get("name") or f"target{n}", api_key=api_key))
+    return targets
+
+
+class Target:
+    """Целевой трекер: сессия, ограничитель, справочники и статистика"""
+
+    def __init__(self, spec: dict, import_type: str, timeout: int):
+        self.name = spec["name"]
+        self.base = spec["url"]
+        self.import_type = import_type
+        self.timeout = timeout
+        self.workers = max(int(spec.get("workers") or CONFIG["TARGET_WORKERS"]), 1)
+        self.limiter = keitaro_http.RateLimiter(spec.get("rate", CONFIG["RATE_PER_SEC"]))
+        self.session = keitaro_import._session(spec["api_key"])
+        keitaro_http.mount(
+            self.session,
+            keitaro_http.http_adapter(CONFIG, max(self.workers, CONFIG["LIST_WORKERS"])),
+        )
+        self.pool = ThreadPoolExecutor(max_workers=self.workers)
+
+        self.endpoint = None
+        self.groups: dict = {}
+        self.existing: dict = {}
+        self.group_lock = threading.Lock()
+        self.lock = threading.Lock()
+        self.success = 0
+        self.skipped = 0
+        self.failed: list[dict] = []
+
+    def log(self, message: str) -> None:
+        print(f"[{self.name}] {message}")
+
+    def _reference(self, entity: str, loader) -> dict:
+        """Справочник {name: id} из свежего снимка кеша или через loader()"""
+        pairs = keitaro_refcache.load(self.base, entity, CONFIG["CACHE_TTL"])
+        if pairs is not None:
+            return {n: i for i, n in pairs}
+        result = loader()
+        if CONFIG["CACHE_TTL"] and result:
+            keitaro_refcache.save(self.base, entity, ((i, n) for n, i in result.items()))
+        return result
+
+    def prepare(self) -> None:
+        """Определить эндпоинт и загрузить группы и существующие объекты"""
+        s, base, timeout = self.session, self.base, self.timeout
+        if self.import_type == "landings":
+            self.endpoint = keitaro_capabilities.landings_endpoint(s, base, timeout)
+        else:
+            self.endpoint = "offers"
+        self.groups = self._reference(
+            "groups", lambda: keitaro_import.get_all_groups(s, base, timeout)
+        )
+        if CONFIG["SKIP_EXISTING"]:
+            self.existing = self._reference(
+                self.import_type,
+                lambda: keitaro_import.get_existing_items(s, base, self.endpoint, timeout),
+            )
+        self.log(
+            f"эндпоинт: {self.endpoint}, групп: {len(self.groups)}, "
+            f"существующих: {len(self.existing)}, потоков: {self.workers}"
+        )
+
+    def has(self, name: str) -> bool:
+        return bool(CONFIG["SKIP_EXISTING"] and name in self.existing)
+
+    def group_id(self, group_name: str) -> int | None:
+        """ID группы; создается один раз, даже если нужна нескольким потокам"""
+        if not group_name or group_name == CONFIG.get("GROUP_UNGROUPED", "__NO_GROUP__"):
+            return None
+        with self.group_lock:
+            if group_name in self.groups:
+                return self.groups[group_name]
+            if not CONFIG["CREATE_GROUPS"]:
+                return None
+            self.limiter.acquire()
+            group_id = keitaro_import.create_group(self.session, self.base, group_name, self.timeout)
+            if group_id:
+                self.groups[group_name] = group_id
+                keitaro_refcache.add(self.base, "groups", group_id, group_name)
+            return group_id
+
+    def fail(self, item: dict, reason: str) -> None:
+        with self.lock:
+            self.failed.append({"id": item.get("id"), "name": item.get("name"), "reason": reason})
+
+    def skip(self) -> None:
+        with self.lock:
+            self.skipped += 1
+
+    def run(self, item: dict, payload) -> None:
+        """import_item в пуле трекера: исключение - ошибка объекта, а не потерянный Future"""
+        try:
+            self.import_item(item, payload)
+        except Exception as e:  # noqa: BLE001 - ошибка одного объекта не останавливает импорт
+            self.log(f"✗ {item.get('name')}: {type(e).__name__}: {e}")
+            self.fail(item, f"error: {type(e).__name__}: {e}")
+
+    def import_item(self, item: dict, payload) -> None:
+        """Загрузить один объект; payload - байты ZIP или данные JSON (общие для всех трекеров)"""
+        name = item.get("name")
+        group_id = self.group_id(item.get("group"))
+        self.limiter.acquire()
+        if item.get("type") == "zip":
+            filename = os.path.basename(item.get("file_path") or f"{name}.zip")
+            result = keitaro_import.upload_fileobj(
+                self.session, self.base, self.endpoint, payload, filename, name, group_id, self.timeout
+            )
+        else:
+            result = keitaro_import.create_from_json(
+                self.session, self.base, self.endpoint, payload, name, group_id, self.timeout
+            )
+        if not result:
+            self.log(f"✗ {name}: ошибка импорта")
+            self.fail(item, "import_failed")
+            return
+        with self.lock:
+            self.success += 1
+            self.existing[name] = result.get("id")
+        keitaro_refcache.add(self.base, self.import_type, result.get("id"), name)
+        self.log(f"✓ {name} (ID: {result.get('id')})")
+
+
+def read_payload(import_dir: str, item: dict):
+    """Прочитать архив или JSON один раз для всех трекеров. None - файла нет"""
+    full_path = os.path.join(import_dir, item.get("file_path") or "")
+    if item.get("type") == "json":
+        full_path = keitaro_serializer.resolve(full_path) or full_path
+        if not os.path.isfile(full_path):
+            return None
+        return keitaro_serializer.load(full_path)
+    if not os.path.isfile(full_path):
+        return None
+    with open(full_path, "rb") as f:
+        return f.read()
+
+
+def main():
+    load_config_from_env()
+    import_type = CONFIG["IMPORT_TYPE"].lower()
+    import_dir = CONFIG["IMPORT_DIR"]
+
+    if import_type not in ("offers", "landings"):
+        print(f"❌ ОШИБКА: IMPORT_TYPE должен быть 'offers' или 'landings'")
+        return
+
+    if not import_dir or not os.path.isdir(import_dir):
+        print(f"❌ ОШИБКА: Папка '{import_dir}' не найдена")
+        return
+
+    index_file = os.path.join(import_dir, "index.csv")
+    if not os.path.isfile(index_file):
+        print(f"❌ ОШИБКА: Файл '{index_file}' не найден")
+        return
+
+    # Общие для всех трекеров функции keitaro_import читают свой CONFIG
+    keitaro_import.CONFIG["LIST_WORKERS"] = CONFIG["LIST_WORKERS"]
+
+    timeout = CONFIG["TIMEOUT"]
+    targets = []
+    for spec in load_targets():
+        target = Target(spec, import_type, timeout)
+        try:
+            target.prepare()
+        except (requests.RequestException, RuntimeError) as e:
+            target.log(f"❌ трекер недоступен, пропущен: {e}")
+            continue
+        targets.append(target)
+
+    if not targets:
+        print("❌ ОШИБКА: Нет доступных трекеров (TARGETS / TARGETS_FILE)")
+        return
+
+    with open(index_file, "r", encoding="utf-8") as f:
+        items = list(csv.DictReader(f))
+
+    print(f"[INFO] Режим импорта: {import_type.upper()}")
+    print(f"[INFO] Трекеров: {len(targets)} ({', '.join(t.name for t in targets)})")
+    print(f"[INFO] Записей в index.csv: {len(items)}\n")
+
+    # Не больше MAX_BUFFERED прочитанных архивов ждут загрузки
+    buffered = threading.BoundedSemaphore(max(int(CONFIG["MAX_BUFFERED"]), 1))
+    reads = 0
+
+    def release_when_done(remaining: list[int]):
+        def done(_future):
+            with remaining_lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                buffered.release()
+        return done
+
+    remaining_lock = threading.Lock()
+    try:
+        for item in items:
+            pending = []
+            for target in targets:
+                if target.has(item.get("name")):
+                    target.skip()
+                else:
+                    pending.append(target)
+            if not pending:
+                continue
+
+            buffered.acquire()
+            try:
+                payload = read_payload(import_dir, item)
+            except (OSError, ValueError) as e:
+                payload, error = None, f"read_error: {e}"
+            else:
+                error = "file_not_found"
+            if payload is None:
+                buffered.release()
+                print(f"    ✗ {item.get('name')}: {error}")
+                for target in pending:
+                    target.fail(item, error)
+                continue
+            reads += 1
+
+            done = release_when_done([len(pending)])
+            for target in pending:
+                target.pool.submit(target.run, item, payload).add_done_callback(done)
+    finally:
+        for target in targets:
+            target.pool.shutdown(wait=True)
+
+    keitaro_refcache.flush()
+
+    # Отчеты и статистика по каждому трекеру
+    print("\n" + "=" * 60)
+    print("СТАТИСТИКА ИМПОРТА")
+    print("=" * 60)
+    print(f"Тип импорта:          {import_type.upper()}")
+    print(f"Всего записей:        {len(items)}")
+    print(f"Прочитано файлов:     {reads}")
+    for target in targets:
+        line = (
+            f"{target.name:<12} успешно: {target.success:<6} "
+            f"пропущено: {target.skipped:<6} ошибок: {len(target.failed)}"
+        )
+        if target.failed:
+            failed_file = os.path.join(import_dir, f"import_failed_{target.name}.json")
+            with open(failed_file, "w", encoding="utf-8") as f:
+                json.dump(target.failed, f, ensure_ascii=False, indent=2)
+            line += f" → {failed_file}"
+        print(line)
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Резервная копия нескольких трекеров за один запуск.
+
+Трекеры перечислены в FLEET_FILE (по умолчанию fleet.json):
+{
+  "trackers": [
+    {"name": "eu", "url": "https://eu.tracker.com", "api_key": "..."},
+    {"name": "us", "url": "https://us.tracker.com", "api_key_env": "KEITARO_US_API_KEY",
+     "rate": 10, "concurrency": 6, "exports": ["offers", "campaigns"],
+     "config": {"FILTER_STATE": "active"}}
+  ]
+}
+rate, concurrency, exports и config необязательны (по умолчанию RATE_PER_SEC,
+TRACKER_CONCURRENCY, EXPORTS и EXPORT_CONFIG; config дополняет EXPORT_CONFIG).
+
+Для каждого трекера выполняются keitaro_universal_export.py (офферы,
+лендинги) и keitaro_campaigns_export.py (кампании) - все экспорты всех
+трекеров одновременно, в одном процессе. Каждый экспорт получает свою
+копию модуля со своим CONFIG и пишет в <OUT_DIR>/<трекер>/<тип>.
+Запросы всех экспортов проходят через общий бюджет (BUDGET одновременных
+запросов на весь запуск), лимит трекера (concurrency одновременных
+запросов, rate запросов в секунду - общие для всех экспортов трекера).
+Вывод каждого экспорта пишется в <OUT_DIR>/<трекер>/<тип>.log, итоговая
+сводка - в fleet_summary.json. Пул соединений и CIRCUIT_BREAKER у экспортов
+одного трекера общие: его недоступность приостанавливает все его экспорты.
+
+Экспорты выполняются движком sync (requests): лимиты действуют на его сессии.
+
+python3 keitaro_fleet_export.py
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+import importlib.util
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import keitaro_http
+import keitaro_serializer
+
+# ======================== CONFIG ========================
+CONFIG = {
+    "FLEET_FILE": "fleet.json",  # список трекеров (формат - в описании скрипта)
+    "OUT_DIR": None,  # по умолчанию fleet_backup_<timestamp>
+    "EXPORTS": ["offers", "landings", "campaigns"],  # что выгружать с каждого трекера
+
+    "BUDGET": 16,  # одновременных запросов на все трекеры
+    "TRACKER_CONCURRENCY": 4,  # одновременных запросов к одному трекеру
+    "RATE_PER_SEC": 5,  # запросов в секунду к одному трекеру; 0 - без ограничения
+    "MAX_JOBS": 8,  # одновременно выполняемых экспортов
+    "CONNECT_TIMEOUT": 10,  # сек на установку соединения; None - как TIMEOUT экспорта
+    "CIRCUIT_BREAKER": 5,  # ошибок API трекера подряд до паузы всех его экспортов; 0 - выключено
+    "BREAKER_PROBE_INTERVAL": 15,  # сек между проверками трекера во время паузы
+    "BREAKER_MAX_OUTAGE": 3600,  # сек ожидания трекера, затем запросы завершаются ошибкой
+
+    # Переопределения CONFIG экспортеров для всех трекеров
+    "EXPORT_CONFIG": {"WORKERS": 4, "SLEEP_BETWEEN": 0},
+}
+# ====================== /CONFIG ========================
+
+EXPORTERS = {
+    "offers": "keitaro_universal_export",
+    "landings": "keitaro_universal_export",
+    "campaigns": "keitaro_campaigns_export",
+}
+
+
+class JobOutput:
+    """stdout, который раскладывает вывод экспортов по их лог-файлам.
+
+    Вывод потока экспорта и рабочих потоков его пулов (executor()) попадает
+    в лог экспорта, вывод остальных потоков - в общий fleet.log.
+    """
+
+    def __init__(self, stream, common_path: str):
+        self.stream = stream
+        self.common = open(common_path, "a", encoding="utf-8")
+        self.opened: list = []
+        self.local = threading.local()
+        self.main = threading.get_ident()
+        self.lock = threading.Lock()
+
+    def attach(self, path: str) -> None:
+        self.local.file = open(path, "w", encoding="utf-8")
+        self.opened.append(self.local.file)
+
+    def share(self, f) -> None:
+        """Писать вывод текущего (рабочего) потока в лог f"""
+        self.local.file = f
+
+    def detach(self) -> None:
+        f = getattr(self.local, "file", None)
+        self.local.file = None
+        if f is not None:
+            f.close()
+
+    def executor(self):
+        """ThreadPoolExecutor, рабочие потоки которого пишут в лог создавшего его потока"""
+        output = self
+
+        class JobExecutor(ThreadPoolExecutor):
+            def __init__(self, *args, **kwargs):
+                f = getattr(output.local, "file", None)
+                if f is not None and "initializer" not in kwargs:
+                    kwargs.update(initializer=output.share, initargs=(f,))
+                super().__init__(*args, **kwargs)
+
+        return JobExecutor
+
+    def write(self, text: str) -> int:
+        if threading.get_ident() == self.main:
+            return self.stream.write(text)
+        f = getattr(self.local, "file", None)
+        with self.lock:
+            if f is None or f.closed:
+                f = self.common
+            return f.write(text)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+    def close(self) -> None:
+        for f in self.opened:
+            f.close()
+        self.common.close()
+
+
+def load_config_from_env():
+    """Загрузить .env: ключи трекеров из api_key_env"""
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        print("[WARNING] dotenv не установлен, используйте переменные окружения")
+
+
+def load_fleet(path: str) -> list[dict]:
+    """Трекеры из файла флота"""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    specs = data.get("trackers") if isinstance(data, dict) else data
+    trackers = []
+    for n, spec in enumerate(specs or [], start=1):
+        api_key = spec.get("api_key") or os.getenv(spec.get("api_key_env") or "")
+        if not spec.get("url") or not api_key:
+            print(f"[WARNING] Трекер #{n} пропущен: не указаны url и api_key")
+            continue
+        trackers.append(dict(spec, name=spec.get("name") or f"tracker{n}", api_key=api_key))
+    return trackers
+
+
+def load_exporter(module_name: str, job_name: str, output: JobOutput | None = None):
+    """Отдельная копия модуля экспортера (со своим CONFIG) для одного экспорта.
+
+    С output пулы потоков экспортера пишут в лог экспорта, а не в общий.
+    """
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), f"{module_name}.py")
+    spec = importlib.util.spec_from_file_location(f"{module_name}__{job_name}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    if output is not None and hasattr(module, "ThreadPoolExecutor"):
+        module.ThreadPoolExecutor = output.executor()
+    return module
+
+
+def export_summary(kind: str, out_dir: str) -> dict:
+    """Число выгруженных и неудачных объектов по файлам экспорта"""
+    summary = {"exported": 0, "failed": 0}
+    if kind == "campaigns":
+        index = keitaro_serializer.resolve(os.path.join(out_dir, "campaigns_index.json"))
+        if index:
+            summary["exported"] = len(keitaro_serializer.load(index))
+    else:
+        index = os.path.join(out_dir, "index.csv")
+        if os.path.isfile(index):
+            with open(index, "r", encoding="utf-8") as f:
+                summary["exported"] = max(sum(1 for _ in f) - 1, 0)
+    failed = os.path.join(out_dir, "failed.json")
+    if os.path.isfile(failed):
+        with open(failed, "r", encoding="utf-8") as f:
+            summary["failed"] = len(json.load(f))
+    return summary
+
+
+def main():
+    load_config_from_env()
+    fleet_file = CONFIG["FLEET_FILE"]
+    if not fleet_file or not os.path.isfile(fleet_file):
+        print(f"❌ ОШИБКА: Файл флота '{fleet_file}' не найден")
+        return
+
+    trackers = load_fleet(fleet_file)
+    if not trackers:
+        print("❌ ОШИБКА: В файле флота нет трекеров")
+        return
+
+    out_root = CONFIG["OUT_DIR"] or f"fleet_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    os.makedirs(out_root, exist_ok=True)
+
+    budget = threading.BoundedSemaphore(max(int(CONFIG["BUDGET"]), 1))
+    jobs = []
+    for tracker in trackers:
+        limiter = keitaro_http.RateLimiter(tracker.get("rate", CONFIG["RATE_PER_SEC"]))
+        concurrency = max(int(tracker.get("concurrency") or CONFIG["TRACKER_CONCURRENCY"]), 1)
+        slots = threading.BoundedSemaphore(concurrency)
+        # Один пул соединений и CIRCUIT_BREAKER на все экспорты трекера
+        adapter = keitaro_http.http_adapter(CONFIG, concurrency)
+        for kind in tracker.get("exports") or CONFIG["EXPORTS"]:
+            if kind not in EXPORTERS:
+                print(f"[WARNING] {tracker['name']}: неизвестный тип экспорта '{kind}'")
+                continue
+            overrides = dict(CONFIG["EXPORT_CONFIG"], **(tracker.get("config") or {}))
+            overrides.update(
+                BASE_URL=tracker["url"],
+                API_KEY=tracker["api_key"],
+                OUT_DIR=os.path.join(out_root, tracker["name"], kind),
+                ENGINE="sync",
+            )
+            if kind != "campaigns":
+                overrides["EXPORT_TYPE"] = kind
+            jobs.append(
+                {
+                    "tracker": tracker["name"],
+                    "kind": kind,
+                    "config": overrides,
+                    "limits": (limiter, (slots, budget)),
+                    "adapter": adapter,
+                }
+            )
+
+    print(f"[INFO] Трекеров: {len(trackers)}, экспортов: {len(jobs)}")
+    print(f"[INFO] Бюджет запросов: {CONFIG['BUDGET']}, одновременных экспортов: {CONFIG['MAX_JOBS']}")
+    print(f"[INFO] Папка: {out_root}\n")
+
+    output = JobOutput(sys.stdout, os.path.join(out_root, "fleet.log"))
+
+    def run(job: dict) -> dict:
+        name = f"{job['tracker']}/{job['kind']}"
+        out_dir = job["config"]["OUT_DIR"]
+        os.makedirs(out_dir, exist_ok=True)
+        limiter, semaphores = job["limits"]
+        counter = [0]
+        row = {"tracker": job["tracker"], "export": job["kind"], "out_dir": out_dir}
+
+        output.attach(f"{out_dir}.log")
+        started = time.perf_counter()
+        try:
+            module = load_exporter(EXPORTERS[job["kind"]], name.replace("/", "_"), output)
+            module.CONFIG.update(job["config"])
+            module.load_config_from_env = lambda: None  # настройки трекера уже в CONFIG
+            make_session = module._session
+            module._session = lambda api_key, *args: keitaro_http.limit_session(
+                keitaro_http.mount(make_session(api_key, *args), job["adapter"]), limiter, semaphores, counter
+            )
+            module.main()
+            row["error"] = None
+        except Exception as e:  # noqa: BLE001 - ошибка одного экспорта не останавливает остальные
+            row["error"] = f"{type(e).__name__}: {e}"
+        finally:
+            output.detach()
+        row.update(export_summary(job["kind"], out_dir))
+        row["seconds"] = round(time.perf_counter() - started, 2)
+        row["requests"] = counter[0]
+        status = f"❌ {row['error']}" if row["error"] else "✓"
+        print(
+            f"[{name}] {status} выгружено: {row['exported']}, ошибок: {row['failed']}, "
+            f"запросов: {row['requests']}, {row['seconds']} сек",
+            file=output.stream,
+        )
+        return row
+
+    started = time.perf_counter()
+    sys.stdout = output
+    try:
+        with ThreadPoolExecutor(max_workers=max(int(CONFIG["MAX_JOBS"]), 1)) as pool:
+            results = list(pool.map(run, jobs))
+    finally:
+        sys.stdout = output.stream
+        output.close()
+    elapsed = time.perf_counter() - started
+
+    summary = {
+        "finished_at": datetime.now().isoformat(timespec="seconds"),
+        "seconds": round(elapsed, 2),
+        "budget": CONFIG["BUDGET"],
+        "exports": results,
+    }
+    summary_file = os.path.join(out_root, "fleet_summary.json")
+    with open(summary_file, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    print("\n" + "=" * 60)
+    print("СВОДКА ЭКСПОРТА ФЛОТА")
+    print("=" * 60)
+    for tracker in trackers:
+        rows = [r for r in results if r["tracker"] == tracker["name"]]
+        parts = ", ".join(f"{r['export']}: {r['exported']}" for r in rows)
+        errors = sum(r["failed"] for r in rows) + sum(bool(r["error"]) for r in rows)
+        print(f"{tracker['name']:<16} {parts} | ошибок: {errors}, запросов: {sum(r['requests'] for r in rows)}")
+    print(f"\nОбщее время:          {elapsed:.2f} сек")
+    print(f"Сводка:               {summary_file}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
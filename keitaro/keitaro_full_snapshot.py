@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Полный снимок трекера за один запуск: офферы, лендинги и кампании.
+
+Вместо трех запусков (keitaro_universal_export.py с EXPORT_TYPE offers и
+landings, затем keitaro_campaigns_export.py):
+- списки офферов и лендингов загружаются один раз и используются и для
+  скачивания архивов, и для маппингов кампаний (_mappings.json);
+- все три экспорта идут одновременно через общий пул соединений и общий
+  бюджет одновременных запросов (BUDGET);
+- результат - одна папка снимка:
+
+    snapshot_<трекер>_<timestamp>/
+        offers/        index.csv, архивы
+        landings/      index.csv, архивы
+        campaigns/     campaigns.json, _mappings.json, campaigns_index.json
+        catalog.sqlite общий каталог всех трех экспортов (пишется после них)
+        manifest.json  трекер, время, количество, файлы, ошибки
+        *.log          вывод каждого экспорта
+
+KEITARO_TRACKER_URL=https://your-tracker-domain.com
+KEITARO_API_KEY=your-api-key
+
+python3 keitaro_full_snapshot.py
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import threading
+import requests
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import keitaro_http
+import keitaro_listing
+import keitaro_capabilities
+import keitaro_refcache
+import keitaro_catalog
+import keitaro_serializer
+from keitaro_fleet_export import JobOutput, load_exporter, export_summary
+
+# ======================== CONFIG ========================
+CONFIG = {
+    "BASE_URL": None,  # будет загружено из .env
+    "API_KEY": None,   # будет загружено из .env
+
+    "OUT_DIR": None,  # по умолчанию snapshot_<трекер>_<timestamp>
+    "TIMEOUT": 90,
+    "CONNECT_TIMEOUT": 10,  # сек на установку соединения; None - как TIMEOUT
+    "CIRCUIT_BREAKER": 5,  # ошибок API трекера подряд до паузы всех экспортов; 0 - выключено (keitaro_http)
+    "BREAKER_PROBE_INTERVAL": 15,  # сек между проверками трекера во время паузы
+    "BREAKER_MAX_OUTAGE": 3600,  # сек ожидания трекера, затем запросы завершаются ошибкой
+    "PER_PAGE": 200,
+    "LIST_WORKERS": 4,  # параллельных запросов страниц при загрузке списков
+    "BUDGET": 8,  # одновременных запросов на все три экспорта (и размер пула соединений)
+
+    # Переопределения CONFIG экспортеров
+    "EXPORT_CONFIG": {"WORKERS": 4, "SLEEP_BETWEEN": 0},
+}
+# ====================== /CONFIG ========================
+
+EXPORTS = (
+    ("offers", "keitaro_universal_export"),
+    ("landings", "keitaro_universal_export"),
+    ("campaigns", "keitaro_campaigns_export"),
+)
+
+
+def load_config_from_env():
+    """Загрузить настройки из .env файла"""
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+        CONFIG["BASE_URL"] = os.getenv("KEITARO_TRACKER_URL")
+        CONFIG["API_KEY"] = os.getenv("KEITARO_API_KEY")
+    except ImportError:
+        print("[WARNING] dotenv не установлен, используйте переменные окружения")
+
+
+def _session(api_key: str) -> requests.Session:
+    s = requests.Session()
+    s.headers.update(
+        {
+            "Api-Key": api_key,
+            "Accept": "application/json",
+        }
+    )
+    return s
+
+
+def write_catalog(path: str, out_root: str, base: str) -> str:
+    """Общий каталог снимка по файлам экспортов. Возвращает путь каталога.
+
+    Экспортеры снимка каталог не пишут: три потока, пишущие один SQLite-файл,
+    мешали бы друг другу, поэтому каталог заполняется после них.
+    """
+    for kind in ("offers", "landings"):
+        out_dir = os.path.join(out_root, kind)
+        index = os.path.join(out_dir, "index.csv")
+        if os.path.isfile(index):
+            with open(index, "r", newline="", encoding="utf-8") as f:
+                keitaro_catalog.write_items(path, kind, list(csv.DictReader(f)), out_dir, base)
+    out_dir = os.path.join(out_root, "campaigns")
+    campaigns_file = keitaro_serializer.resolve(os.path.join(out_dir, "campaigns.json"))
+    if campaigns_file:
+        mappings_file = keitaro_serializer.resolve(os.path.join(out_dir, "_mappings.json"))
+        mappings = keitaro_serializer.load(mappings_file) if mappings_file else {}
+        keitaro_catalog.write_campaigns(
+            path, keitaro_serializer.load(campaigns_file), mappings, out_dir, base
+        )
+    return path
+
+
+def main():
+    load_config_from_env()
+
+    base = CONFIG["BASE_URL"]
+    api_key = CONFIG["API_KEY"]
+
+    if not base or not api_key:
+        print("❌ ОШИБКА: Не указаны KEITARO_TRACKER_URL или KEITARO_API_KEY в .env")
+        return
+
+    timeout = CONFIG["TIMEOUT"]
+    started_at = datetime.now()
+    out_root = CONFIG["OUT_DIR"] or (
+        f"snapshot_{keitaro_refcache.tracker_key(base)}_{started_at.strftime('%Y%m%d_%H%M%S')}"
+    )
+    os.makedirs(out_root, exist_ok=True)
+
+    # Общий пул соединений, бюджет запросов и CIRCUIT_BREAKER для всех экспортов
+    budget = max(int(CONFIG["BUDGET"]), 1)
+    adapter = keitaro_http.http_adapter(CONFIG, budget)
+    slots = threading.BoundedSemaphore(budget)
+    counters = {kind: [0] for kind, _ in EXPORTS}
+    counters["lists"] = [0]
+
+    def session(make, counter, *args) -> requests.Session:
+        s = keitaro_http.mount(make(api_key, *args), adapter)
+        return keitaro_http.limit_session(s, None, (slots,), counter)
+
+    s = session(_session, counters["lists"])
+
+    print(f"[INFO] Подключение к: {base}")
+    print(f"[INFO] Папка снимка: {out_root}")
+    print(f"[INFO] Бюджет запросов: {budget}\n")
+
+    # Списки офферов и лендингов - один раз на весь снимок
+    print("[1/3] Получение списков офферов и лендингов...")
+    endpoints = {
+        "offers": "offers",
+        "landings": keitaro_capabilities.landings_endpoint(s, base, timeout),
+    }
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = {
+            kind: pool.submit(
+                keitaro_listing.list_all, s, base, endpoint, timeout,
+                CONFIG["PER_PAGE"], CONFIG["LIST_WORKERS"],
+            )
+            for kind, endpoint in endpoints.items()
+        }
+        lists = {kind: fut.result() for kind, fut in futures.items()}
+    listed_at = datetime.now().isoformat(timespec="seconds")
+    for kind, items in lists.items():
+        print(f"    {kind}: {len(items)}")
+
+    def prepare(kind: str, module_name: str):
+        module = load_exporter(module_name, f"snapshot_{kind}", output)
+        module.CONFIG.update(CONFIG["EXPORT_CONFIG"])
+        module.CONFIG.update(
+            BASE_URL=base,
+            API_KEY=api_key,
+            TIMEOUT=timeout,
+            PER_PAGE=CONFIG["PER_PAGE"],
+            OUT_DIR=os.path.join(out_root, kind),
+            CATALOG=False,  # общий каталог - после всех экспортов (write_catalog)
+            ENGINE="sync",
+        )
+        module.load_config_from_env = lambda: None  # трекер уже в CONFIG
+        make_session = module._session
+        module._session = lambda key, *args: session(make_session, counters[kind], *args)
+        if kind == "campaigns":
+            # Маппинги офферов и лендингов - из уже загруженных списков
+            names = {k: {it.get("id"): it.get("name") for it in v} for k, v in lists.items()}
+            module.CONFIG["MAPPINGS_MODE"] = "full"
+            module.get_all_offers = lambda *args: names["offers"]
+            module.get_all_landings = lambda *args: names["landings"]
+        else:
+            module.CONFIG["EXPORT_TYPE"] = kind
+            module.iter_items = lambda *args, **kwargs: iter(lists[kind])
+        return module
+
+    print("[2/3] Экспорт офферов, лендингов и кампаний...")
+    output = JobOutput(sys.stdout, os.path.join(out_root, "snapshot.log"))
+
+    def run(job) -> dict:
+        kind, module_name = job
+        row = {"export": kind, "error": None}
+        output.attach(os.path.join(out_root, f"{kind}.log"))
+        started = time.perf_counter()
+        try:
+            prepare(kind, module_name).main()
+        except Exception as e:  # noqa: BLE001 - ошибка одного экспорта не останавливает остальные
+            row["error"] = f"{type(e).__name__}: {e}"
+        finally:
+            output.detach()
+        row.update(export_summary(kind, os.path.join(out_root, kind)))
+        row["seconds"] = round(time.perf_counter() - started, 2)
+        row["requests"] = counters[kind][0]
+        status = f"❌ {row['error']}" if row["error"] else "✓"
+        print(
+            f"    {kind:<10} {status} выгружено: {row['exported']}, ошибок: {row['failed']}, "
+            f"запросов: {row['requests']}, {row['seconds']} сек",
+            file=output.stream,
+        )
+        return row
+
+    sys.stdout = output
+    try:
+        with ThreadPoolExecutor(max_workers=len(EXPORTS)) as pool:
+            results = list(pool.map(run, EXPORTS))
+    finally:
+        sys.stdout = output.stream
+        output.close()
+
+    # Каталог и описание снимка
+    print("[3/3] Сохранение catalog.sqlite и manifest.json...")
+    try:
+        catalog = os.path.basename(
+            write_catalog(os.path.join(out_root, keitaro_catalog.CATALOG_FILE), out_root, base)
+        )
+    except keitaro_catalog.ERRORS as e:
+        print(f"[WARNING] Каталог не записан: {type(e).__name__}: {e}")
+        catalog = None
+    manifest = {
+        "base_url": base,
+        "started_at": started_at.isoformat(timespec="seconds"),
+        "listed_at": listed_at,
+        "finished_at": datetime.now().isoformat(timespec="seconds"),
+        "landings_endpoint": endpoints["landings"],
+        "listed": {kind: len(items) for kind, items in lists.items()},
+        "list_requests": counters["lists"][0],
+        "exports": {
+            r["export"]: dict(
+                {k: v for k, v in r.items() if k != "export"}, path=r["export"]
+            )
+            for r in results
+        },
+        "catalog": catalog,
+    }
+    manifest_file = os.path.join(out_root, "manifest.json")
+    with open(manifest_file, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    print("\n" + "=" * 60)
+    print("СТАТИСТИКА СНИМКА")
+    print("=" * 60)
+    for r in results:
+        print(f"{r['export']:<22}{r['exported']} (ошибок: {r['failed'] + bool(r['error'])})")
+    print(f"Запросов всего:       {sum(c[0] for c in counters.values())}")
+    print(f"\nСнимок:               {out_root}")
+    print(f"Описание:             {manifest_file}")
+    if catalog:
+        print(f"Каталог:              {os.path.join(out_root, catalog)}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
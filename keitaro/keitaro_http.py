@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Общие средства HTTP-слоя скриптов.
+
+RateLimiter - ограничение частоты запросов к одному трекеру, общее для всех
+потоков, которые к нему обращаются (замена SLEEP_BETWEEN после каждого
+запроса в многопоточных скриптах).
+
+limit_session - ограничить запросы сессии: частота (RateLimiter) и число
+одновременных запросов (семафоры, например лимит трекера и общий бюджет).
+
+http_adapter - адаптер сессии по настройкам CONFIG скрипта:
+- CONNECT_TIMEOUT - отдельный таймаут соединения: недоступный хост
+  отвечает ошибкой за секунды, а не за TIMEOUT;
+- CIRCUIT_BREAKER - после стольких ошибок API трекера подряд (нет
+  соединения, таймаут, 502/503/504) все запросы сессии приостанавливаются,
+  трекер раз в BREAKER_PROBE_INTERVAL сек проверяется дешевым запросом
+  (groups?per_page=1), после восстановления запросы продолжаются, а
+  оборвавшиеся повторяются и не попадают в failed.json. Если трекер не
+  отвечает дольше BREAKER_MAX_OUTAGE сек, ожидавшие запросы завершаются
+  ошибкой, а следующие снова пробуют трекер.
+"""
+
+import time
+import threading
+import weakref
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import keitaro_profile
+
+_counter_lock = threading.Lock()
+
+
+class RateLimiter:
+    """Не больше rate запросов в секунду (с запасом burst) на все потоки.
+
+    rate = 0 или None - без ограничения.
+    """
+
+    def __init__(self, rate: float | None, burst: int = 1):
+        self.rate = float(rate or 0)
+        self.capacity = max(int(burst), 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Дождаться разрешения на запрос. Возвращает время ожидания, сек"""
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class _HeldResponse(requests.Response):
+    """Ответ stream=True: слоты limit_session заняты, пока ответ не закрыт"""
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self._release()
+
+
+def limit_session(session, limiter: RateLimiter | None = None, semaphores=(), counter=None):
+    """Пропускать запросы сессии через семафоры (по порядку) и ограничитель частоты.
+
+    counter - список из одного числа, в нем считаются отправленные запросы.
+    Для stream=True слоты освобождаются не после заголовков, а когда ответ
+    закрыт (close() или with) либо удален, так что лимит одновременных
+    запросов учитывает и скачивание тела. Поток, который держит слоты
+    открытым ответом, делает следующие запросы без новых слотов - иначе
+    он ждал бы сам себя.
+    """
+    send = session.request
+    held: dict[int, int] = {}  # поток -> открытые ответы stream=True, держащие слоты
+    lock = threading.Lock()
+
+    def request(method, url, *args, **kwargs):
+        ident = threading.get_ident()
+        with lock:
+            sems = () if held.get(ident) else semaphores
+        for sem in sems:
+            sem.acquire()
+        try:
+            if limiter is not None:
+                limiter.acquire()
+            if counter is not None:
+                with _counter_lock:
+                    counter[0] += 1
+            r = send(method, url, *args, **kwargs)
+        except BaseException:
+            for sem in reversed(sems):
+                sem.release()
+            raise
+        if not kwargs.get("stream") or not sems:
+            for sem in reversed(sems):
+                sem.release()
+            return r
+
+        with lock:
+            held[ident] = held.get(ident, 0) + 1
+        done = [False]
+
+        def release():
+            with lock:
+                if done[0]:
+                    return
+                done[0] = True
+                held[ident] -= 1
+                if not held[ident]:
+                    del held[ident]
+            for sem in reversed(sems):
+                sem.release()
+
+        r.__class__ = _HeldResponse
+        r._release = release
+        # ответ, который не закрыли явно, освобождает слоты при удалении
+        weakref.finalize(r, release)
+        return r
+
+    session.request = request
+    return session
+
+
+class TrackerUnavailable(requests.ConnectionError):
+    """Трекер не восстановился за BREAKER_MAX_OUTAGE сек"""
+
+
+# Ответы, которые означают недоступность трекера, а не ошибку запроса
+OUTAGE_STATUSES = {502, 503, 504}
+# Повтор после сбоя безопасен: запрос не мог изменить данные дважды
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+PROBE_TIMEOUT = 15
+
+
+def replayable(method: str, status: int | None = None, connect_timeout: bool = False) -> bool:
+    """Можно ли повторить запрос после восстановления трекера.
+
+    Запросы на запись (POST) повторяются, только если точно не дошли до
+    трекера: таймаут соединения (connect_timeout) или 502/503 от прокси перед ним.
+    """
+    if method in IDEMPOTENT_METHODS:
+        return True
+    if status is not None:
+        return status in (502, 503)
+    return connect_timeout
+
+
+class CircuitBreaker:
+    """Состояние трекера, общее для всех потоков сессии.
+
+    failure() после threshold ошибок подряд размыкает цепь; wait() держит
+    потоки, пока цепь разомкнута, и одним из них проверяет трекер. Пока
+    трекер не ответил ни разу, цепь не размыкается: неверный URL или
+    выключенный трекер - ошибка сразу, а не пауза на BREAKER_MAX_OUTAGE.
+    """
+
+    def __init__(self, threshold: int, probe_interval: float = 15, max_outage: float | None = 3600):
+        self.threshold = max(int(threshold), 1)
+        self.probe_interval = max(float(probe_interval), 0.1)
+        self.max_outage = max_outage
+        self.failures = 0
+        self.answered = False  # трекер хоть раз ответил
+        self.opened_at: float | None = None
+        self.trips = 0
+        self.recovered = True
+        self.probing = False
+        self.cond = threading.Condition()
+
+    def success(self) -> None:
+        with self.cond:
+            self.failures = 0
+            self.answered = True
+
+    def failure(self) -> bool:
+        """Учесть ошибку. True - цепь разомкнута (запрос стоит повторить после восстановления)"""
+        with self.cond:
+            if self.opened_at is not None:
+                return True
+            if not self.answered:
+                return False
+            self.failures += 1
+            if self.failures < self.threshold:
+                return False
+            self.opened_at = time.monotonic()
+            self.trips += 1
+            print(
+                f"[WARNING] Трекер недоступен ({self.failures} ошибок подряд), "
+                f"запросы приостановлены до восстановления"
+            )
+            return True
+
+    def wait(self, probe) -> None:
+        """Дождаться замкнутой цепи. probe() -> bool проверяет трекер.
+
+        Если трекер не ответил за max_outage сек, ожидавшие запросы получают
+        TrackerUnavailable, а цепь замыкается: следующие запросы снова пробуют трекер.
+        """
+        with self.cond:
+            if self.opened_at is None:
+                return
+            started = time.monotonic()
+            if self.probing:
+                trip = self.trips
+                while self.opened_at is not None and self.trips == trip:
+                    self.cond.wait()
+                keitaro_profile.add("outage", time.monotonic() - started)
+                if not self.recovered:
+                    raise TrackerUnavailable("трекер недоступен дольше BREAKER_MAX_OUTAGE")
+                return
+            self.probing = True
+            opened_at = self.opened_at
+
+        # Проверку выполняет один поток, остальные ждут его результата
+        recovered = False
+        try:
+            while not recovered:
+                time.sleep(self.probe_interval)
+                recovered = probe()
+                if self.max_outage and time.monotonic() - opened_at > self.max_outage:
+                    break
+        finally:
+            with self.cond:
+                self.probing = False
+                self.opened_at = None
+                self.failures = 0
+                self.recovered = recovered
+                self.cond.notify_all()
+            keitaro_profile.add("outage", time.monotonic() - started)
+        outage = time.monotonic() - opened_at
+        if not recovered:
+            print(f"[WARNING] Трекер не ответил за {outage:.0f} сек, ожидавшие запросы завершаются ошибкой")
+            raise TrackerUnavailable("трекер недоступен дольше BREAKER_MAX_OUTAGE")
+        print(f"[INFO] Трекер снова доступен (пауза {outage:.0f} сек), продолжаем")
+
+
+class TrackerAdapter(HTTPAdapter):
+    """HTTPAdapter с отдельным таймаутом соединения и (необязательно) CircuitBreaker.
+
+    Числовой timeout запроса становится (connect_timeout, timeout).
+    CircuitBreaker учитывает запросы к хостам, к которым уже шли запросы API
+    трекера (/admin_api/): прямые ссылки на архивы на других хостах
+    (CDN) не размыкают цепь трекера.
+    """
+
+    def __init__(self, connect_timeout: float | None = None, breaker: CircuitBreaker | None = None, **kwargs):
+        super().__init__(**kwargs)
+        self.connect_timeout = connect_timeout
+        self.breaker = breaker
+        self.api_roots: dict[str, str] = {}  # хост -> URL API трекера на нем
+
+    def _timeout(self, timeout):
+        if self.connect_timeout and isinstance(timeout, (int, float)):
+            return (min(self.connect_timeout, timeout), timeout)
+        return timeout
+
+    def _api_root(self, url: str) -> str | None:
+        parts = urlsplit(url)
+        if "/admin_api/" in parts.path:
+            prefix = parts.path.split("/admin_api/", 1)[0]
+            self.api_roots[parts.netloc] = f"{parts.scheme}://{parts.netloc}{prefix}/admin_api/v1"
+        return self.api_roots.get(parts.netloc)
+
+    def _probe(self, api_root: str, headers, timeout) -> bool:
+        """Дешевый запрос к API трекера: отвечает ли он"""
+        headers = {k: v for k, v in headers.items() if k.lower() in ("api-key", "accept")}
+        probe = requests.Request("GET", f"{api_root}/groups?per_page=1", headers=headers).prepare()
+        try:
+            r = super().send(probe, timeout=timeout)
+        except requests.RequestException:
+            return False
+        r.close()
+        return r.status_code not in OUTAGE_STATUSES
+
+    def send(self, request, **kwargs):
+        kwargs["timeout"] = self._timeout(kwargs.get("timeout"))
+        breaker = self.breaker
+        api_root = self._api_root(request.url) if breaker is not None else None
+        if api_root is None:
+            return super().send(request, **kwargs)
+
+        probe_timeout = self._timeout(PROBE_TIMEOUT)
+        while True:
+            breaker.wait(lambda: self._probe(api_root, request.headers, probe_timeout))
+            try:
+                r = super().send(request, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if breaker.failure() and replayable(
+                    request.method, connect_timeout=isinstance(e, requests.ConnectTimeout)
+                ):
+                    continue
+                raise
+            if r.status_code in OUTAGE_STATUSES:
+                if breaker.failure() and replayable(request.method, status=r.status_code):
+                    r.close()
+                    continue
+                return r
+            breaker.success()
+            return r
+
+
+def http_adapter(config: dict, pool_maxsize: int = 10, breaker: CircuitBreaker | None = None) -> HTTPAdapter:
+    """Адаптер сессии по CONNECT_TIMEOUT и CIRCUIT_BREAKER из CONFIG скрипта"""
+    connect_timeout = config.get("CONNECT_TIMEOUT")
+    threshold = config.get("CIRCUIT_BREAKER")
+    if breaker is None and threshold:
+        breaker = CircuitBreaker(
+            threshold,
+            config.get("BREAKER_PROBE_INTERVAL", 15),
+            config.get("BREAKER_MAX_OUTAGE", 3600),
+        )
+    if not connect_timeout and breaker is None:
+        return HTTPAdapter(pool_maxsize=max(int(pool_maxsize), 1))
+    return TrackerAdapter(connect_timeout, breaker, pool_maxsize=max(int(pool_maxsize), 1))
+
+
+def adapter_limits(session) -> dict:
+    """CONNECT_TIMEOUT и CircuitBreaker адаптера сессии - для клиента keitaro_async.
+
+    SyncKeitaro(..., **adapter_limits(s)) делит с сессией s паузу при сбое трекера.
+    """
+    adapter = session.get_adapter("https://")
+    if isinstance(adapter, TrackerAdapter):
+        return {"connect_timeout": adapter.connect_timeout, "breaker": adapter.breaker}
+    return {"connect_timeout": None, "breaker": None}
+
+
+def probe(api_root: str, headers, timeout) -> bool:
+    """Дешевый запрос к API трекера (groups?per_page=1): отвечает ли он"""
+    headers = {k: v for k, v in headers.items() if k.lower() in ("api-key", "accept")}
+    try:
+        r = requests.get(f"{api_root}/groups?per_page=1", headers=headers, timeout=timeout)
+    except requests.RequestException:
+        return False
+    r.close()
+    return r.status_code not in OUTAGE_STATUSES
+
+
+def mount(session, adapter: HTTPAdapter):
+    """Подключить адаптер к сессии для http и https"""
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
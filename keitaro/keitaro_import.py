@@ -58,11 +58,20 @@ MATCH_BY_NAME: True - сопоставлять по именам
 import os
 import csv
 import json
-import time
 import requests
 from datetime import datetime
 from pathlib import Path
 
+import keitaro_http
+import keitaro_listing
+import keitaro_capabilities
+import keitaro_serializer
+import keitaro_refcache
+import keitaro_verify
+import keitaro_profile
+from concurrent.futures import ProcessPoolExecutor
+from keitaro_async import SyncKeitaro
+
 # ======================== CONFIG ========================
 CONFIG = {
     "BASE_URL": None,  # будет загружено из .env
@@ -74,9 +83,26 @@ CONFIG = {
     # =======================================
 
     "TIMEOUT": 90,
+    "CONNECT_TIMEOUT": 10,  # сек на установку соединения; None - как TIMEOUT
+    "CIRCUIT_BREAKER": 5,  # ошибок API трекера подряд до паузы всех запросов; 0 - выключено (keitaro_http)
+    "BREAKER_PROBE_INTERVAL": 15,  # сек между проверками трекера во время паузы
+    "BREAKER_MAX_OUTAGE": 3600,  # сек ожидания трекера, затем запросы завершаются ошибкой
+    "LIST_WORKERS": 4,  # параллельных запросов страниц при загрузке справочников
     "SLEEP_BETWEEN": 0.3,  # сек между запросами
     "CREATE_GROUPS": True,  # создавать группы если их нет
     "SKIP_EXISTING": True,  # пропускать если уже есть с таким именем
+    "ENGINE": "sync",  # "sync" (requests) или "async" (keitaro_async: список, загрузка ZIP и создание из JSON)
+    "ASYNC_CONCURRENCY": 10,  # одновременных запросов в режиме async
+    "CACHE_TTL": 0,  # сек жизни снимка справочников (keitaro_refcache); 0 - кеш выключен
+    "CACHE_INVALIDATE": False,  # сбросить кеш целевого трекера после изменяющего запуска
+    "PROFILE": None,  # True или путь отчета - профилирование запуска (keitaro_profile)
+
+    # ========== ПРОВЕРКА ДО ЗАГРУЗКИ ==========
+    "PREFLIGHT": False,  # проверить все записи параллельно до первой загрузки
+    "PREFLIGHT_PROCESSES": None,  # процессов проверки ZIP и хеширования; None - по числу ядер
+    "MAX_UPLOAD_MB": None,  # лимит размера архива на трекере (upload_max_filesize); None - не проверять
+    "DEDUP_BY_CONTENT": True,  # одинаковые архивы загружать один раз, уже загруженные (по sha256) пропускать
+    # ==========================================
 }
 # ====================== /CONFIG ========================
 
@@ -100,7 +126,7 @@ def _session(api_key: str) -> requests.Session:
             "Accept": "application/json",
         }
     )
-    return s
+    return keitaro_http.mount(s, keitaro_http.http_adapter(CONFIG))
 
 
 def _api(base: str, path: str) -> str:
@@ -109,37 +135,18 @@ def _api(base: str, path: str) -> str:
     return f"{base}/admin_api/v1/{path}"
 
 
-def detect_landings_endpoint(
-    s: requests.Session, base: str, timeout: int
-) -> str:
-    """Определяет правильный эндпоинт для лендингов"""
-    for ep in ("landing_pages", "landings"):
-        url = _api(base, f"{ep}?per_page=1")
-        try:
-            r = s.get(url, timeout=timeout)
-            if r.status_code == 200:
-                return ep
-        except requests.RequestException:
-            pass
-    raise RuntimeError("Не удалось определить эндпоинт лендингов")
-
-
 def get_all_groups(s: requests.Session, base: str, timeout: int) -> dict:
     """Получить все группы. Возвращает {name: id}"""
     groups = {}
     try:
-        url = _api(base, "groups?per_page=500")
-        r = s.get(url, timeout=timeout)
-        r.raise_for_status()
-        data = r.json()
-        items = data.get("data") if isinstance(data, dict) else data
-        if items:
-            for g in items:
-                name = g.get("name") or g.get("title") or ""
-                if name:
-                    groups[name] = g.get("id")
-    except requests.RequestException as e:
+        items = keitaro_listing.list_all(s, base, "groups", timeout, workers=CONFIG["LIST_WORKERS"])
+    except (requests.RequestException, ValueError) as e:
         print(f"[WARNING] Не удалось получить список групп: {e}")
+        return groups
+    for g in items:
+        name = g.get("name") or g.get("title") or ""
+        if name:
+            groups[name] = g.get("id")
     return groups
 
 
@@ -164,63 +171,86 @@ def get_existing_items(
 ) -> dict:
     """Получить существующие элементы. Возвращает {name: id}"""
     items = {}
-    page = 1
-    per_page = 200
-    while True:
-        try:
-            url = _api(base, f"{endpoint}?per_page={per_page}&page={page}")
-            r = s.get(url, timeout=timeout)
-            r.raise_for_status()
-            data = r.json()
-            entries = data.get("data") if isinstance(data, dict) else data
-            if not entries:
-                break
-            for item in entries:
-                name = item.get("name") or ""
-                if name:
-                    items[name] = item.get("id")
-
-            # Проверяем пагинацию
-            total_pages = None
-            if isinstance(data, dict):
-                meta = data.get("meta") or {}
-                pagination = meta.get("pagination") or {}
-                total_pages = pagination.get("total_pages")
-            if not total_pages or page >= int(total_pages):
-                break
-            page += 1
-        except requests.RequestException:
-            break
+    try:
+        entries = keitaro_listing.list_all(s, base, endpoint, timeout, workers=CONFIG["LIST_WORKERS"])
+    except (requests.RequestException, ValueError):
+        return items
+    for item in entries:
+        name = item.get("name") or ""
+        if name:
+            items[name] = item.get("id")
     return items
 
 
-def upload_zip(
+def upload_fileobj(
     s: requests.Session,
     base: str,
     endpoint: str,
-    zip_path: str,
+    fileobj,
+    filename: str,
     name: str,
     group_id: int | None,
     timeout: int,
 ) -> dict | None:
-    """Загрузить ZIP-архив"""
+    """Загрузить ZIP-архив из открытого файла (или буфера) через /import"""
     try:
         url = _api(base, f"{endpoint}/import")
+        files = {"file": (filename, fileobj, "application/zip")}
+        data = {"name": name}
+        if group_id:
+            data["group_id"] = group_id
 
-        with open(zip_path, "rb") as f:
-            files = {"file": (os.path.basename(zip_path), f, "application/zip")}
-            data = {"name": name}
-            if group_id:
-                data["group_id"] = group_id
-
-            r = s.post(url, files=files, data=data, timeout=timeout)
-            r.raise_for_status()
-            return r.json()
+        r = s.post(url, files=files, data=data, timeout=timeout)
+        r.raise_for_status()
+        return r.json()
     except requests.RequestException as e:
         print(f"    ✗ Ошибка загрузки ZIP: {e}")
         return None
 
 
+def upload_zip(
+    s: requests.Session,
+    base: str,
+    endpoint: str,
+    zip_path: str,
+    name: str,
+    group_id: int | None,
+    timeout: int,
+) -> dict | None:
+    """Загрузить ZIP-архив"""
+    with open(zip_path, "rb") as f:
+        return upload_fileobj(
+            s, base, endpoint, f, os.path.basename(zip_path), name, group_id, timeout
+        )
+
+
+def json_payload(json_data: dict, name: str, group_id: int | None) -> dict:
+    """Тело запроса создания элемента из JSON экспорта"""
+    # Базовые поля
+    payload = {
+        "name": name,
+    }
+
+    if group_id:
+        payload["group_id"] = group_id
+
+    # Копируем важные поля из JSON
+    important_fields = [
+        "archive_type",
+        "state",
+        "country",
+        "action_type",
+        "action_payload",
+        "action_options",
+        "notes",
+    ]
+
+    for field in important_fields:
+        if field in json_data and json_data[field] is not None:
+            payload[field] = json_data[field]
+    return payload
+
+
 def create_from_json(
     s: requests.Session,
     base: str,
@@ -233,30 +263,7 @@ def create_from_json(
     """Создать элемент из JSON данных"""
     try:
         url = _api(base, endpoint)
-
-        # Базовые поля
-        payload = {
-            "name": name,
-        }
-
-        if group_id:
-            payload["group_id"] = group_id
-
-        # Копируем важные поля из JSON
-        important_fields = [
-            "archive_type",
-            "state",
-            "country",
-            "action_type",
-            "action_payload",
-            "action_options",
-            "notes",
-        ]
-
-        for field in important_fields:
-            if field in json_data and json_data[field] is not None:
-                payload[field] = json_data[field]
-
+        payload = json_payload(json_data, name, group_id)
         r = s.post(url, json=payload, timeout=timeout)
         r.raise_for_status()
         return r.json()
@@ -265,6 +272,78 @@ def create_from_json(
         return None
 
 
+def preflight(
+    items: list[dict], import_dir: str, existing_items: dict, known_hashes: dict
+) -> tuple[list[dict], list[tuple], list[dict]]:
+    """Проверить записи index.csv до загрузки (ZIP - в пуле процессов).
+
+    Возвращает (к загрузке, пропущенные [(запись, причина)], ошибки). Записям
+    к загрузке добавляется "_sha256" архива.
+    """
+    ready, skipped, failed = [], [], []
+    jobs = []  # (запись, полный путь) ZIP-архивов на проверку
+    for item in items:
+        name = item.get("name")
+        if CONFIG["SKIP_EXISTING"] and name in existing_items:
+            skipped.append((item, "уже существует"))
+            continue
+        full_path = os.path.join(import_dir, item.get("file_path") or "")
+        if item.get("type") == "json":
+            if keitaro_serializer.resolve(full_path):
+                ready.append(item)
+            else:
+                failed.append({"id": item.get("id"), "name": name, "reason": "file_not_found"})
+            continue
+        if not os.path.isfile(full_path):
+            failed.append({"id": item.get("id"), "name": name, "reason": "file_not_found"})
+            continue
+        jobs.append((item, full_path))
+
+    max_bytes = (CONFIG["MAX_UPLOAD_MB"] or 0) * 1024 * 1024
+    existing_ids = set(existing_items.values())
+    seen: dict[str, str] = {}  # sha256 -> имя первой записи в этом запуске
+    with ProcessPoolExecutor(max_workers=CONFIG["PREFLIGHT_PROCESSES"]) as pool:
+        results = pool.map(keitaro_verify.verify_zip, [path for _, path in jobs], chunksize=4)
+        for (item, _), result in zip(jobs, results):
+            name = item.get("name")
+            if not result["ok"]:
+                failed.append({"id": item.get("id"), "name": name, "reason": f"bad_zip: {result['error']}"})
+                continue
+            if max_bytes and result["size"] > max_bytes:
+                failed.append(
+                    {"id": item.get("id"), "name": name,
+                     "reason": f"too_large: {result['size'] / 1024 / 1024:.1f} MB"}
+                )
+                continue
+            sha = result["sha256"]
+            if CONFIG["DEDUP_BY_CONTENT"]:
+                known = known_hashes.get(sha)
+                # Пропуск только если загруженный объект есть в списке трекера; без
+                # списка (SKIP_EXISTING=False, ошибка) архив загружается, хеш перезаписывается
+                if known and known[0] in existing_ids:
+                    skipped.append((item, f"такой же архив уже загружен: {known[1]}"))
+                    continue
+                if sha in seen:
+                    skipped.append((item, f"дубликат архива {seen[sha]}"))
+                    continue
+                seen[sha] = name
+            ready.append(dict(item, _sha256=sha))
+    return ready, skipped, failed
+
+
+def load_reference(base: str, entity: str, loader) -> dict:
+    """Справочник {name: id} из свежего снимка кеша или через loader()"""
+    pairs = keitaro_refcache.load(base, entity, CONFIG["CACHE_TTL"])
+    if pairs is not None:
+        print(f"    (из кеша)")
+        return {n: i for i, n in pairs}
+    result = loader()
+    if CONFIG["CACHE_TTL"] and result:
+        keitaro_refcache.save(base, entity, ((i, n) for n, i in result.items()))
+    return result
+
+
+@keitaro_profile.profiled("keitaro_import", lambda: CONFIG["PROFILE"])
 def main():
     load_config_from_env()
 
@@ -301,7 +380,7 @@ def main():
 
     # Определяем эндпоинт
     if import_type == "landings":
-        endpoint = detect_landings_endpoint(s, base, timeout)
+        endpoint = keitaro_capabilities.landings_endpoint(s, base, timeout)
         item_type_ru = "лендинг"
     else:
         endpoint = "offers"
@@ -315,13 +394,26 @@ def main():
 
     # Получаем существующие группы
     print("[1/4] Получение списка групп...")
-    groups_map = get_all_groups(s, base, timeout)
+    groups_map = load_reference(base, "groups", lambda: get_all_groups(s, base, timeout))
     print(f"    Найдено групп: {len(groups_map)}")
 
     # Получаем существующие элементы
     if CONFIG["SKIP_EXISTING"]:
         print(f"[2/4] Получение списка существующих {import_type}...")
-        existing_items = get_existing_items(s, base, endpoint, timeout)
+        def load_existing() -> dict:
+            if CONFIG["ENGINE"] == "async":
+                engine = SyncKeitaro(
+                    base, api_key, timeout, CONFIG["ASYNC_CONCURRENCY"],
+                    **keitaro_http.adapter_limits(s),
+                )
+                return {
+                    it.get("name"): it.get("id")
+                    for it in engine.list_all(endpoint)
+                    if it.get("name")
+                }
+            return get_existing_items(s, base, endpoint, timeout)
+
+        existing_items = load_reference(base, import_type, load_existing)
         print(f"    Найдено существующих: {len(existing_items)}")
     else:
         existing_items = {}
@@ -336,16 +428,63 @@ def main():
             items_to_import.append(row)
     print(f"    Найдено записей: {len(items_to_import)}")
 
-    # Импорт
-    print(f"[4/4] Начинаем импорт...")
-    print()
-
     total = 0
     success = 0
     skipped = 0
     failed_list = []
+    known_hashes = {}
+
+    if CONFIG["PREFLIGHT"]:
+        print("    Проверка перед загрузкой (наличие, ZIP, размер, хеш)...")
+        known_hashes = keitaro_refcache.load_hashes(base, import_type)
+        rows_count = len(items_to_import)
+        with keitaro_profile.stage("preflight"):
+            items_to_import, preflight_skipped, preflight_failed = preflight(
+                items_to_import, import_dir, existing_items, known_hashes
+            )
+        for item, reason in preflight_skipped:
+            print(f"    ⊘ {item.get('name')}: {reason}")
+        for failure in preflight_failed:
+            print(f"    ✗ {failure['name']}: {failure['reason']}")
+        total += rows_count - len(items_to_import)
+        skipped += len(preflight_skipped)
+        failed_list.extend(preflight_failed)
+        print(
+            f"    К загрузке: {len(items_to_import)}, пропущено: {len(preflight_skipped)}, "
+            f"ошибок: {len(preflight_failed)}"
+        )
+
+    # Импорт
+    print(f"[4/4] Начинаем импорт...")
+    print()
+
+    def imported(item: dict, result: dict | None) -> None:
+        nonlocal success
+        name = item.get("name")
+        if result:
+            success += 1
+            result_id = result.get("id")
+            keitaro_refcache.add(base, import_type, result_id, name)
+            existing_items[name] = result_id
+            if item.get("_sha256"):
+                known_hashes[item["_sha256"]] = [result_id, name]
+            print(f"    ✓ Успешно импортирован (ID: {result_id})")
+        else:
+            failed_list.append(
+                {"id": item.get("id"), "name": name, "reason": "import_failed"}
+            )
 
-    for item in items_to_import:
+    # ENGINE="async": загрузки копятся и отправляются пачкой через keitaro_async
+    engine = None
+    zip_jobs: list[tuple] = []  # (запись, (путь, имя, группа))
+    create_jobs: list[tuple] = []  # (запись, тело запроса)
+    queued: set = set()
+    if CONFIG["ENGINE"] == "async":
+        engine = SyncKeitaro(
+            base, api_key, timeout, CONFIG["ASYNC_CONCURRENCY"], **keitaro_http.adapter_limits(s)
+        )
+
+    for n, item in enumerate(items_to_import, start=1):
         total += 1
         item_id = item.get("id")
         name = item.get("name")
@@ -353,13 +492,13 @@ def main():
         file_path = item.get("file_path")
         file_type = item.get("type")
 
-        print(f"[{total}/{len(items_to_import)}] {item_type_ru.capitalize()}: {name}")
+        print(f"[{n}/{len(items_to_import)}] {item_type_ru.capitalize()}: {name}")
 
-        # Пропускаем если уже есть
-        if CONFIG["SKIP_EXISTING"] and name in existing_items:
+        # Пропускаем если уже есть (или уже в очереди async)
+        if CONFIG["SKIP_EXISTING"] and (name in existing_items or name in queued):
             print(f"    ⊘ Пропущен (уже существует)")
             skipped += 1
-            time.sleep(CONFIG["SLEEP_BETWEEN"])
+            keitaro_profile.sleep(CONFIG["SLEEP_BETWEEN"])
             continue
 
         # Получаем или создаем группу
@@ -368,12 +507,16 @@ def main():
             if group_name in groups_map:
                 group_id = groups_map[group_name]
             elif CONFIG["CREATE_GROUPS"]:
-                group_id = create_group(s, base, group_name, timeout)
+                with keitaro_profile.stage("groups"):
+                    group_id = create_group(s, base, group_name, timeout)
                 if group_id:
                     groups_map[group_name] = group_id
+                    keitaro_refcache.add(base, "groups", group_id, group_name)
 
         # Полный путь к файлу
         full_path = os.path.join(import_dir, file_path)
+        if file_type == "json":
+            full_path = keitaro_serializer.resolve(full_path) or full_path  # .json.gz / .json.zst
 
         if not os.path.isfile(full_path):
             print(f"    ✗ Файл не найден: {full_path}")
@@ -384,27 +527,49 @@ def main():
 
         # Импортируем
         result = None
+        if engine is not None:
+            queued.add(name)
+            if file_type == "zip":
+                zip_jobs.append((item, (full_path, name, group_id)))
+            elif file_type == "json":
+                with keitaro_profile.stage("read"):
+                    json_data = keitaro_serializer.load(full_path)
+                create_jobs.append((item, json_payload(json_data, name, group_id)))
+            print(f"    → В очереди загрузки (async)")
+            continue
         if file_type == "zip":
             print(f"    → Загрузка ZIP...")
-            result = upload_zip(s, base, endpoint, full_path, name, group_id, timeout)
+            with keitaro_profile.stage("upload"):
+                result = upload_zip(s, base, endpoint, full_path, name, group_id, timeout)
         elif file_type == "json":
             print(f"    → Создание из JSON...")
-            with open(full_path, "r", encoding="utf-8") as f:
-                json_data = json.load(f)
-            result = create_from_json(
-                s, base, endpoint, json_data, name, group_id, timeout
-            )
-
-        if result:
-            success += 1
-            result_id = result.get("id")
-            print(f"    ✓ Успешно импортирован (ID: {result_id})")
-        else:
-            failed_list.append(
-                {"id": item_id, "name": name, "reason": "import_failed"}
-            )
-
-        time.sleep(CONFIG["SLEEP_BETWEEN"])
+            with keitaro_profile.stage("read"):
+                json_data = keitaro_serializer.load(full_path)
+            with keitaro_profile.stage("upload"):
+                result = create_from_json(
+                    s, base, endpoint, json_data, name, group_id, timeout
+                )
+
+        imported(item, result)
+        keitaro_profile.sleep(CONFIG["SLEEP_BETWEEN"])
+
+    if zip_jobs or create_jobs:
+        print(f"\n[INFO] Загрузка (async): ZIP {len(zip_jobs)}, из JSON {len(create_jobs)}")
+        with keitaro_profile.stage("upload"):
+            zip_results = engine.import_many(endpoint, [job for _, job in zip_jobs])
+            create_results = engine.create_many(endpoint, [payload for _, payload in create_jobs])
+        for (item, _), result in zip(zip_jobs + create_jobs, zip_results + create_results):
+            print(f"[{item.get('name')}]")
+            imported(item, result)
+
+    if CONFIG["PREFLIGHT"] and success:
+        keitaro_refcache.save_hashes(base, import_type, known_hashes)
+
+    # Кеш справочников: дописать созданное или сбросить целиком
+    if CONFIG["CACHE_INVALIDATE"] and success:
+        keitaro_refcache.invalidate(base)
+    else:
+        keitaro_refcache.flush()
 
     # Сохраняем отчет об ошибках
     if failed_list:
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Общий движок постраничной загрузки списков Keitaro Admin API.
+
+Первая страница запрашивается сразу, по meta.pagination.total_pages
+остальные страницы загружаются параллельно (LIST_WORKERS потоков) и
+склеиваются в исходном порядке. Если трекер не отдает пагинацию, страницы
+читаются по одной, пока приходят полные страницы.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+import requests
+import keitaro_profile
+
+MAX_SEQUENTIAL_PAGES = 1000  # защита от трекеров, игнорирующих параметр page
+
+
+def _api(base: str, path: str, params: dict | None = None) -> str:
+    base = base.rstrip("/")
+    path = path.lstrip("/")
+    url = f"{base}/admin_api/v1/{path}"
+    if params:
+        url += "?" + urlencode(params)
+    return url
+
+
+def _items(data) -> list:
+    if isinstance(data, dict):
+        return data.get("data") or []
+    return data or []
+
+
+def _total_pages(data) -> int | None:
+    if not isinstance(data, dict):
+        return None
+    meta = data.get("meta") or {}
+    pagination = meta.get("pagination") or {}
+    total_pages = pagination.get("total_pages")
+    return int(total_pages) if total_pages else None
+
+
+def fetch_page(
+    s: requests.Session,
+    base: str,
+    endpoint: str,
+    page: int,
+    per_page: int,
+    timeout: int,
+    params: dict | None = None,
+):
+    """Одна страница списка (JSON). Ошибки HTTP пробрасываются"""
+    query = dict(params or {}, per_page=per_page, page=page)
+    with keitaro_profile.stage("listing"):
+        r = s.get(_api(base, endpoint, query), timeout=timeout)
+        r.raise_for_status()
+        return r.json()
+
+
+def list_all(
+    s: requests.Session,
+    base: str,
+    endpoint: str,
+    timeout: int,
+    per_page: int = 200,
+    workers: int = 4,
+    params: dict | None = None,
+) -> list:
+    """Все элементы списка endpoint со всех страниц"""
+    first = fetch_page(s, base, endpoint, 1, per_page, timeout, params)
+    items = list(_items(first))
+    total_pages = _total_pages(first)
+
+    if total_pages:
+        if total_pages > 1:
+            with ThreadPoolExecutor(max_workers=max(int(workers), 1)) as pool:
+                pages = pool.map(
+                    lambda page: fetch_page(s, base, endpoint, page, per_page, timeout, params),
+                    range(2, total_pages + 1),
+                )
+                for data in pages:
+                    items.extend(_items(data))
+        return items
+
+    # Пагинации в ответе нет: читаем дальше, пока страницы полные
+    page_items = items
+    page = 1
+    while len(page_items) >= per_page and page < MAX_SEQUENTIAL_PAGES:
+        page += 1
+        page_items = _items(fetch_page(s, base, endpoint, page, per_page, timeout, params))
+        if not page_items or page_items[0] == items[0]:
+            break  # трекер игнорирует page и отдает ту же страницу
+        items.extend(page_items)
+    return items
+
+
+# ---------- фильтры выборочного экспорта ----------
+
+FILTER_KEYS = (
+    "FILTER_GROUP_IDS",
+    "FILTER_STATE",
+    "FILTER_ID_FROM",
+    "FILTER_ID_TO",
+    "FILTER_UPDATED_SINCE",
+)
+
+
+def filters_from_config(config: dict) -> dict:
+    """Заданные фильтры из CONFIG скрипта (ключи FILTER_*)"""
+    filters = {k: config.get(k) for k in FILTER_KEYS}
+    if isinstance(filters["FILTER_GROUP_IDS"], (int, str)):
+        filters["FILTER_GROUP_IDS"] = [filters["FILTER_GROUP_IDS"]]
+    return {k: v for k, v in filters.items() if v not in (None, "", [])}
+
+
+def filter_params(filters: dict) -> dict:
+    """Фильтры, которые передаются трекеру параметрами запроса списка.
+
+    Трекер без поддержки этих параметров их игнорирует, поэтому
+    результат в любом случае дофильтровывается в select().
+    """
+    params = {}
+    group_ids = filters.get("FILTER_GROUP_IDS") or []
+    if len(group_ids) == 1:
+        params["group_id"] = group_ids[0]
+    if filters.get("FILTER_STATE"):
+        params["state"] = filters["FILTER_STATE"]
+    return params
+
+
+def _item_group_id(item: dict):
+    if item.get("group_id") is not None:
+        return item.get("group_id")
+    group = item.get("group")
+    return group.get("id") if isinstance(group, dict) else None
+
+
+def matches(item: dict, filters: dict) -> bool:
+    """Подходит ли элемент списка под фильтры.
+
+    Элементы без поля updated_at фильтром по дате не отсекаются.
+    """
+    group_ids = filters.get("FILTER_GROUP_IDS")
+    if group_ids and str(_item_group_id(item)) not in {str(g) for g in group_ids}:
+        return False
+    state = filters.get("FILTER_STATE")
+    if state and item.get("state") != state:
+        return False
+    try:
+        item_id = int(item.get("id"))
+    except (TypeError, ValueError):
+        item_id = None
+    if item_id is not None:
+        if filters.get("FILTER_ID_FROM") is not None and item_id < int(filters["FILTER_ID_FROM"]):
+            return False
+        if filters.get("FILTER_ID_TO") is not None and item_id > int(filters["FILTER_ID_TO"]):
+            return False
+    since = filters.get("FILTER_UPDATED_SINCE")
+    updated = item.get("updated_at")
+    if since and updated and str(updated) < str(since):
+        return False  # формат Keitaro "YYYY-MM-DD HH:MM:SS" сравнивается как строка
+    return True
+
+
+def select(items, filters: dict):
+    """Отфильтровать итератор элементов (лениво)"""
+    if not filters:
+        yield from items
+        return
+    for item in items:
+        if matches(item, filters):
+            yield item
+
+
+def describe(filters: dict) -> str:
+    """Фильтры одной строкой для лога"""
+    return ", ".join(f"{k[len('FILTER_'):].lower()}={v}" for k, v in filters.items())
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Упаковка лендингов и загрузка в Keitaro одним проходом, без промежуточных ZIP.
+
+Раньше: create_zip_folder.py складывал архивы в lander_zips_<ts>, затем их
+загружал keitaro_import.py / post_to_offer_to_keitaro.py. Здесь каждая подпапка
+LANDER_ROOT пакуется в буфер SpooledTemporaryFile (в памяти, при превышении
+SPOOL_MAX_MB - во временном файле, который удаляется сам) и сразу уходит в
+очередь загрузки. Пока UPLOADERS потоков отправляют готовые архивы, основной
+поток пакует следующий лендинг: упаковка (CPU) и загрузка (сеть) идут
+одновременно. Очередь ограничена QUEUE_SIZE, поэтому в памяти не копятся
+архивы, которые сеть не успевает отправить.
+
+Ограничение: requests собирает тело multipart-запроса целиком в памяти,
+поэтому во время загрузки каждый архив (даже ушедший во временный файл)
+занимает память полностью - до UPLOADERS архивов одновременно. SPOOL_MAX_MB
+ограничивает только память архивов, ожидающих в очереди.
+
+Целевой трекер берется из .env (как в keitaro_import.py):
+KEITARO_TARGET_URL=https://your-target-tracker-domain.com
+KEITARO_TARGET_API_KEY=your-target-api-key-here
+
+python3 keitaro_pack_upload.py
+"""
+
+import os
+import json
+import time
+import queue
+import tempfile
+import threading
+import requests
+
+import keitaro_http
+import keitaro_listing
+import keitaro_capabilities
+import keitaro_import
+import create_zip_folder
+
+# ======================== CONFIG ========================
+CONFIG = {
+    "BASE_URL": None,  # будет загружено из .env
+    "API_KEY": None,   # будет загружено из .env
+
+    "LANDER_ROOT": "lander",  # подпапки = отдельные лендинги
+    "IMPORT_TYPE": "landings",  # "landings" или "offers"
+    "GROUP": None,  # имя группы для всех загруженных (None - без группы)
+    "CREATE_GROUPS": True,  # создать группу GROUP, если ее нет
+    "SKIP_EXISTING": True,  # не паковать и не загружать, если имя уже есть на трекере
+
+    "SPOOL_MAX_MB": 32,  # архив больше этого размера уходит из памяти во временный файл
+    "QUEUE_SIZE": 2,  # упакованных архивов, ожидающих загрузки
+    "UPLOADERS": 2,  # потоков загрузки
+
+    "TIMEOUT": 90,
+    "CONNECT_TIMEOUT": 10,  # сек на установку соединения; None - как TIMEOUT
+    "CIRCUIT_BREAKER": 5,  # ошибок API трекера подряд до паузы всех запросов; 0 - выключено (keitaro_http)
+    "BREAKER_PROBE_INTERVAL": 15,  # сек между проверками трекера во время паузы
+    "BREAKER_MAX_OUTAGE": 3600,  # сек ожидания трекера, затем запросы завершаются ошибкой
+    "LIST_WORKERS": 4,  # параллельных запросов страниц при загрузке справочников
+}
+# ====================== /CONFIG ========================
+
+
+def load_config_from_env():
+    """Загрузить настройки из .env файла"""
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        print("[WARNING] dotenv не установлен, используйте переменные окружения")
+    CONFIG["BASE_URL"] = os.getenv("KEITARO_TARGET_URL") or os.getenv("KEITARO_TRACKER_URL")
+    CONFIG["API_KEY"] = os.getenv("KEITARO_TARGET_API_KEY") or os.getenv("KEITARO_API_KEY")
+
+
+def _session(api_key: str, pool_size: int) -> requests.Session:
+    s = requests.Session()
+    s.headers.update(
+        {
+            "Api-Key": api_key,
+            "Accept": "application/json",
+        }
+    )
+    return keitaro_http.mount(s, keitaro_http.http_adapter(CONFIG, pool_size))
+
+
+def resolve_group(s: requests.Session, base: str, group_name: str | None, timeout: int) -> int | None:
+    """ID группы GROUP (создается при CREATE_GROUPS)"""
+    if not group_name:
+        return None
+    groups = keitaro_import.get_all_groups(s, base, timeout)
+    if group_name in groups:
+        return groups[group_name]
+    if CONFIG["CREATE_GROUPS"]:
+        return keitaro_import.create_group(s, base, group_name, timeout)
+    print(f"[WARNING] Группа '{group_name}' не найдена, загрузка без группы")
+    return None
+
+
+def pack(src_dir: str):
+    """Упаковать лендинг в буфер. Возвращает (буфер, размер, сек)"""
+    started = time.perf_counter()
+    buf = tempfile.SpooledTemporaryFile(max_size=int(CONFIG["SPOOL_MAX_MB"] * 1024 * 1024))
+    create_zip_folder.pack_lander(src_dir, buf)
+    size = buf.tell()
+    buf.seek(0)
+    return buf, size, time.perf_counter() - started
+
+
+def main():
+    load_config_from_env()
+
+    base = CONFIG["BASE_URL"]
+    api_key = CONFIG["API_KEY"]
+    import_type = CONFIG["IMPORT_TYPE"].lower()
+    lander_root = CONFIG["LANDER_ROOT"]
+
+    if not base or not api_key:
+        print("❌ ОШИБКА: Не указаны KEITARO_TARGET_URL и KEITARO_TARGET_API_KEY в .env")
+        return
+
+    if import_type not in ("offers", "landings"):
+        print(f"❌ ОШИБКА: IMPORT_TYPE должен быть 'offers' или 'landings'")
+        return
+
+    if not os.path.isdir(lander_root):
+        print(f"❌ Папка '{lander_root}' не найдена")
+        return
+
+    landers = create_zip_folder.list_landers(lander_root)
+    if not landers:
+        print(f"❌ В '{lander_root}' нет подпапок")
+        return
+
+    timeout = CONFIG["TIMEOUT"]
+    uploaders = max(int(CONFIG["UPLOADERS"]), 1)
+    s = _session(api_key, uploaders)
+
+    if import_type == "landings":
+        endpoint = keitaro_capabilities.landings_endpoint(s, base, timeout)
+    else:
+        endpoint = "offers"
+
+    print(f"[INFO] Найдено лендингов: {len(landers)}")
+    print(f"[INFO] Эндпоинт: {endpoint}")
+    print(f"[INFO] Целевой трекер: {base}")
+    print(f"[INFO] Потоков загрузки: {uploaders}, очередь: {CONFIG['QUEUE_SIZE']}\n")
+
+    group_id = resolve_group(s, base, CONFIG["GROUP"], timeout)
+
+    existing = set()
+    if CONFIG["SKIP_EXISTING"]:
+        try:
+            items = keitaro_listing.list_all(
+                s, base, endpoint, timeout, workers=CONFIG["LIST_WORKERS"]
+            )
+            existing = {it.get("name") for it in items if it.get("name")}
+        except (requests.RequestException, ValueError) as e:
+            print(f"[WARNING] Не удалось получить список {endpoint}: {e}")
+
+    stats = {"success": 0, "packed_bytes": 0, "spilled": 0, "pack_sec": 0.0, "upload_sec": 0.0}
+    failed_list = []
+    lock = threading.Lock()
+    jobs: queue.Queue = queue.Queue(maxsize=max(int(CONFIG["QUEUE_SIZE"]), 1))
+
+    def uploader():
+        while True:
+            job = jobs.get()
+            if job is None:
+                return
+            label, name, buf = job
+            started = time.perf_counter()
+            # Поток не должен умереть: без него jobs.put() в основном потоке ждал бы вечно
+            try:
+                result = keitaro_import.upload_fileobj(
+                    s, base, endpoint, buf, f"{name}.zip", name, group_id, timeout
+                )
+                reason = "upload_failed"
+            except Exception as e:  # noqa: BLE001 - например OSError чтения временного файла
+                result = None
+                reason = f"error: {type(e).__name__}: {e}"
+            finally:
+                buf.close()  # временный файл (если был) удаляется здесь
+            seconds = time.perf_counter() - started
+            with lock:
+                stats["upload_sec"] += seconds
+                if result:
+                    stats["success"] += 1
+                    print(f"[{label}] ✓ Загружен: {name} (ID: {result.get('id')}, {seconds:.2f} сек)")
+                else:
+                    failed_list.append({"name": name, "reason": reason})
+                    print(f"[{label}] ✗ Не загружен: {name} ({reason})")
+
+    threads = [threading.Thread(target=uploader, daemon=True) for _ in range(uploaders)]
+    for t in threads:
+        t.start()
+
+    started = time.perf_counter()
+    skipped = 0
+    try:
+        for idx, name in enumerate(landers, start=1):
+            label = f"{idx}/{len(landers)}"
+            if name in existing:
+                print(f"[{label}] ⊘ Пропущен (уже существует): {name}")
+                skipped += 1
+                continue
+            try:
+                buf, size, seconds = pack(os.path.join(lander_root, name))
+            except OSError as e:
+                print(f"[{label}] ✗ Ошибка упаковки {name}: {e}")
+                with lock:
+                    failed_list.append({"name": name, "reason": f"pack_error: {e}"})
+                continue
+            with lock:
+                stats["pack_sec"] += seconds
+                stats["packed_bytes"] += size
+                stats["spilled"] += size > CONFIG["SPOOL_MAX_MB"] * 1024 * 1024
+            print(f"[{label}] 📦 Упакован: {name} ({size / 1024:.1f} KB, {seconds:.2f} сек)")
+            jobs.put((label, name, buf))  # ждет, если загрузка отстает
+    finally:
+        for _ in threads:
+            jobs.put(None)
+        for t in threads:
+            t.join()
+    elapsed = time.perf_counter() - started
+
+    if failed_list:
+        failed_file = os.path.join(lander_root, "pack_upload_failed.json")
+        with open(failed_file, "w", encoding="utf-8") as f:
+            json.dump(failed_list, f, ensure_ascii=False, indent=2)
+
+    print("\n" + "=" * 60)
+    print("СТАТИСТИКА УПАКОВКИ И ЗАГРУЗКИ")
+    print("=" * 60)
+    print(f"Всего лендингов:       {len(landers)}")
+    print(f"Успешно загружено:     {stats['success']}")
+    print(f"Пропущено (есть):      {skipped}")
+    print(f"Ошибок:                {len(failed_list)}")
+    print(f"Упаковано:             {stats['packed_bytes'] / 1024 / 1024:.2f} MB "
+          f"(во временный файл: {stats['spilled']})")
+    print(f"Упаковка / загрузка:   {stats['pack_sec']:.2f} / {stats['upload_sec']:.2f} сек")
+    print(f"Общее время:           {elapsed:.2f} сек")
+    if failed_list:
+        print(f"\nОшибки сохранены:      {os.path.join(lander_root, 'pack_upload_failed.json')}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
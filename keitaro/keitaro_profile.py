@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Профилирование скриптов: время этапов, cProfile и tracemalloc в одном отчете.
+
+Включается настройкой PROFILE в CONFIG скрипта (keitaro_universal_export,
+keitaro_import, keitaro_campaigns_export, keitaro_campaigns_import) или
+константой PROFILE в create_zip_folder: True - отчет
+profile_<скрипт>_<timestamp>.json в текущей папке, строка - путь отчета.
+
+В отчете:
+- stages - суммарное время этапов (listing, mappings, probing, transfer,
+  write, upload, sleep, ...) по всем потокам и число замеров; этапы могут
+  быть вложенными (mappings включает listing, create - sleep), а при
+  нескольких потоках сумма этапов больше wall;
+- functions - самые долгие функции основного потока по cProfile;
+- memory - пик памяти и места наибольших выделений по tracemalloc.
+
+Сравнение двух запусков:
+
+python3 keitaro_profile.py diff profile_old.json profile_new.json
+"""
+
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import functools
+import threading
+import contextlib
+import tracemalloc
+from datetime import datetime
+
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 15
+
+_lock = threading.Lock()
+_active: dict | None = None  # {"script", "path", "started", "profile", "stages"}
+_off = contextlib.nullcontext()
+
+
+def add(name: str, seconds: float) -> None:
+    """Добавить замер времени к этапу"""
+    if _active is None:
+        return
+    with _lock:
+        entry = _active["stages"].setdefault(name, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+
+@contextlib.contextmanager
+def _timed(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add(name, time.perf_counter() - started)
+
+
+def stage(name: str):
+    """Контекст замера этапа (без профилирования ничего не делает)"""
+    if _active is None:
+        return _off
+    return _timed(name)
+
+
+def timed_iter(iterable, name: str):
+    """Итерация с замером времени ожидания каждого элемента (например, чанков из сети)"""
+    if _active is None:
+        yield from iterable
+        return
+    it = iter(iterable)
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(it)
+        except StopIteration:
+            add(name, time.perf_counter() - started)
+            return
+        add(name, time.perf_counter() - started)
+        yield item
+
+
+def sleep(seconds: float) -> None:
+    """time.sleep с учетом в этапе sleep"""
+    if not seconds:
+        return
+    with stage("sleep"):
+        time.sleep(seconds)
+
+
+def start(script: str, setting) -> bool:
+    """Начать профилирование (setting: True или путь отчета). False - уже идет или выключено"""
+    global _active
+    if not setting or _active is not None:
+        return False
+    path = setting if isinstance(setting, str) else (
+        f"profile_{script}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    tracemalloc.start(10)
+    profile = cProfile.Profile()
+    _active = {
+        "script": script,
+        "path": path,
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "started": time.perf_counter(),
+        "profile": profile,
+        "stages": {},
+    }
+    profile.enable()
+    return True
+
+
+def finish() -> str | None:
+    """Остановить профилирование и записать отчет. Возвращает путь отчета"""
+    global _active
+    if _active is None:
+        return None
+    active = _active
+    active["profile"].disable()
+    wall = time.perf_counter() - active["started"]
+    _, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    _active = None
+
+    stats = pstats.Stats(active["profile"])
+    functions = []
+    for (filename, line, func), (cc, nc, tt, ct, _) in stats.stats.items():
+        functions.append(
+            {
+                "function": f"{os.path.basename(filename)}:{line}({func})",
+                "calls": nc,
+                "own_seconds": round(tt, 4),
+                "total_seconds": round(ct, 4),
+            }
+        )
+    functions.sort(key=lambda f: f["total_seconds"], reverse=True)
+
+    allocations = [
+        {"where": str(s.traceback[0]), "kb": round(s.size / 1024, 1), "blocks": s.count}
+        for s in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]
+    ]
+
+    report = {
+        "script": active["script"],
+        "started_at": active["started_at"],
+        "wall_seconds": round(wall, 4),
+        "stages": {
+            name: {"seconds": round(sec, 4), "count": count}
+            for name, (sec, count) in sorted(active["stages"].items())
+        },
+        "functions": functions[:TOP_FUNCTIONS],
+        "memory": {"peak_kb": round(peak / 1024, 1), "top": allocations},
+    }
+    os.makedirs(os.path.dirname(active["path"]) or ".", exist_ok=True)
+    with open(active["path"], "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"[INFO] Отчет профилирования: {active['path']}")
+    return active["path"]
+
+
+def profiled(script: str, setting):
+    """Декоратор main(): профилировать, если setting() включает профилирование"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not start(script, setting()):
+                return fn(*args, **kwargs)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                finish()
+        return wrapper
+    return decorator
+
+
+def diff(old: dict, new: dict) -> None:
+    """Напечатать разницу двух отчетов"""
+    def line(name, a, b, unit):
+        delta = b - a
+        pct = f"{delta / a * 100:+.0f}%" if a else "new"
+        print(f"    {name:<44} {a:>10.3f} → {b:>10.3f} {unit} ({pct})")
+
+    print(f"[INFO] {old.get('script')} {old.get('started_at')} → {new.get('started_at')}")
+    line("wall", old.get("wall_seconds", 0), new.get("wall_seconds", 0), "сек")
+    line("peak memory", old["memory"]["peak_kb"] / 1024, new["memory"]["peak_kb"] / 1024, "MB")
+    print("\nЭтапы:")
+    names = sorted(set(old.get("stages", {})) | set(new.get("stages", {})))
+    for name in names:
+        a = old["stages"].get(name, {}).get("seconds", 0)
+        b = new["stages"].get(name, {}).get("seconds", 0)
+        line(name, a, b, "сек")
+    print("\nФункции (общее время):")
+    before = {f["function"]: f["total_seconds"] for f in old.get("functions", [])}
+    after = {f["function"]: f["total_seconds"] for f in new.get("functions", [])}
+    changed = sorted(
+        set(before) | set(after),
+        key=lambda k: abs(after.get(k, 0) - before.get(k, 0)),
+        reverse=True,
+    )
+    for name in changed[:15]:
+        line(name[-44:], before.get(name, 0), after.get(name, 0), "сек")
+
+
+def main():
+    if len(sys.argv) < 4 or sys.argv[1] != "diff":
+        print("Использование: python3 keitaro_profile.py diff <старый.json> <новый.json>")
+        return
+    with open(sys.argv[2], "r", encoding="utf-8") as f:
+        old = json.load(f)
+    with open(sys.argv[3], "r", encoding="utf-8") as f:
+        new = json.load(f)
+    diff(old, new)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Дисковый кеш справочников трекера (офферы, лендинги, группы, домены, кампании).
+
+Снимок хранится как список пар [id, name] в файле
+<CACHE_DIR>/<трекер>_<сущность>.json и считается свежим CACHE_TTL секунд
+(настройка в каждом скрипте, 0 - кеш выключен). Импортеры дописывают в
+снимок созданные объекты (add + flush), а после изменяющих запусков кеш
+трекера можно сбросить:
+
+python3 keitaro_refcache.py invalidate https://tracker.example.com
+python3 keitaro_refcache.py invalidate            # все трекеры
+
+Хеши загруженных архивов (<трекер>_<сущность>_hashes.json) при сбросе
+сохраняются: импорт сверяет их с актуальным списком объектов трекера.
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+from urllib.parse import urlparse
+
+CACHE_DIR = os.getenv("KEITARO_CACHE_DIR") or ".keitaro_cache"
+
+_lock = threading.Lock()
+_pending: dict[tuple, dict] = {}  # (base, entity) -> {id: name}, ждут flush()
+
+
+def tracker_key(base: str) -> str:
+    """Короткий читаемый ключ трекера для имен файлов"""
+    host = urlparse(base).netloc or base
+    safe = "".join(ch if ch.isalnum() or ch in "-." else "_" for ch in host)
+    digest = hashlib.sha1(base.rstrip("/").encode("utf-8")).hexdigest()[:10]
+    return f"{safe}_{digest}"
+
+
+def _path(base: str, entity: str) -> str:
+    return os.path.join(CACHE_DIR, f"{tracker_key(base)}_{entity}.json")
+
+
+def _read(path: str) -> dict | None:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write(path: str, snapshot: dict) -> None:
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def load(base: str, entity: str, ttl: float) -> list | None:
+    """Свежий снимок [[id, name], ...] или None"""
+    if not ttl:
+        return None
+    snapshot = _read(_path(base, entity))
+    if not snapshot or time.time() - snapshot.get("fetched_at", 0) > ttl:
+        return None
+    return snapshot.get("items") or []
+
+
+def save(base: str, entity: str, pairs) -> None:
+    """Сохранить снимок из пар (id, name)"""
+    _write(
+        _path(base, entity),
+        {
+            "base": base,
+            "entity": entity,
+            "fetched_at": time.time(),
+            "items": [[i, n] for i, n in pairs],
+        },
+    )
+
+
+def add(base: str, entity: str, item_id, name: str) -> None:
+    """Запомнить созданный объект; в файл попадет при flush()"""
+    if item_id is None or not name:
+        return
+    with _lock:
+        _pending.setdefault((base, entity), {})[item_id] = name
+
+
+def flush() -> None:
+    """Дописать созданные объекты в существующие снимки (время снимка не меняется)"""
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+    for (base, entity), created in pending.items():
+        path = _path(base, entity)
+        snapshot = _read(path)
+        if not snapshot:
+            continue  # снимка нет - при следующем запуске список загрузится целиком
+        items = {i: n for i, n in snapshot.get("items") or []}
+        items.update(created)
+        snapshot["items"] = [[i, n] for i, n in items.items()]
+        _write(path, snapshot)
+
+
+def load_hashes(base: str, entity: str) -> dict:
+    """Хеши архивов, загруженных на трекер: {sha256: [id, name]}"""
+    snapshot = _read(_path(base, f"{entity}_hashes")) or {}
+    return snapshot.get("hashes") or {}
+
+
+def save_hashes(base: str, entity: str, hashes: dict) -> None:
+    """Сохранить хеши загруженных архивов (без ключа entity - invalidate их не трогает)"""
+    _write(_path(base, f"{entity}_hashes"), {"base": base, "kind": "hashes", "hashes": hashes})
+
+
+def invalidate(base: str | None = None, entities=None) -> int:
+    """Удалить снимки трекера (или всех трекеров). Возвращает число удаленных файлов"""
+    if not os.path.isdir(CACHE_DIR):
+        return 0
+    prefix = f"{tracker_key(base)}_" if base else ""
+    removed = 0
+    for fn in os.listdir(CACHE_DIR):
+        if not fn.endswith(".json") or not fn.startswith(prefix):
+            continue
+        if entities and not any(fn == f"{prefix}{e}.json" for e in entities):
+            continue
+        snapshot = _read(os.path.join(CACHE_DIR, fn)) or {}
+        if not snapshot.get("entity"):
+            continue  # не снимок справочника
+        os.remove(os.path.join(CACHE_DIR, fn))
+        removed += 1
+    with _lock:
+        for key in [k for k in _pending if base is None or k[0] == base]:
+            del _pending[key]
+    return removed
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] != "invalidate":
+        print("Использование: python3 keitaro_refcache.py invalidate [TRACKER_URL]")
+        return
+    base = sys.argv[2] if len(sys.argv) > 2 else None
+    removed = invalidate(base)
+    print(f"[INFO] Удалено снимков: {removed} ({base or 'все трекеры'})")
+
+
+if __name__ == "__main__":
+    main()
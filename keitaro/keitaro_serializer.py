@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Запись и чтение JSON-файлов экспорта (campaigns.json, _mappings.json,
+campaigns_index.json, JSON-заглушки офферов и лендингов).
+
+- если установлен orjson - кодирование и разбор через него, иначе модуль json;
+- compact=True - без отступов (файлы в разы меньше и пишутся быстрее);
+- compress="gzip" или "zstd" - файл сжимается потоково и получает
+  суффикс .gz / .zst (для zstd нужен пакет zstandard, без него - gzip).
+
+load() читает любой из этих вариантов: по пути без суффикса находит
+существующий файл и определяет сжатие по сигнатуре.
+"""
+
+import os
+import io
+import gzip
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def backend() -> str:
+    return "orjson" if orjson is not None else "json"
+
+
+def _encode(obj, compact: bool) -> bytes:
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS  # в маппингах ключи - числовые ID
+        if not compact:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
+    if compact:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def _open_write(path: str, compress: str | None):
+    if compress == "gzip":
+        return gzip.open(path, "wb", compresslevel=6)
+    if compress == "zstd":
+        raw = open(path, "wb")
+        return zstandard.ZstdCompressor(level=3).stream_writer(raw, closefd=True)
+    return open(path, "wb")
+
+
+def dump(obj, path: str, compact: bool = False, compress: str | None = None) -> str:
+    """Записать obj в JSON. Возвращает фактический путь (с суффиксом сжатия)"""
+    if compress not in (None, "", "gzip", "zstd"):
+        raise ValueError(f"Неизвестное сжатие: {compress}")
+    if compress == "zstd" and zstandard is None:
+        print("[WARNING] zstandard не установлен, используется gzip")
+        compress = "gzip"
+    dst = path + SUFFIXES.get(compress or "", "")
+    os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+    data = _encode(obj, compact)
+    tmp = f"{dst}.{os.getpid()}.tmp"
+    with _open_write(tmp, compress or None) as f:
+        view = memoryview(data)
+        for start in range(0, len(view), 1024 * 1024):
+            f.write(view[start:start + 1024 * 1024])
+    os.replace(tmp, dst)
+    # Другие варианты того же файла от прошлых запусков устарели
+    for other in (path, path + ".gz", path + ".zst"):
+        if other != dst and os.path.isfile(other):
+            os.remove(other)
+    return dst
+
+
+def resolve(path: str) -> str | None:
+    """Существующий вариант файла: как есть, .gz или .zst"""
+    for candidate in (path, path + ".gz", path + ".zst"):
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def load(path: str):
+    """Прочитать JSON в любом из поддерживаемых форматов"""
+    real = resolve(path)
+    if real is None:
+        raise FileNotFoundError(path)
+    with open(real, "rb") as f:
+        head = f.read(4)
+        f.seek(0)
+        if head.startswith(GZIP_MAGIC):
+            with gzip.GzipFile(fileobj=f) as gz:
+                data = gz.read()
+        elif head == ZSTD_MAGIC:
+            if zstandard is None:
+                raise RuntimeError(f"{real}: для чтения .zst установите zstandard")
+            with zstandard.ZstdDecompressor().stream_reader(f) as zr:
+                data = io.BufferedReader(zr).read()
+        else:
+            data = f.read()
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data.decode("utf-8"))
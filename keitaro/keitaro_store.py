@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Контентно-адресуемое хранилище архивов для экспортов Keitaro.
+
+Архив хешируется (sha256) прямо во время скачивания и сохраняется один раз
+под своим хешем: <STORE>/ab/abcdef....zip. Пока размер не превышает
+SPOOL_MAX, поток держится в памяти, поэтому на диск пишутся только
+новые архивы. Папка экспорта получает hardlink на объект хранилища или
+ссылку на него в index.csv.
+"""
+
+import os
+import shutil
+import hashlib
+import tempfile
+import threading
+
+CHUNK_SIZE = 1024 * 128
+SPOOL_MAX = 64 * 1024 * 1024  # до этого размера архив буферизуется в памяти
+
+
+def object_path(store_root: str, digest: str) -> str:
+    """Путь объекта в хранилище по его sha256"""
+    return os.path.join(store_root, digest[:2], f"{digest}.zip")
+
+
+def put_stream(chunks, store_root: str, check=None, chunk_size: int = CHUNK_SIZE) -> dict:
+    """Сохранить поток чанков в хранилище. Возвращает {"sha256", "size", "path", "new"}
+
+    check(fileobj) - необязательная проверка содержимого до записи в хранилище.
+    """
+    os.makedirs(store_root, exist_ok=True)
+    h = hashlib.sha256()
+    size = 0
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX, dir=store_root) as tmp:
+        for chunk in chunks:
+            if chunk:
+                tmp.write(chunk)
+                h.update(chunk)
+                size += len(chunk)
+
+        if check is not None:
+            tmp.seek(0)
+            check(tmp)
+
+        digest = h.hexdigest()
+        path = object_path(store_root, digest)
+        new = not os.path.exists(path)
+        if new:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            part = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            tmp.seek(0)
+            with open(part, "wb") as out:
+                shutil.copyfileobj(tmp, out, chunk_size)
+            os.replace(part, path)
+
+    return {"sha256": digest, "size": size, "path": path, "new": new}
+
+
+def link_into(obj_path: str, dst_path: str) -> str:
+    """Hardlink объекта хранилища в папку экспорта (копия, если hardlink невозможен)"""
+    os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+    if os.path.lexists(dst_path):
+        if os.path.exists(dst_path) and os.path.samefile(obj_path, dst_path):
+            return "hardlink"
+        os.remove(dst_path)
+    try:
+        os.link(obj_path, dst_path)
+        return "hardlink"
+    except OSError:
+        # другой раздел или ФС без hardlink-ов
+        shutil.copyfile(obj_path, dst_path)
+        return "copy"
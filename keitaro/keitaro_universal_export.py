@@ -21,9 +21,24 @@ import os
 import csv
 import json
 import time
+import heapq
+import zipfile
+import hashlib
 import requests
 from datetime import datetime
 from urllib.parse import urlencode
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import keitaro_store
+import keitaro_http
+import keitaro_listing
+import keitaro_serializer
+import keitaro_catalog
+import keitaro_capabilities
+import keitaro_verify
+import keitaro_writer
+import keitaro_profile
+from keitaro_async import SyncKeitaro
 
 # ======================== CONFIG ========================
 CONFIG = {
@@ -36,13 +51,65 @@ CONFIG = {
 
     "PER_PAGE": 200,
     "TIMEOUT": 90,
+    "CONNECT_TIMEOUT": 10,  # сек на установку соединения; None - как TIMEOUT
+    "CIRCUIT_BREAKER": 5,  # ошибок API трекера подряд до паузы всех запросов; 0 - выключено (keitaro_http)
+    "BREAKER_PROBE_INTERVAL": 15,  # сек между проверками трекера во время паузы
+    "BREAKER_MAX_OUTAGE": 3600,  # сек ожидания трекера, затем запросы завершаются ошибкой
     "OUT_DIR": None,  # по умолчанию {type}_exports_<timestamp>
     "GROUP_UNGROUPED": "__NO_GROUP__",
-    "RETRY_DOWNLOADS": 2,
+    "RETRY_DOWNLOADS": 2,  # повторных попыток для неудачных скачиваний (после основного прохода)
+    "RETRY_BACKOFF": 2.0,  # сек до первого повтора, дальше удваивается
+    "WORKERS": 1,  # параллельных скачиваний
     "SLEEP_BETWEEN": 0.2,  # сек между запросами
+    "ENGINE": "sync",  # "sync" (requests) или "async" (keitaro_async: список и скачивание архивов)
+    "ASYNC_CONCURRENCY": 10,  # одновременных запросов в режиме async
+    "JSON_COMPACT": False,  # JSON без отступов (keitaro_serializer)
+    "JSON_COMPRESS": None,  # None, "gzip" или "zstd" - сжатие JSON-файлов экспорта
+    "CATALOG": True,  # catalog.sqlite в папке экспорта; путь к файлу - общий каталог; False - не писать
+    "PROFILE": None,  # True или путь отчета - профилирование запуска (keitaro_profile)
+
+    # ========== ХРАНИЛИЩЕ АРХИВОВ (дедупликация) ==========
+    "ARCHIVE_STORE": None,  # папка хранилища, например "archive_store"; None - выключено
+    "STORE_LINK": "hardlink",  # "hardlink" - ссылка в папке экспорта, "index" - только путь в index.csv
+    # ======================================================
+
+    "CONDITIONAL_DOWNLOADS": True,  # при повторном экспорте в ту же папку пропускать неизмененные архивы
+    "RESUME_ATTEMPTS": 3,  # докачек через Range при обрыве одного скачивания
+    "VERIFY_ARCHIVES": False,  # проверять CRC всех файлов архива после скачивания (keitaro_verify)
+    "VERIFY_PROCESSES": None,  # процессов проверки; None - по числу ядер
+
+    # ========== ЗАПИСЬ НА ДИСК ==========
+    "CHUNK_SIZE": 128 * 1024,  # байт в одном чтении из сети
+    "ASYNC_WRITES": False,  # запись на диск в отдельных потоках (keitaro_writer): сеть не ждет диск
+    "WRITE_QUEUE_CHUNKS": 64,  # чанков в очереди одного потока записи
+    "DISK_WRITERS": 1,  # потоков записи на диск
+    "PREALLOCATE": False,  # резервировать место под архив по Content-Length (при ASYNC_WRITES)
+    # ====================================
+
+    # ========== ПОРЯДОК СКАЧИВАНИЯ (при WORKERS > 1) ==========
+    "SCHEDULE": "largest_first",  # "largest_first" - сначала самые большие архивы, "listing" - порядок API
+    "SIZE_PROBE": "manifest",  # "manifest" - размеры из прошлого экспорта, "head" - плюс HEAD для неизвестных
+    "SIZE_MANIFEST": None,  # index.csv (или папка) прошлого экспорта; состояние OUT_DIR читается всегда
+    # ==========================================================
+
+    # ========== ФИЛЬТРЫ (выборочный экспорт) ==========
+    # group_id и state передаются трекеру в запросе списка, остальное - фильтр на клиенте;
+    # отсеянные элементы не скачиваются и не запрашиваются детально
+    "FILTER_GROUP_IDS": None,  # [1, 2] - только эти группы
+    "FILTER_STATE": None,  # например "active"
+    "FILTER_ID_FROM": None,  # ID от (включительно)
+    "FILTER_ID_TO": None,  # ID до (включительно)
+    "FILTER_UPDATED_SINCE": None,  # "2025-01-01" или "2025-01-01 00:00:00"
+    # ==================================================
 }
 # ====================== /CONFIG ========================
 
+INDEX_FIELDS = ["id", "name", "group", "file_path", "type", "source", "sha256", "size"]
+STATE_FILE = ".download_state.json"  # ETag/Last-Modified/размер скачанных архивов
+
+WRITER: keitaro_writer.Writer | None = None  # этап записи на диск при ASYNC_WRITES
+VERIFY_POOL: ProcessPoolExecutor | None = None  # проверка CRC при VERIFY_ARCHIVES
+
 
 def load_config_from_env():
     """Загрузить настройки из .env файла"""
@@ -55,7 +122,7 @@ def load_config_from_env():
         print("[WARNING] dotenv не установлен, используйте переменные окружения")
 
 
-def _session(api_key: str) -> requests.Session:
+def _session(api_key: str, pool_maxsize: int = 10) -> requests.Session:
     s = requests.Session()
     s.headers.update(
         {
@@ -64,7 +131,7 @@ def _session(api_key: str) -> requests.Session:
             "Content-Type": "application/json",
         }
     )
-    return s
+    return keitaro_http.mount(s, keitaro_http.http_adapter(CONFIG, pool_maxsize))
 
 
 def _safe(s: str | None, fallback="item") -> str:
@@ -85,33 +152,22 @@ def _api(base: str, path: str, params: dict | None = None) -> str:
     return url
 
 
-def detect_landings_endpoint(
-    s: requests.Session, base: str, per_page: int, timeout: int
-) -> str:
-    """Определяет правильный эндпоинт для лендингов: landing_pages или landings"""
-    for ep in ("landing_pages", "landings"):
-        url = _api(base, ep, {"per_page": 1, "page": 1})
-        try:
-            r = s.get(url, timeout=timeout)
-            if r.status_code == 200:
-                return ep
-        except requests.RequestException:
-            pass
-    raise RuntimeError(
-        "Не удалось определить эндпоинт лендингов (landing_pages/landings)."
-    )
-
-
 def iter_items(
-    s: requests.Session, base: str, endpoint: str, per_page: int, timeout: int
+    s: requests.Session,
+    base: str,
+    endpoint: str,
+    per_page: int,
+    timeout: int,
+    params: dict | None = None,
 ):
-    """Итерация по всем элементам с пагинацией"""
+    """Итерация по всем элементам с пагинацией (params - фильтры запроса списка)"""
     page = 1
     while True:
-        url = _api(base, endpoint, {"per_page": per_page, "page": page})
-        r = s.get(url, timeout=timeout)
-        r.raise_for_status()
-        data = r.json()
+        url = _api(base, endpoint, dict(params or {}, per_page=per_page, page=page))
+        with keitaro_profile.stage("listing"):
+            r = s.get(url, timeout=timeout)
+            r.raise_for_status()
+            data = r.json()
         items = data.get("data") if isinstance(data, dict) else data
         if not items:
             break
@@ -151,39 +207,172 @@ def try_direct_url(
             or r.headers.get("Content-Disposition", "").lower().find(".zip") != -1
         ):
             return r
+        r.close()
     except requests.RequestException:
         pass
     return None
 
 
 def try_download_endpoints(
-    s: requests.Session, base: str, endpoint: str, item_id, timeout: int
+    s: requests.Session, base: str, endpoint: str, item_id, timeout: int, hint: dict | None = None
 ) -> requests.Response | None:
-    """Пробуем несколько вариантов эндпоинтов для скачивания"""
-    candidates = [
-        _api(base, f"{endpoint}/{item_id}/export"),
-        _api(base, f"{endpoint}/{item_id}/download"),
-        _api(base, f"{endpoint}/{item_id}/archive"),
-        # без admin_api (редко, но бывает)
-        f"{base.rstrip('/')}/{endpoint}/{item_id}/export",
-        f"{base.rstrip('/')}/{endpoint}/{item_id}/download",
-        f"{base.rstrip('/')}/{endpoint}/{item_id}/archive",
-    ]
-
-    for url in candidates:
+    """Пробуем несколько вариантов эндпоинтов для скачивания.
+
+    hint["pattern"] - шаблон URL, сработавший в прошлый раз (keitaro_capabilities);
+    он пробуется первым и обновляется при успехе.
+    """
+    hint = hint if hint is not None else {}
+    for pattern, url in keitaro_capabilities.download_urls(
+        base, endpoint, item_id, hint.get("pattern")
+    ):
         try:
             r = s.get(url, timeout=timeout, stream=True)
             if r.status_code == 200 and (
                 "application/zip" in r.headers.get("Content-Type", "").lower()
                 or "attachment" in r.headers.get("Content-Disposition", "").lower()
-                or len(r.content) > 100
+                or keitaro_verify.is_zip_bytes(r.content)  # без заголовков - по сигнатуре ZIP
             ):
+                hint["pattern"] = pattern
                 return r
+            r.close()
         except requests.RequestException:
             pass
     return None
 
 
+def load_known_sizes(download_state: dict) -> dict[str, int]:
+    """Размеры архивов из прошлых запусков: {id: байт}"""
+    sizes = {}
+    for entry in download_state.values():
+        row = entry.get("row") or {}
+        if row.get("size"):
+            sizes[str(row["id"])] = int(row["size"])
+
+    manifest = CONFIG["SIZE_MANIFEST"]
+    if manifest and os.path.isdir(manifest):
+        manifest = os.path.join(manifest, "index.csv")
+    if manifest and os.path.isfile(manifest):
+        with open(manifest, "r", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                if row.get("size") and str(row.get("id")) not in sizes:
+                    sizes[str(row["id"])] = int(row["size"])
+    return sizes
+
+
+def probe_size(
+    s: requests.Session, base: str, endpoint: str, item: dict, hint: dict, timeout: int
+) -> int | None:
+    """Размер архива по HEAD (Content-Length).
+
+    hint["pattern"] - шаблон URL, ответивший в прошлый раз; он пробуется
+    первым, чтобы не перебирать все варианты для каждого элемента.
+    """
+    for pattern, url in keitaro_capabilities.download_urls(
+        base, endpoint, item.get("id"), hint.get("pattern")
+    ):
+        try:
+            r = s.head(url, timeout=timeout, allow_redirects=True)
+        except requests.RequestException:
+            continue
+        if r.status_code == 200 and r.headers.get("Content-Length"):
+            hint["pattern"] = pattern
+            return int(r.headers["Content-Length"])
+    return None
+
+
+def order_largest_first(items: list[dict], sizes: dict[str, int]) -> list[dict]:
+    """Сначала самые большие архивы (LPT), неизвестные - по медиане известных"""
+    known = sorted(sizes.values())
+    median = known[len(known) // 2] if known else 0
+    return sorted(items, key=lambda it: sizes.get(str(it.get("id")), median), reverse=True)
+
+
+def response_validators(resp: requests.Response) -> dict:
+    """Метаданные ответа для следующего условного запроса"""
+    return {
+        "url": resp.url,
+        "etag": resp.headers.get("ETag"),
+        "last_modified": resp.headers.get("Last-Modified"),
+        "content_length": resp.headers.get("Content-Length"),
+    }
+
+
+def try_conditional(
+    s: requests.Session, prev: dict, timeout: int
+) -> tuple[str, requests.Response | None]:
+    """Условный GET по URL прошлого скачивания.
+
+    Возвращает ("not_modified", None), ("modified", resp) или ("miss", None).
+    """
+    headers = {}
+    if prev.get("etag"):
+        headers["If-None-Match"] = prev["etag"]
+    if prev.get("last_modified"):
+        headers["If-Modified-Since"] = prev["last_modified"]
+    try:
+        r = s.get(prev["url"], headers=headers, timeout=timeout, stream=True)
+    except requests.RequestException:
+        return "miss", None
+
+    if r.status_code == 304:
+        r.close()
+        return "not_modified", None
+    if r.status_code != 200:
+        r.close()
+        return "miss", None
+
+    # Сервер проигнорировал условные заголовки - сравниваем метаданные сами.
+    # Одного совпадения размера мало: архив того же размера мог измениться.
+    now = response_validators(r)
+    same_etag = now["etag"] and now["etag"] == prev.get("etag")
+    same_mtime = (
+        now["last_modified"]
+        and now["last_modified"] == prev.get("last_modified")
+        and now["content_length"] == prev.get("content_length")
+    )
+    if same_etag or same_mtime:
+        r.close()
+        return "not_modified", None
+    return "modified", r
+
+
+def load_download_state(out_root: str) -> dict:
+    """Состояние прошлых скачиваний: {"endpoint:id": {url, etag, ..., row}}"""
+    path = os.path.join(out_root, STATE_FILE)
+    if not CONFIG["CONDITIONAL_DOWNLOADS"] or not os.path.isfile(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _disk(fn, *args, **kwargs):
+    """Выполнить запись на диск: в потоке записи (ASYNC_WRITES) или здесь же"""
+    with keitaro_profile.stage("write"):
+        if WRITER is not None:
+            return WRITER.call(fn, *args, **kwargs)
+        return fn(*args, **kwargs)
+
+
+def _write_state(path: str, state: dict) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+
+
+def save_download_state(out_root: str, state: dict) -> None:
+    _disk(_write_state, os.path.join(out_root, STATE_FILE), state)
+
+
+def _write_index(path: str, rows: list[dict]) -> None:
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=INDEX_FIELDS)
+        w.writeheader()
+        for row in rows:
+            w.writerow(row)
+
+
 def get_item_details(
     s: requests.Session, base: str, endpoint: str, item_id, timeout: int
 ) -> dict | None:
@@ -197,23 +386,417 @@ def get_item_details(
         return None
 
 
-def save_stream(resp: requests.Response, dst_path: str) -> None:
-    """Сохранить поток в файл"""
+def _range_request(
+    s: requests.Session, url: str, offset: int, validator: str | None, timeout: int
+) -> requests.Response | None:
+    """Запросить хвост ресурса с offset. None, если сервер не вернул 206 с нужного места"""
+    headers = {"Range": f"bytes={offset}-"}
+    if validator:
+        headers["If-Range"] = validator
+    r = s.get(url, headers=headers, timeout=timeout, stream=True)
+    if r.status_code == 206 and r.headers.get("Content-Range", "").startswith(f"bytes {offset}-"):
+        return r
+    r.close()
+    return None
+
+
+def iter_resumable(
+    s: requests.Session, resp: requests.Response, timeout: int, offset: int = 0
+):
+    """Чанки ответа. При обрыве соединения докачивает Range-запросом с текущего места"""
+    accept_ranges = resp.headers.get("Accept-Ranges", "").lower() == "bytes"
+    validator = resp.headers.get("ETag") or resp.headers.get("Last-Modified")
+    url = resp.url
+    attempts = 0
+    while True:
+        try:
+            for chunk in resp.iter_content(chunk_size=CONFIG["CHUNK_SIZE"]):
+                if chunk:
+                    offset += len(chunk)
+                    yield chunk
+            return
+        except requests.RequestException:
+            resp.close()
+            attempts += 1
+            if not accept_ranges or attempts > CONFIG["RESUME_ATTEMPTS"]:
+                raise
+            print(f"    ⚠ Обрыв на {offset} байт, докачка {attempts}/{CONFIG['RESUME_ATTEMPTS']}")
+            resp = _range_request(s, url, offset, validator, timeout)
+            if resp is None:
+                raise requests.ConnectionError("сервер не продолжил докачку с места обрыва")
+
+
+def check_zip(path_or_file) -> None:
+    """Проверить центральный каталог ZIP (и CRC при VERIFY_ARCHIVES). OSError, если архив битый"""
+    try:
+        with zipfile.ZipFile(path_or_file):
+            pass
+    except zipfile.BadZipFile as e:
+        raise OSError(f"не ZIP-архив: {e}") from e
+    if not CONFIG["VERIFY_ARCHIVES"]:
+        return
+    if VERIFY_POOL is not None and isinstance(path_or_file, str):
+        result = VERIFY_POOL.submit(keitaro_verify.verify_zip, path_or_file, False).result()
+    else:
+        result = keitaro_verify.verify_zip(path_or_file, with_hash=False)
+    if not result["ok"]:
+        raise OSError(f"битый архив: {result['error']}")
+
+
+def _part_meta(part: str) -> dict | None:
+    """Валидатор и размер ответа, с которого начат .part (файл <part>.meta)"""
+    try:
+        with open(part + ".meta", "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _drop_part(part: str) -> None:
+    for path in (part, part + ".meta"):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def save_stream(
+    resp: requests.Response, dst_path: str, s: requests.Session, timeout: int
+) -> dict:
+    """Сохранить поток в файл через .part с докачкой. Возвращает {"sha256", "size"}
+
+    Недокачанный .part от прошлой попытки продолжается Range-запросом, если
+    сервер поддерживает диапазоны, а ETag/Last-Modified и размер ответа
+    совпадают с сохраненными при начале .part (<part>.meta); иначе архив
+    изменился и .part скачивается заново. Готовый файл проверяется по
+    размеру и центральному каталогу ZIP и атомарно переименовывается на место.
+    """
     os.makedirs(os.path.dirname(dst_path), exist_ok=True)
-    with open(dst_path, "wb") as f:
-        for chunk in resp.iter_content(chunk_size=1024 * 128):
-            if chunk:
+    part = dst_path + ".part"
+    h = hashlib.sha256()
+    offset = 0
+    expected = int(resp.headers.get("Content-Length") or 0) or None
+    validator = resp.headers.get("ETag") or resp.headers.get("Last-Modified")
+    accept_ranges = resp.headers.get("Accept-Ranges", "").lower() == "bytes"
+
+    meta = _part_meta(part) if os.path.isfile(part) else None
+    if (
+        meta
+        and accept_ranges
+        and validator
+        and meta.get("validator") == validator
+        and meta.get("size") == expected
+    ):
+        have = os.path.getsize(part)
+        if expected and 0 < have < expected:
+            tail = _range_request(s, resp.url, have, meta["validator"], timeout)
+            if tail is not None:
+                resp.close()
+                resp = tail
+                offset = have
+                with open(part, "rb") as f:
+                    for block in iter(lambda: f.read(1024 * 1024), b""):
+                        h.update(block)
+                print(f"    ⚠ Продолжаю недокачанный файл с {have} байт")
+
+    if not offset:
+        # .part другой версии архива (или без валидатора) не продолжается
+        _drop_part(part)
+        if validator:
+            with open(part + ".meta", "w", encoding="utf-8") as f:
+                json.dump({"validator": validator, "size": expected}, f)
+
+    if WRITER is not None:
+        # Чтение из сети здесь, запись - в потоке Writer через ограниченную очередь
+        out = WRITER.open(part, offset, expected if CONFIG["PREALLOCATE"] else None)
+    else:
+        out = open(part, "ab" if offset else "wb")
+    with out as f:
+        for chunk in keitaro_profile.timed_iter(iter_resumable(s, resp, timeout, offset), "transfer"):
+            with keitaro_profile.stage("write"):
                 f.write(chunk)
+            h.update(chunk)
+            offset += len(chunk)
 
+    if expected and offset != expected:
+        # .part остается - следующая попытка продолжит с этого места
+        raise OSError(f"размер {offset} байт вместо {expected}")
+    try:
+        with keitaro_profile.stage("verify"):
+            check_zip(part)
+    except OSError:
+        _drop_part(part)
+        raise
+    os.replace(part, dst_path)
+    _drop_part(part)
+    return {"sha256": h.hexdigest(), "size": offset}
+
+
+def save_to_store(
+    resp: requests.Response, dst_path: str, out_root: str, s: requests.Session, timeout: int
+) -> dict:
+    """Сохранить поток в хранилище архивов.
+
+    Возвращает {"sha256", "size", "new", "file_path"}, где file_path - путь для
+    index.csv (hardlink в папке экспорта или объект хранилища).
+    """
+    saved = keitaro_store.put_stream(
+        keitaro_profile.timed_iter(iter_resumable(s, resp, timeout), "transfer"),
+        CONFIG["ARCHIVE_STORE"],
+        check=check_zip,
+    )
+    if CONFIG["STORE_LINK"] == "hardlink":
+        keitaro_store.link_into(saved["path"], dst_path)
+        saved["file_path"] = os.path.relpath(dst_path, out_root)
+    else:
+        saved["file_path"] = os.path.relpath(saved["path"], out_root)
+    return saved
 
-def save_as_json(data: dict, dst_path: str) -> None:
-    """Сохранить данные как JSON (запасной вариант)"""
-    os.makedirs(os.path.dirname(dst_path), exist_ok=True)
-    with open(dst_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+
+def save_as_json(data: dict, dst_path: str) -> str:
+    """Сохранить данные как JSON (запасной вариант). Возвращает фактический путь"""
+    return _disk(
+        keitaro_serializer.dump,
+        data, dst_path, compact=CONFIG["JSON_COMPACT"], compress=CONFIG["JSON_COMPRESS"],
+    )
+
+
+def item_target(item: dict, export_type: str, out_root: str) -> dict:
+    """Имя, группа и пути файлов элемента в папке экспорта"""
+    item_id = item.get("id")
+    name = _safe(item.get("name") or f"{export_type}_{item_id}")
+
+    # Группа может быть в разных полях
+    group = as_group_name(
+        item.get("group_name") or item.get("group"),
+        CONFIG["GROUP_UNGROUPED"]
+    )
+
+    dst_dir = os.path.join(out_root, group)
+    os.makedirs(dst_dir, exist_ok=True)
+    return {
+        "id": item_id,
+        "name": name,
+        "group": group,
+        "zip": os.path.join(dst_dir, f"{item_id}_{name}.zip"),
+        "json": os.path.join(dst_dir, f"{item_id}_{name}.json"),
+    }
+
+
+def direct_urls(item: dict) -> list[str]:
+    """Прямые URL архива в объекте (если есть)"""
+    return [
+        (item.get("archive_url") or ""),
+        (item.get("export_url") or ""),
+        (item.get("download_url") or ""),
+        (item.get("zip_url") or ""),
+    ]
+
+
+def _new_result(item: dict, target: dict) -> dict:
+    """Результат export_item до скачивания (status "failed")"""
+    return {
+        "status": "failed",
+        "item": item,
+        "row": None,
+        "failure": None,
+        "state": None,
+        "deduplicated": False,
+        "target": target,
+    }
+
+
+def _fail(result: dict, reason: str) -> dict:
+    t = result["target"]
+    result["failure"] = {"id": t["id"], "name": t["name"], "group": t["group"], "reason": reason}
+    return result
+
+
+def _print_item(label: str, export_type: str, target: dict) -> None:
+    item_type_ru = "лендинг" if export_type == "landings" else "оффер"
+    print(
+        f"\n[{label}] {item_type_ru.capitalize()}: {target['name']} "
+        f"(ID: {target['id']}, Группа: {target['group']})"
+    )
 
 
+def save_archive(
+    s: requests.Session,
+    resp: requests.Response,
+    result: dict,
+    out_root: str,
+    state_key: str,
+    timeout: int,
+) -> dict:
+    """Сохранить ZIP из ответа (хранилище или файл через .part) в result export_item"""
+    t = result["target"]
+    try:
+        if CONFIG["ARCHIVE_STORE"]:
+            saved = save_to_store(resp, t["zip"], out_root, s, timeout)
+            if saved["new"]:
+                print(f"    ✓ Новый ZIP в хранилище → {saved['sha256'][:12]}")
+            else:
+                result["deduplicated"] = True
+                print(f"    ✓ ZIP не изменился, уже в хранилище → {saved['sha256'][:12]}")
+        else:
+            saved = save_stream(resp, t["zip"], s, timeout)
+            saved["file_path"] = os.path.relpath(t["zip"], out_root)
+            print(f"    ✓ Сохранен ZIP → {t['zip']}")
+        row = {
+            "id": t["id"],
+            "name": t["name"],
+            "group": t["group"],
+            "file_path": saved["file_path"],
+            "type": "zip",
+            "source": "archive_endpoint",
+            "sha256": saved["sha256"],
+            "size": saved["size"],
+        }
+        result.update(
+            status="zip",
+            row=row,
+            state=(state_key, dict(response_validators(resp), row=row)),
+        )
+    except OSError as e:
+        print(f"    ✗ Ошибка записи: {e}")
+        _fail(result, f"write_error: {e}")
+    return result
+
+
+def export_item(
+    s: requests.Session,
+    base: str,
+    endpoint: str,
+    export_type: str,
+    item: dict,
+    out_root: str,
+    download_state: dict,
+    label: str,
+    timeout: int,
+    hint: dict | None = None,
+    archive_missing: bool = False,
+) -> dict:
+    """Скачать один элемент (ZIP или JSON с деталями).
+
+    Возвращает {"status": "zip" | "json" | "unchanged" | "failed", "item",
+    "row", "failure", "state", "deduplicated", "target"}. Общие счетчики и
+    index обновляет вызывающий код, поэтому функцию можно запускать в потоках.
+    archive_missing - архив уже искали (ENGINE="async"): сразу детали как JSON.
+    """
+    target = item_target(item, export_type, out_root)
+    item_id, name, dst_json = target["id"], target["name"], target["json"]
+    result = _new_result(item, target)
+    _print_item(label, export_type, target)
+    resp = None
+
+    # 0) Архив уже скачивался в эту папку - условный запрос по прошлому URL
+    state_key = f"{endpoint}:{item_id}"
+    prev = download_state.get(state_key)
+    if (
+        prev
+        and not archive_missing
+        and os.path.isfile(os.path.join(out_root, prev["row"]["file_path"]))
+    ):
+        with keitaro_profile.stage("probing"):
+            status, resp = try_conditional(s, prev, timeout)
+        if status == "not_modified":
+            print(f"    ✓ Не изменился, скачивание пропущено")
+            keitaro_profile.sleep(CONFIG["SLEEP_BETWEEN"])
+            result.update(status="unchanged", row=prev["row"])
+            return result
+        if resp:
+            print(f"    ✓ Архив изменился, скачиваю заново")
+
+    # 1) Прямые URL в объекте (если есть)
+    if not resp and not archive_missing:
+        for u in direct_urls(item):
+            with keitaro_profile.stage("probing"):
+                resp = try_direct_url(s, u, timeout)
+            if resp:
+                print(f"    ✓ Найден прямой URL")
+                break
+
+    # 2) Стандартные REST-пути
+    if not resp and not archive_missing:
+        with keitaro_profile.stage("probing"):
+            resp = try_download_endpoints(s, base, endpoint, item_id, timeout, hint)
+        if resp:
+            print(f"    ✓ Скачано через эндпоинт")
+
+    # 3) Если ничего не помогло - сохраняем детали как JSON
+    if not resp:
+        print(f"    ⚠ ZIP недоступен, пробую получить детали...")
+        with keitaro_profile.stage("details"):
+            details = get_item_details(s, base, endpoint, item_id, timeout)
+        if details:
+            try:
+                dst_json = save_as_json(details, dst_json)
+                print(f"    ✓ Сохранен как JSON → {dst_json}")
+                result.update(
+                    status="json",
+                    row={
+                        "id": item_id,
+                        "name": name,
+                        "group": target["group"],
+                        "file_path": os.path.relpath(dst_json, out_root),
+                        "type": "json",
+                        "source": "details_api",
+                    },
+                )
+            except OSError as e:
+                print(f"    ✗ Ошибка записи: {e}")
+                _fail(result, f"write_error: {e}")
+        else:
+            print(f"    ✗ Не удалось получить данные")
+            _fail(result, "no_data_available")
+    else:
+        # Скачивание ZIP
+        save_archive(s, resp, result, out_root, state_key, timeout)
+
+    keitaro_profile.sleep(CONFIG["SLEEP_BETWEEN"])
+    return result
+
+
+def run_retry_queue(queue: list[dict], work, workers: int):
+    """Повторить неудачные элементы с экспоненциальной задержкой.
+
+    Пока одни элементы ждут своей очереди, другие уже выполняются, так что
+    пул соединений не простаивает. Отдает итоговый результат по каждому элементу.
+    """
+    attempts = CONFIG["RETRY_DOWNLOADS"]
+    backoff = CONFIG["RETRY_BACKOFF"]
+    seq = 0
+    heap = []
+    for item in queue:
+        seq += 1
+        heapq.heappush(heap, (time.monotonic() + backoff, seq, item, 1))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        inflight = {}
+        while heap or inflight:
+            now = time.monotonic()
+            while heap and heap[0][0] <= now and len(inflight) < workers:
+                _, _, item, attempt = heapq.heappop(heap)
+                label = f"повтор {attempt}/{attempts}"
+                inflight[pool.submit(work, (label, item))] = (item, attempt)
+
+            delay = max(heap[0][0] - now, 0) if heap else None
+            if not inflight:
+                keitaro_profile.sleep(delay)
+                continue
+            done, _ = wait(inflight, timeout=delay, return_when=FIRST_COMPLETED)
+            for fut in done:
+                item, attempt = inflight.pop(fut)
+                result = fut.result()
+                if result["status"] == "failed" and attempt < attempts:
+                    seq += 1
+                    due = time.monotonic() + backoff * 2 ** attempt
+                    heapq.heappush(heap, (due, seq, item, attempt + 1))
+                else:
+                    yield result
+
+
+@keitaro_profile.profiled("keitaro_universal_export", lambda: CONFIG["PROFILE"])
 def main():
+    global WRITER, VERIFY_POOL
     load_config_from_env()
 
     base = CONFIG["BASE_URL"]
@@ -230,17 +813,13 @@ def main():
 
     per_page = CONFIG["PER_PAGE"]
     timeout = CONFIG["TIMEOUT"]
-    ungrouped = CONFIG["GROUP_UNGROUPED"]
 
     # Определяем эндпоинт
     if export_type == "landings":
-        s_temp = _session(api_key)
-        endpoint = detect_landings_endpoint(s_temp, base, per_page, timeout)
-        item_type_ru = "лендинг"
+        endpoint = keitaro_capabilities.landings_endpoint(_session(api_key), base, timeout)
         item_type_ru_plural = "лендингов"
     else:
         endpoint = "offers"
-        item_type_ru = "оффер"
         item_type_ru_plural = "офферов"
 
     out_root = (
@@ -249,134 +828,158 @@ def main():
     )
     os.makedirs(out_root, exist_ok=True)
 
-    s = _session(api_key)
+    workers = max(int(CONFIG["WORKERS"]), 1)
+    s = _session(api_key, max(workers, 10))
     print(f"[INFO] Режим: {export_type.upper()}")
     print(f"[INFO] Эндпоинт: {endpoint}")
     print(f"[INFO] Подключение к: {base}")
     print(f"[INFO] Папка экспорта: {out_root}")
+    if CONFIG["ARCHIVE_STORE"]:
+        print(f"[INFO] Хранилище архивов: {CONFIG['ARCHIVE_STORE']} ({CONFIG['STORE_LINK']})")
+    if CONFIG["VERIFY_ARCHIVES"]:
+        VERIFY_POOL = ProcessPoolExecutor(max_workers=CONFIG["VERIFY_PROCESSES"])
+        print(f"[INFO] Проверка CRC архивов: {CONFIG['VERIFY_PROCESSES'] or os.cpu_count()} процесс(ов)")
+    if CONFIG["ASYNC_WRITES"]:
+        WRITER = keitaro_writer.Writer(CONFIG["WRITE_QUEUE_CHUNKS"], CONFIG["DISK_WRITERS"])
+        print(f"[INFO] Запись на диск: {CONFIG['DISK_WRITERS']} поток(а), "
+              f"очередь {CONFIG['WRITE_QUEUE_CHUNKS']} x {CONFIG['CHUNK_SIZE'] // 1024} KB")
 
     index_rows: list[dict] = []
     failed: list[dict] = []
     total = 0
     ok = 0
     saved_as_json = 0
+    deduplicated = 0
+    unchanged = 0
+    retried_ok = 0
+    download_state = load_download_state(out_root)
+    if download_state:
+        print(f"[INFO] Найдено прошлых скачиваний: {len(download_state)} (условные запросы)")
+
+    filters = keitaro_listing.filters_from_config(CONFIG)
+    params = keitaro_listing.filter_params(filters)
+    if filters:
+        print(f"[INFO] Фильтры: {keitaro_listing.describe(filters)}")
+
+    engine = None
+    if CONFIG["ENGINE"] == "async":
+        engine = SyncKeitaro(
+            base, api_key, timeout, CONFIG["ASYNC_CONCURRENCY"], **keitaro_http.adapter_limits(s)
+        )
+        items = engine.list_all(endpoint, per_page, params)
+        print(f"[INFO] Получено {item_type_ru_plural} (async): {len(items)}")
+    else:
+        items = iter_items(s, base, endpoint, per_page, timeout, params)
+    items = keitaro_listing.select(items, filters)
+
+    # Шаблон URL скачивания, сработавший на этом трекере в прошлый раз
+    hint = {"pattern": keitaro_capabilities.download_pattern(base, endpoint)}
+
+    # Самые большие архивы - первыми, чтобы потоки закончили примерно одновременно
+    if workers > 1 and CONFIG["SCHEDULE"] == "largest_first":
+        items = list(items)
+        sizes = load_known_sizes(download_state)
+        unknown = [it for it in items if str(it.get("id")) not in sizes]
+        if unknown and CONFIG["SIZE_PROBE"] == "head":
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                probed = pool.map(
+                    lambda it: probe_size(s, base, endpoint, it, hint, timeout), unknown
+                )
+                for it, size in zip(unknown, probed):
+                    if size is not None:
+                        sizes[str(it.get("id"))] = size
+        items = order_largest_first(items, sizes)
+        print(
+            f"[INFO] Порядок: сначала большие архивы "
+            f"(размер известен для {sum(str(it.get('id')) in sizes for it in items)}/{len(items)})"
+        )
 
-    for item in iter_items(s, base, endpoint, per_page, timeout):
-        total += 1
-        item_id = item.get("id")
-        name = _safe(item.get("name") or f"{export_type}_{item_id}")
+    # ENGINE="async": архивы скачиваются одним пакетом через keitaro_async и
+    # сохраняются тем же save_archive; условные запросы по прошлому скачиванию
+    # и детали как JSON (архив не найден) - в основном проходе
+    prefetched: dict = {}
+    if engine is not None:
+        items = list(items)
 
-        # Группа может быть в разных полях
-        group = as_group_name(
-            item.get("group_name") or item.get("group"),
-            ungrouped
-        )
+        def prefetch_job(label: str, item: dict) -> tuple:
+            target = item_target(item, export_type, out_root)
+            result = _new_result(item, target)
 
-        dst_dir = os.path.join(out_root, group)
-        dst_zip = os.path.join(dst_dir, f"{item_id}_{name}.zip")
-        dst_json = os.path.join(dst_dir, f"{item_id}_{name}.json")
-        os.makedirs(dst_dir, exist_ok=True)
+            def save(resp):
+                _print_item(label, export_type, target)
+                return save_archive(s, resp, result, out_root, f"{endpoint}:{target['id']}", timeout)
 
-        print(f"\n[{total}] {item_type_ru.capitalize()}: {name} (ID: {item_id}, Группа: {group})")
+            return target["id"], save, tuple(direct_urls(item))
 
-        # 1) Прямые URL в объекте (если есть)
-        direct_urls = [
-            (item.get("archive_url") or ""),
-            (item.get("export_url") or ""),
-            (item.get("download_url") or ""),
-            (item.get("zip_url") or ""),
+        jobs = [
+            prefetch_job(f"{n}", item)
+            for n, item in enumerate(items, start=1)
+            if f"{endpoint}:{item.get('id')}" not in download_state
         ]
-        resp = None
-        for u in direct_urls:
-            resp = try_direct_url(s, u, timeout)
-            if resp:
-                print(f"    ✓ Найден прямой URL")
-                break
-
-        # 2) Стандартные REST-пути
-        if not resp:
-            resp = try_download_endpoints(s, base, endpoint, item_id, timeout)
-            if resp:
-                print(f"    ✓ Скачано через эндпоинт")
+        print(f"[INFO] Скачивание архивов (async): {len(jobs)}")
+        prefetched = engine.download_many(endpoint, jobs, hint)
+
+    def work(numbered):
+        label, item = numbered
+        if item.get("id") in prefetched:
+            result = prefetched.pop(item.get("id"))
+            if result is not None:
+                return result
+            return export_item(
+                s, base, endpoint, export_type, item, out_root, download_state, label, timeout,
+                hint, archive_missing=True,
+            )
+        return export_item(
+            s, base, endpoint, export_type, item, out_root, download_state, label, timeout, hint
+        )
 
-        # 3) Если ничего не помогло - сохраняем детали как JSON
-        if not resp:
-            print(f"    ⚠ ZIP недоступен, пробую получить детали...")
-            details = get_item_details(s, base, endpoint, item_id, timeout)
-            if details:
-                try:
-                    save_as_json(details, dst_json)
-                    saved_as_json += 1
-                    ok += 1
-                    print(f"    ✓ Сохранен как JSON → {dst_json}")
-                    index_rows.append(
-                        {
-                            "id": item_id,
-                            "name": name,
-                            "group": group,
-                            "file_path": os.path.relpath(dst_json, out_root),
-                            "type": "json",
-                            "source": "details_api",
-                        }
-                    )
-                except OSError as e:
-                    failed.append(
-                        {
-                            "id": item_id,
-                            "name": name,
-                            "group": group,
-                            "reason": f"write_error: {e}",
-                        }
-                    )
-                    print(f"    ✗ Ошибка записи: {e}")
+    def collect(result):
+        nonlocal ok, saved_as_json, deduplicated, unchanged
+        if result["status"] == "failed":
+            failed.append(result["failure"])
+            return
+        ok += 1
+        saved_as_json += result["status"] == "json"
+        unchanged += result["status"] == "unchanged"
+        deduplicated += result["deduplicated"]
+        index_rows.append(result["row"])
+        if result["state"]:
+            download_state[result["state"][0]] = result["state"][1]
+
+    # Основной проход. Неудачи откладываются в очередь повторов, а не в failed.json
+    retry_queue: list[dict] = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        numbered = ((f"{n}", item) for n, item in enumerate(items, start=1))
+        for result in pool.map(work, numbered):
+            total += 1
+            if result["status"] == "failed" and CONFIG["RETRY_DOWNLOADS"] > 0:
+                retry_queue.append(result["item"])
             else:
-                failed.append(
-                    {
-                        "id": item_id,
-                        "name": name,
-                        "group": group,
-                        "reason": "no_data_available",
-                    }
-                )
-                print(f"    ✗ Не удалось получить данные")
-        else:
-            # Скачивание ZIP
-            try:
-                save_stream(resp, dst_zip)
-                ok += 1
-                print(f"    ✓ Сохранен ZIP → {dst_zip}")
-                index_rows.append(
-                    {
-                        "id": item_id,
-                        "name": name,
-                        "group": group,
-                        "file_path": os.path.relpath(dst_zip, out_root),
-                        "type": "zip",
-                        "source": "archive_endpoint",
-                    }
-                )
-            except OSError as e:
-                failed.append(
-                    {
-                        "id": item_id,
-                        "name": name,
-                        "group": group,
-                        "reason": f"write_error: {e}",
-                    }
-                )
-                print(f"    ✗ Ошибка записи: {e}")
+                collect(result)
 
-        time.sleep(CONFIG["SLEEP_BETWEEN"])
+    # Отложенные повторы с экспоненциальной задержкой
+    if retry_queue:
+        print(
+            f"\n[INFO] Повтор неудачных скачиваний: {len(retry_queue)} "
+            f"(до {CONFIG['RETRY_DOWNLOADS']} попыток)"
+        )
+        for result in run_retry_queue(retry_queue, work, workers):
+            retried_ok += result["status"] != "failed"
+            collect(result)
 
     # Сохраняем index.csv
     index_file = os.path.join(out_root, "index.csv")
-    with open(index_file, "w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(
-            f, fieldnames=["id", "name", "group", "file_path", "type", "source"]
-        )
-        w.writeheader()
-        for row in index_rows:
-            w.writerow(row)
+    _disk(_write_index, index_file, index_rows)
+
+    if CONFIG["CONDITIONAL_DOWNLOADS"]:
+        save_download_state(out_root, download_state)
+    if WRITER is not None:
+        WRITER.close()
+        WRITER = None
+    if VERIFY_POOL is not None:
+        VERIFY_POOL.shutdown()
+        VERIFY_POOL = None
+    keitaro_capabilities.remember_download_pattern(base, endpoint, hint.get("pattern"))
 
     # Сохраняем failed.json если есть ошибки
     if failed:
@@ -384,6 +987,14 @@ def main():
         with open(failed_file, "w", encoding="utf-8") as f:
             json.dump(failed, f, ensure_ascii=False, indent=2)
 
+    catalog = keitaro_catalog.target(CONFIG["CATALOG"], out_root)
+    if catalog:
+        try:
+            catalog = keitaro_catalog.write_items(catalog, export_type, index_rows, out_root, base)
+        except keitaro_catalog.ERRORS as e:
+            print(f"[WARNING] Каталог не записан: {type(e).__name__}: {e}")
+            catalog = None
+
     # Финальная статистика
     print("\n" + "=" * 60)
     print("СТАТИСТИКА ЭКСПОРТА")
@@ -393,9 +1004,15 @@ def main():
     print(f"Успешно скачано:      {ok}")
     print(f"  - как ZIP:          {ok - saved_as_json}")
     print(f"  - как JSON:         {saved_as_json}")
+    print(f"  - не изменились:    {unchanged} (условные запросы)")
+    if CONFIG["ARCHIVE_STORE"]:
+        print(f"  - без изменений:    {deduplicated} (уже в хранилище)")
+    print(f"  - после повтора:    {retried_ok}")
     print(f"Не удалось скачать:   {len(failed)}")
     print(f"\nРезультаты в папке:   {out_root}")
     print(f"Индекс:               {index_file}")
+    if catalog:
+        print(f"Каталог:              {catalog}")
     if failed:
         print(f"Ошибки:               {os.path.join(out_root, 'failed.json')}")
     print("=" * 60)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Проверка целостности выгруженных ZIP-архивов.
+
+verify_zip() читает каждый файл архива и сверяет CRC (ZipFile.testzip),
+заодно считает sha256 и размер. Проверка выполняется в пуле процессов:
+- во время экспорта (keitaro_universal_export.py, CONFIG["VERIFY_ARCHIVES"]) -
+  битый архив не попадает в index.csv, а уходит в очередь повторов;
+- отдельным проходом по папке экспорта:
+
+python3 keitaro_verify.py <папка_экспорта> [процессов]
+
+Отдельный проход записывает sha256 и размер в index.csv, сохраняет
+битые архивы в verify_failed.json и удаляет их из .download_state.json,
+чтобы следующий экспорт в эту папку скачал их заново.
+"""
+
+import os
+import sys
+import csv
+import json
+import zlib
+import hashlib
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+# Сигнатуры начала ZIP: локальный заголовок файла и пустой архив
+ZIP_MAGICS = (b"PK\x03\x04", b"PK\x05\x06")
+STATE_FILE = ".download_state.json"
+
+
+def is_zip_bytes(data: bytes) -> bool:
+    """Похоже ли содержимое на ZIP (а не на HTML/JSON-страницу ошибки)"""
+    return data[:4] in ZIP_MAGICS
+
+
+def verify_zip(path_or_file, with_hash: bool = True) -> dict:
+    """Проверить архив. Возвращает {"ok", "error", "sha256", "size"}"""
+    result = {"ok": False, "error": None, "sha256": None, "size": None}
+    try:
+        if with_hash and isinstance(path_or_file, str):
+            h = hashlib.sha256()
+            with open(path_or_file, "rb") as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    h.update(block)
+            result["sha256"] = h.hexdigest()
+            result["size"] = os.path.getsize(path_or_file)
+        with zipfile.ZipFile(path_or_file) as z:
+            bad = z.testzip()
+        if bad is not None:
+            result["error"] = f"CRC не совпадает: {bad}"
+        else:
+            result["ok"] = True
+    except (OSError, zipfile.BadZipFile, zlib.error, EOFError, NotImplementedError) as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def _verify_row(job: tuple) -> tuple:
+    key, path = job
+    return key, verify_zip(path)
+
+
+def verify_dir(folder: str, processes: int | None = None) -> dict:
+    """Проверить все ZIP из index.csv папки экспорта. Возвращает сводку"""
+    index_file = os.path.join(folder, "index.csv")
+    with open(index_file, "r", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        fieldnames = list(reader.fieldnames or [])
+        rows = list(reader)
+    for field in ("sha256", "size"):
+        if field not in fieldnames:
+            fieldnames.append(field)
+
+    jobs = [
+        (n, os.path.join(folder, row.get("file_path") or ""))
+        for n, row in enumerate(rows)
+        if row.get("type") == "zip"
+    ]
+    broken = []
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        chunksize = max(len(jobs) // ((processes or os.cpu_count() or 1) * 4), 1)
+        for n, result in pool.map(_verify_row, jobs, chunksize=chunksize):
+            row = rows[n]
+            if result["ok"]:
+                row["sha256"], row["size"] = result["sha256"], result["size"]
+                continue
+            broken.append(
+                {
+                    "id": row.get("id"),
+                    "name": row.get("name"),
+                    "file_path": row.get("file_path"),
+                    "reason": result["error"],
+                }
+            )
+            print(f"    ✗ {row.get('file_path')}: {result['error']}")
+
+    with open(index_file, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=fieldnames)
+        w.writeheader()
+        w.writerows(rows)
+
+    # Битые архивы - на повторное скачивание
+    report = os.path.join(folder, "verify_failed.json")
+    if broken:
+        with open(report, "w", encoding="utf-8") as f:
+            json.dump(broken, f, ensure_ascii=False, indent=2)
+        forget_downloads(folder, {b["file_path"] for b in broken})
+    elif os.path.isfile(report):
+        os.remove(report)
+    return {"checked": len(jobs), "broken": broken, "report": report if broken else None}
+
+
+def forget_downloads(folder: str, file_paths: set) -> int:
+    """Убрать архивы из .download_state.json, чтобы экспорт скачал их заново"""
+    path = os.path.join(folder, STATE_FILE)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return 0
+    keys = [k for k, v in state.items() if (v.get("row") or {}).get("file_path") in file_paths]
+    for key in keys:
+        del state[key]
+    if keys:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+    return len(keys)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Использование: python3 keitaro_verify.py <папка_экспорта> [процессов]")
+        return
+    folder = sys.argv[1]
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    if not os.path.isfile(os.path.join(folder, "index.csv")):
+        print(f"❌ ОШИБКА: в '{folder}' нет index.csv")
+        return
+    print(f"[INFO] Проверка архивов: {folder} (процессов: {processes or os.cpu_count()})")
+    summary = verify_dir(folder, processes)
+    print(f"[INFO] Проверено: {summary['checked']}, битых: {len(summary['broken'])}")
+    if summary["report"]:
+        print(f"[INFO] Битые архивы: {summary['report']} (будут скачаны заново при следующем экспорте)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Отдельный этап записи на диск для экспорта.
+
+Поток скачивания только читает сокет и кладет чанки в ограниченную очередь,
+а запись на диск выполняют потоки Writer. Медленный диск (NFS) не
+останавливает чтение из сети, пока очередь не заполнится, а медленная сеть
+не держит диск без работы. Через тот же Writer выполняются и остальные
+записи экспорта (JSON, index.csv), поэтому на диск пишет один источник.
+
+    writer = Writer(queue_chunks=64)
+    with writer.open("file.zip.part", offset=0, preallocate=size) as out:
+        for chunk in chunks:
+            out.write(chunk)          # ждет, только если очередь заполнена
+    path = writer.call(save_json, data, "file.json")
+    writer.close()
+"""
+
+import os
+import queue
+import threading
+from concurrent.futures import Future
+
+
+class WriteHandle:
+    """Файл, запись в который выполняет поток Writer.
+
+    Чанки пишутся по порядку. Ошибка записи возвращается при следующем
+    write() или при close(). close() ждет, пока все чанки окажутся в файле.
+    """
+
+    def __init__(self, tasks: queue.Queue, path: str, offset: int, preallocate: int | None):
+        self.tasks = tasks
+        self.path = path
+        self.f = None
+        self.error: BaseException | None = None
+        self.done = threading.Event()
+        self.written = offset
+        tasks.put((self._open, (offset, preallocate)))
+
+    def _open(self, offset: int, preallocate: int | None) -> None:
+        try:
+            self.f = open(self.path, "r+b" if offset else "wb")
+            self.f.seek(offset)
+            if preallocate and preallocate > offset and hasattr(os, "posix_fallocate"):
+                try:
+                    os.posix_fallocate(self.f.fileno(), offset, preallocate - offset)
+                except OSError:
+                    pass  # файловая система не поддерживает - пишем без резерва
+        except OSError as e:
+            self.error = e
+
+    def _write(self, chunk: bytes) -> None:
+        if self.error is not None:
+            return
+        try:
+            self.f.write(chunk)
+        except OSError as e:
+            self.error = e
+
+    def _close(self) -> None:
+        try:
+            if self.f is not None:
+                self.f.truncate()  # лишний резерв preallocate (если данных меньше)
+                self.f.close()
+        except OSError as e:
+            self.error = self.error or e
+        finally:
+            self.done.set()
+
+    def write(self, chunk: bytes) -> None:
+        if self.error is not None:
+            raise self.error
+        self.tasks.put((self._write, (chunk,)))
+        self.written += len(chunk)
+
+    def close(self) -> None:
+        if not self.done.is_set():
+            self.tasks.put((self._close, ()))
+            self.done.wait()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class Writer:
+    """Потоки записи на диск с ограниченными очередями чанков"""
+
+    def __init__(self, queue_chunks: int = 64, writers: int = 1):
+        self.queues = [queue.Queue(maxsize=max(int(queue_chunks), 1)) for _ in range(max(int(writers), 1))]
+        self.threads = [
+            threading.Thread(target=self._run, args=(q,), daemon=True) for q in self.queues
+        ]
+        self.next = 0
+        self.lock = threading.Lock()
+        for t in self.threads:
+            t.start()
+
+    @staticmethod
+    def _run(tasks: queue.Queue) -> None:
+        while True:
+            task = tasks.get()
+            if task is None:
+                return
+            fn, args = task
+            fn(*args)
+
+    def _queue(self) -> queue.Queue:
+        """Очередь следующего потока (все записи одного файла - в одном потоке)"""
+        with self.lock:
+            self.next = (self.next + 1) % len(self.queues)
+            return self.queues[self.next]
+
+    def open(self, path: str, offset: int = 0, preallocate: int | None = None) -> WriteHandle:
+        """Открыть файл для записи с позиции offset (0 - перезаписать)"""
+        return WriteHandle(self._queue(), path, offset, preallocate)
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """Выполнить fn в потоке записи"""
+        future = Future()
+
+        def run():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:  # noqa: BLE001 - передается вызывающему через Future
+                future.set_exception(e)
+
+        self._queue().put((run, ()))
+        return future
+
+    def call(self, fn, *args, **kwargs):
+        """Выполнить fn в потоке записи и дождаться результата"""
+        return self.submit(fn, *args, **kwargs).result()
+
+    def close(self) -> None:
+        """Дописать все очереди и остановить потоки"""
+        for q in self.queues:
+            q.put(None)
+        for t in self.threads:
+            t.join()